@@ -7,7 +7,7 @@ computations.
 """
 import numpy as np
 from numpy import linalg as LA
-from scipy import sparse
+from scipy import sparse, linalg
 import pyfftw
 from pyfftw.interfaces.numpy_fft import fft, ifft
 from . import fastoeplitz
@@ -95,12 +95,13 @@ def matmat_prod(a_in, ind_in, ind_out, mask, s_2n):
     if N_in_A != N_in :
         raise TypeError("Matrix dimensions do not match")
 
-    A_out = np.empty((N_out,K), dtype=float)
-
-    for j in range(K):
-        A_out[:,j] = mat_vect_prod(a_in[:,j],ind_in,ind_out,mask,s_2n)
+    # All columns are transformed at once
+    y = np.zeros((len(mask), K))
+    y[ind_in, :] = a_in
+    n_fft = len(s_2n)
 
-    return A_out
+    return np.real(ifft(s_2n[:, np.newaxis] * fft(y, n_fft, axis=0),
+                        axis=0)[ind_out, :])
 
 
 def precond_bicgstab(x0, b, a_func, n_it, stp, P, z0_hat=None, verbose=True):
@@ -226,6 +227,67 @@ def precond_bicgstab(x0, b, a_func, n_it, stp, P, z0_hat=None, verbose=True):
     return x, sr, info  # ,sz
 
 
+def pcg_batch(a_func, b, x0, p_solver, tol=1e-6, maxiter=1000):
+    """
+    Preconditioned conjugate gradient algorithm solving the linear systems
+    A x_j = b_j for all columns b_j of b at once, where A is symmetric 
+    positive definite. Each column has its own step sizes and stops when 
+    ||A x_j - b_j|| < tol ||b_j||.
+
+    Parameters
+    ----------
+    a_func : callable
+        linear function calculating A X for any matrix X of size n x K
+    b : numpy array
+        right-hand sides, size n x K
+    x0 : numpy array or None
+        first guess for the solutions (zeros if None), size n x K
+    p_solver : callable
+        preconditionner operator, calculating an approximation of 
+        A^{-1} X for any matrix X of size n x K
+    tol : float
+        relative stopping criterium
+    maxiter : int
+        maximum number of iterations
+
+    Returns
+    -------
+    x : numpy array
+        approximate solutions, size n x K
+    n_it : int
+        number of iterations performed
+
+    """
+
+    b_norm = LA.norm(b, axis=0)
+    if x0 is None:
+        x = np.zeros(b.shape)
+        r = b.copy()
+    else:
+        x = np.array(x0, dtype=float)
+        r = b - a_func(x)
+    z = p_solver(r)
+    p = z.copy()
+    rz = np.sum(r * z, axis=0)
+    # Columns that have not converged yet
+    act = LA.norm(r, axis=0) > tol * b_norm
+    k = 0
+
+    while np.any(act) & (k < maxiter):
+        ap = a_func(p[:, act])
+        alpha = rz[act] / np.sum(p[:, act] * ap, axis=0)
+        x[:, act] += alpha * p[:, act]
+        r[:, act] -= alpha * ap
+        z[:, act] = p_solver(r[:, act])
+        rz_new = np.sum(r[:, act] * z[:, act], axis=0)
+        p[:, act] = z[:, act] + rz_new / rz[act] * p[:, act]
+        rz[act] = rz_new
+        act[act] = LA.norm(r[:, act], axis=0) > tol * b_norm[act]
+        k += 1
+
+    return x, k
+
+
 def print_pcg_status(info):
     """
     Function that takes the status result of the scipy.sparse.linalg.bicgstab
@@ -449,6 +511,116 @@ def compute_precond(autocorr, mask, p=10, ptype='sparse', taper='Wendland2'):
     return solve
 
 
+def solve_normal(normal, rhs, rcond=1e-12):
+    """
+    Solve Hermitian positive semi-definite normal equations. A Cholesky 
+    factorization is used, unless the normal matrix is rank-deficient, in 
+    which case a basic solution is computed with a pivoted QR decomposition.
+    In both cases, the fitted model is the same as with the pseudo-inverse.
+
+    Parameters
+    ----------
+    normal : ndarray
+        normal matrix, size p x p
+    rhs : ndarray
+        right-hand side, size p or p x k
+    rcond : float
+        relative threshold on the pivots under which the matrix is 
+        considered rank-deficient
+
+    Returns
+    -------
+    x : ndarray
+        solution, same size as rhs
+
+    """
+
+    try:
+        c_fac = linalg.cho_factor(normal, lower=True, check_finite=False)
+        pivots = np.abs(np.diag(c_fac[0])) ** 2
+        if np.min(pivots) > rcond * np.max(pivots):
+            return linalg.cho_solve(c_fac, rhs, check_finite=False)
+    except LA.LinAlgError:
+        pass
+    # Rank-deficient case
+    q_mat, r_mat, piv = linalg.qr(normal, pivoting=True, check_finite=False)
+    r_diag = np.abs(np.diag(r_mat))
+    rank = np.sum(r_diag > rcond * r_diag[0])
+    x = np.zeros(rhs.shape, dtype=np.result_type(normal, rhs))
+    x[piv[0:rank]] = linalg.solve_triangular(
+        r_mat[0:rank, 0:rank], np.dot(q_mat[:, 0:rank].conj().T, rhs), 
+        check_finite=False)
+
+    return x
+
+
+def inverse_normal(normal, rcond=1e-12):
+    """
+    Inverse of a Hermitian positive semi-definite normal matrix, computed 
+    from its Cholesky factorization, or with the pseudo-inverse if the 
+    matrix is rank-deficient.
+
+    Parameters
+    ----------
+    normal : ndarray
+        normal matrix, size p x p
+    rcond : float
+        relative threshold on the pivots under which the matrix is 
+        considered rank-deficient
+
+    Returns
+    -------
+    normal_inv : ndarray
+        (pseudo-)inverse matrix, size p x p
+
+    """
+
+    try:
+        c_fac = linalg.cho_factor(normal, lower=True, check_finite=False)
+        pivots = np.abs(np.diag(c_fac[0])) ** 2
+        if np.min(pivots) > rcond * np.max(pivots):
+            return linalg.cho_solve(c_fac, np.eye(normal.shape[0]), 
+                                    check_finite=False)
+    except LA.LinAlgError:
+        pass
+
+    return LA.pinv(normal)
+
+
+def gls_batch(dat, mat, sn, rcond=1e-12):
+    """
+    Generalized least-square estimator for several channels at once.
+
+    Parameters
+    ----------
+    dat : ndarray or list
+        data vectors, size n_ch x n
+    mat : ndarray or list
+        design matrices, size n_ch x n x p
+    sn : ndarray or list
+        variance vectors, size n_ch x n
+    rcond : float
+        relative threshold used to detect rank-deficient normal matrices
+        
+    Returns
+    -------
+    amps : ndarray
+        estimated amplitudes, size n_ch x p
+
+    """
+
+    mat = np.asarray(mat)
+    mat_weighted = mat / np.asarray(sn)[:, :, np.newaxis]
+    # Normal matrices and projections for all channels
+    normal = np.einsum('cnp,cnq->cpq', mat_weighted.conj(), mat, 
+                       optimize=True)
+    proj = np.einsum('cnp,cn->cp', mat_weighted.conj(), np.asarray(dat),
+                     optimize=True)
+
+    return np.array([solve_normal(normal[i], proj[i], rcond=rcond)
+                     for i in range(mat.shape[0])])
+
+
 def gls(dat, mat, sn):
     """
     Generalized least-square estimator.
@@ -468,8 +640,91 @@ def gls(dat, mat, sn):
         estimated amplitudes, size p
     """
     
-    mat_weighted = mat / np.array([sn]).T
-    amps = LA.pinv(np.dot(mat_weighted.conj().T, mat)).dot(
-        np.dot(mat_weighted.conj().T, dat))
-    
-    return amps
\ No newline at end of file
+    return gls_batch([dat], [mat], [sn])[0]
+
+def greedy_basis(training, tol=1e-8, n_max=None, basis=None):
+    """
+    Greedy reduced basis of a training set of vectors.
+
+    Parameters
+    ----------
+    training : ndarray
+        training vectors, size n_train x n
+    tol : float
+        maximum squared relative projection error of the training vectors
+        onto the basis
+    n_max : int, optional
+        maximum number of basis vectors
+    basis : ndarray, optional
+        orthonormal basis to extend, size n_basis x n. This allows to build
+        the basis from successive chunks of the training set.
+
+    Returns
+    -------
+    basis : ndarray
+        orthonormal basis vectors, size n_basis x n
+
+    """
+
+    norms = np.sqrt(np.sum(training.real ** 2 + training.imag ** 2, axis=1))
+    # Vanishing vectors are represented by any basis
+    t = training[norms > 0] / norms[norms > 0][:, np.newaxis]
+    if basis is None:
+        basis = []
+    else:
+        basis = list(basis)
+    if n_max is None:
+        n_max = len(basis) + np.min(t.shape)
+    if (t.shape[0] == 0) | (len(basis) >= n_max):
+        return np.array(basis)
+    if len(basis) > 0:
+        proj = np.sum(np.abs(np.dot(t, np.array(basis).conj().T)) ** 2, 
+                      axis=1)
+    else:
+        proj = np.zeros(t.shape[0])
+    err = 1 - proj
+    i_max = np.argmax(err)
+
+    while (err[i_max] > tol) & (len(basis) < n_max):
+        v = t[i_max]
+        # Iterated modified Gram-Schmidt orthogonalization
+        for it in range(2):
+            for e in basis:
+                v = v - np.vdot(e, v) * e
+        basis.append(v / LA.norm(v))
+        # Update the projection errors of all training vectors
+        proj += np.abs(np.dot(t, basis[-1].conj())) ** 2
+        err = 1 - proj
+        i_max = np.argmax(err)
+
+    return np.array(basis)
+
+
+def empirical_interpolation(basis):
+    """
+    Empirical interpolation nodes and interpolant of a reduced basis, such 
+    that any vector h in the span of the basis is h = h[nodes].dot(interp).
+
+    Parameters
+    ----------
+    basis : ndarray
+        basis vectors, size n_basis x n
+
+    Returns
+    -------
+    nodes : ndarray
+        empirical interpolation nodes, size n_basis
+    interp : ndarray
+        interpolant matrix, size n_basis x n
+
+    """
+
+    nodes = [np.argmax(np.abs(basis[0]))]
+    for j in range(1, basis.shape[0]):
+        # Interpolation residual of the next basis vector
+        coeffs = LA.solve(basis[0:j, nodes].T, basis[j, nodes])
+        res = basis[j] - np.dot(coeffs, basis[0:j])
+        nodes.append(np.argmax(np.abs(res)))
+    nodes = np.array(nodes)
+
+    return nodes, LA.solve(basis[:, nodes], basis)
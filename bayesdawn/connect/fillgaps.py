@@ -1045,7 +1045,7 @@ def create_imputation(data, channel, mask, noise_model = 'spritz'):
     return psd_cls, imp_cls, y_res
         
     
-def update_imputation(data_rec, imp_cls, channel, fit_type = 'log_spline', fit_dof=15, fmin=7e-6):
+def update_imputation(data_rec, imp_cls, channel, fit_type = 'log_spline', fit_dof=15, fmin=7e-6, psdmod=None):
     '''
     Update imputation
     
@@ -1061,6 +1061,11 @@ def update_imputation(data_rec, imp_cls, channel, fit_type = 'log_spline', fit_d
     fit_type : string
         type of PSD modeling fit to be applied to the reconstructed data
         options are None, 'fit_poly', 'fit_spline', 'fit_logpoly', 'fit_logspline'
+    psdmod : psd class object, optional
+        PSD class returned by a previous call. If it was built for the same channel, 
+        fit_type, fit_dof and fmin on the same frequency grid, its fit is updated 
+        from the new data (keeping knots and base noise model) instead of being rebuilt. 
+        Otherwise a new PSD class is fitted.
     
     Returns
     -------
@@ -1076,17 +1081,25 @@ def update_imputation(data_rec, imp_cls, channel, fit_type = 'log_spline', fit_d
     fd = makeFDdata(data_rec)
     y_res = data_rec[channel]
     s = np.zeros(len(y_res))  # for residual 'signal' is zero
-    # Instantiate PSD estimator
-    save_stdout = sys.stdout
-    sys.stdout = open('trash', 'w')
-    psdmod = psdmodel.ModelFDDataPSD(data=fd, 
-                      channel=channel, 
-                      fit_type=fit_type,
-                      fit_dof=fit_dof,
-                      smooth_df=4e-4,
-                      fmin=fmin,
-                      offset_log_fit=True)
-    sys.stdout = save_stdout
+    reuse = (psdmod is not None and psdmod.fit is not None
+             and psdmod.same_grid(fd['f']) and psdmod.channel == channel
+             and psdmod.fit_type == fit_type and psdmod.fit_dof == fit_dof
+             and psdmod.fmin == fmin)
+    if reuse:
+        # Only update the fit coefficients of the existing PSD estimator
+        psdmod.refit(fd)
+    else:
+        # Instantiate PSD estimator
+        save_stdout = sys.stdout
+        sys.stdout = open('trash', 'w')
+        psdmod = psdmodel.ModelFDDataPSD(data=fd, 
+                          channel=channel, 
+                          fit_type=fit_type,
+                          fit_dof=fit_dof,
+                          smooth_df=4e-4,
+                          fmin=fmin,
+                          offset_log_fit=True)
+        sys.stdout = save_stdout
     # Update PSD
     imp_cls.update_psd(psdmod)
     # Re-compute of PSD-dependent terms
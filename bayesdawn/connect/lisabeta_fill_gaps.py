@@ -3,6 +3,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from bayesdawn import datamodel, psdmodel
+from bayesdawn.gaps import operators
 
 import lisabeta.lisa.pyLISAnoise as pyLISAnoise
 from scipy.stats import norm
@@ -209,22 +210,20 @@ class bdPSDmodel(psdmodel.PSD):
 def splinePSDs_from_time_data(tdataset,fsamp):
     n_chan=len(tdataset)
     n_data=len(tdataset[0])
-    t_obs = n_data / fs
+    t_obs = n_data / fsamp
     # Lower frequency for the PSD estimation
     fmin = 1 / t_obs * 1.05
     # Upper frequency
-    fmax=fs/2
+    fmax=fsamp/2
     # Instantiate PSD estimator class
-    psd_sets=[]
-    for ichan in range(n_chan):
-        psd_cls = psdmodel.PSDSpline(n_data, fsamp,
-                                     n_knots=20,
-                                     d=3,
-                                     fmin=fmin,
-                                     fmax=fmax,
-                                     ext=0)
-        psd_cls.estimate(tdataset[ichan])
-        psd_sets.append(psd_cls)
+    psd_cls = psdmodel.PSDSpline(n_data, fsamp,
+                                 n_knots=20,
+                                 d=3,
+                                 fmin=fmin,
+                                 fmax=fmax,
+                                 ext=0)
+    # All channels share the knots, so they are fitted together
+    psd_sets=psd_cls.estimate_channels(tdataset)
     return psd_sets
         
 
@@ -343,8 +342,13 @@ class PSD_model:
             else:
                 datadict[self.channels[ich]]=FD_noise_data[:,ich+1]
 
-        for chan in self.channels:
-            chanmodel=psdmodel.ModelFDDataPSD(datadict, chan, **self.args)
+        refit=hasattr(self,'PSDs') and all(psd.fit is not None and psd.same_grid(datadict['f']) for psd in self.PSDs)
+        for ich,chan in enumerate(self.channels):
+            if refit:
+                #Keep knots, base model and fit factorization, just update the coefficients
+                chanmodel=self.PSDs[ich].refit(datadict)
+            else:
+                chanmodel=psdmodel.ModelFDDataPSD(datadict, chan, **self.args)
             PSDmodels.append(chanmodel)
             if savefilebase is not None:
                 chanmodel.plot()
@@ -378,6 +382,7 @@ class FDimputation:
         self.gap_intervals=gap_intervals
         self.have_gap_info=False
         self.have_imps=False
+        self.have_dft_update=False
         
         args={'method':method}
         if method=='woodbury':
@@ -514,6 +519,21 @@ class FDimputation:
         
         return gapinfo
     
+    def compute_dft_update(self,fs):
+        '''
+        Construct the operator giving the FD data change due to new values in the gaps, on the band fs.
+        '''
+        assert(self.have_gap_info)
+        if self.have_dft_update: return self.dft_update
+        mask=self.gap_info['mask']
+        nt=len(mask)
+        nf=nt//2+1
+        nd=len(fs)
+        #Same scaling as construct_specialized_data
+        self.dft_update=operators.MissingDataDFT(mask,np.arange(nf-nd,nf),scale=1/(2*fs[-1]))
+        self.have_dft_update=True
+        return self.dft_update
+
     def apply_imputation(self, resid_data,psd=None,complex_data=False,report_mean_squares=False):
         '''
         Function to apply a set of imputation models to  multi-channel Fourier-domain residual data.
@@ -582,7 +602,19 @@ class FDimputation:
             #print('y_rec.shape',y_rec.shape)
         if self.verbose:
             print('reconstructing FD')
-        result=construct_specialized_data(y_rec,nchan,df,fs[0])
+        #Only the gap data changed, so rather than redoing the full FFT with
+        #construct_specialized_data we add the FD version of that change to the input
+        dft_update=self.compute_dft_update(fs)
+        imis=dft_update.ind_mis
+        dyf=dft_update.transform_missing(np.array([y_rec[i][imis]-y[i][imis] for i in range(nchan)]))
+        result=np.zeros((nd,1+nchan*2))
+        result[:,0]=np.arange(nd)*df+fs[0]
+        for i in range(nchan):
+            result[:,1+2*i]=resid[:,1+2*i]+dyf[i].real
+            result[:,2+2*i]=resid[:,2+2*i]+dyf[i].imag
+        #The round trip through the time domain drops the imaginary part at Nyquist (and at zero frequency)
+        result[-1,2::2]=0
+        if dft_update.inds[0]==0: result[0,2::2]=0
 
         #Put the data back how we got it if needed
         if complex_data:
@@ -605,11 +605,6 @@ class GaussianStationaryProcess(object):
 
         """
         
-        # Compute the DFT covariances from the one-sided PSD
-        # The actual covariance is npoints x S(f) * fs / 2 but the factor
-        # of npoints is already accounted for in the IFFT normalization
-        cov_2n = s2 * self.psd_cls.fs / 2.0
-
         if self.method == 'tapered':
             # Approximately solve the linear system C_oo x = eps
             x = solve(z_o)
@@ -618,6 +613,10 @@ class GaussianStationaryProcess(object):
             if solve is None:
                 # self.compute_preconditioner(r)
                 raise ValueError("Please provide preconditionning operator")
+            # Compute the DFT covariances from the one-sided PSD
+            # The actual covariance is npoints x S(f) * fs / 2 but the factor
+            # of npoints is already accounted for in the IFFT normalization
+            cov_2n = s2 * self.psd_cls.fs / 2.0
             # First guess
             x0 = np.zeros(len(self.ind_obs))
             # Solve the linear system C_oo x = eps
@@ -646,6 +645,64 @@ class GaussianStationaryProcess(object):
         return x
 
 
+    def solve_coo(self, z_o, i=0, x0=None):
+        """
+        Solve the linear systems Coo x = z for several vectors z at once, 
+        using the method chosen for imputation.
+
+        Parameters
+        ----------
+        z_o : array_like
+            vector of size n_obs, or matrix of size n_obs x K
+        i : int
+            channel index, used if the process has one PSD per channel
+        x0 : array_like or None
+            first guess for the solution, with the same shape as z_o (only 
+            used by the PCG method)
+
+        Returns
+        -------
+        x : ndarray
+            solutions x = Coo^{-1} z_o, with the same shape as z_o
+
+        """
+
+        if self.autocorr is None:
+            self.compute_offline()
+        if ((self.method == 'PCG') | (self.method == 'tapered')) & (self.solve is None):
+            self.compute_preconditioner()
+        if type(self.psd_cls) != list:
+            s2, fs = self.s2, self.psd_cls.fs
+        else:
+            s2, fs = self.s2[i], self.psd_cls[i].fs
+        solve = self.solve[i] if type(self.solve) == list else self.solve
+        z_mat = np.reshape(z_o, (len(self.ind_obs), -1))
+
+        if self.method == 'PCG':
+            cov_2n = s2 * fs / 2.0
+            p_op = matrixalgebra.precond_linear_op(solve, len(self.ind_obs),
+                                                   len(self.ind_obs))
+
+            def coo_func(x):
+                return matrixalgebra.matmat_prod(x, self.ind_obs, 
+                                                 self.ind_obs, self.mask, 
+                                                 cov_2n)
+            
+            if x0 is not None:
+                x0 = np.reshape(x0, z_mat.shape)
+            x, _ = matrixalgebra.pcg_batch(coo_func, z_mat, x0, p_op.matmat,
+                                           tol=self.tol, 
+                                           maxiter=self.n_it_max)
+        elif self.method == 'tapered':
+            x = np.array([solve(z) for z in z_mat.T]).T
+        elif self.method == 'woodbury':
+            x = np.array([self.apply_coo_inv(z, s2) for z in z_mat.T]).T
+        else:
+            raise ValueError("Exact solves are not available with the " 
+                             + self.method + " method.")
+
+        return np.reshape(x, np.shape(z_o))
+
     def imputation(self, y, r, s2, solve=None, draw=True):
         """
 
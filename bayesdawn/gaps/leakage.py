@@ -4,6 +4,7 @@
 import numpy as np
 import pyfftw
 from pyfftw.interfaces.scipy_fftpack import fft, ifft
+from scipy import signal
 # Enable the cache to save FFTW plan to perform faster fft for the subsequent calls of pyfftw
 pyfftw.interfaces.cache.enable()
 
@@ -52,7 +53,8 @@ def periodogram_mean(func, fe, n_data, f_zero=None):
 
 
 def periodogram_mean_masked(func, fe, n_data, n_freq, mask, 
-                            n_points=None, n_conv=None, normal=True):
+                            n_points=None, n_conv=None, normal=True,
+                            lambda_n=None):
     """
     Function calculating the theoretical mean of the periodogram of a masked
     signal (defined as the squared modulus of the fft devided by fe*n_data) 
@@ -70,6 +72,9 @@ def periodogram_mean_masked(func, fe, n_data, n_freq, mask,
     @type mask : (n_data x 1) array
     @param n_freq: number of frequency point where to compute the periodogram
     @type n_freq : scalar (integer)
+    @param lambda_n: normalized sample autocovariance of the mask, if 
+    already computed (see MaskLeakageKernel)
+    @type lambda_n : (n_data x 1) array
 
     @return:
         P_mean : Periodogram expectation (n_data-vector)
@@ -77,37 +82,397 @@ def periodogram_mean_masked(func, fe, n_data, n_freq, mask,
 
     if n_points == None:
         # 1. Calculation of the autocovariance function Rn
-        power = np.int(np.log(2 * n_data) / np.log(2.))  # + 1
+        power = int(np.log(2 * n_data) / np.log(2.))  # + 1
         # Number of points for the integration
         n_points = 2 ** power
 
     k_points = np.arange(0, n_points)
-    frequencies = fe * (k_points / np.float(n_points) - 0.5)
+    frequencies = fe * (k_points / float(n_points) - 0.5)
     i = np.where(frequencies == 0)
     frequencies[i] = fe / (n_points)
     Z = func(frequencies)
     n = np.arange(0, n_data)
     Z_ifft = ifft(Z)
-    R = fe / np.float(n_points) * (Z[0] * 0.5 * (np.exp(1j * np.pi * n) \
+    R = fe / float(n_points) * (Z[0] * 0.5 * (np.exp(1j * np.pi * n) \
                                                  - np.exp(-1j * np.pi * n)) + n_points * Z_ifft[0:n_data] * np.exp(
         -1j * np.pi * n))
 
-    if n_conv == None:
-        n_conv = 2 * n_data - 1
-    # 2. Calculation of the sample autocovariance of the mask
-    fx = fft(mask, n_conv)
-    # print("FFT of M is done with N_points")
-    # fx = fft(M, N_points)
-
-    if normal:
-        K2 = np.sum(mask ** 2)
+    if lambda_n is None:
+        lambda_N = mask_autocovariance(mask, n_conv=n_conv, normal=normal)
     else:
-        K2 = n_data
-    lambda_N = np.real(ifft(fx * np.conj(fx))) / K2
+        lambda_N = lambda_n
 
     # 3. Calculation of the of the periodogram mean vector
     X = R[0:n_data] * lambda_N[0:n_data]
 
     Pm = 1. / fe * (fft(X, n_freq) + n_freq * ifft(X, n_freq) - R[0] * lambda_N[0])
 
-    return Pm
\ No newline at end of file
+    return Pm
+
+
+def mask_autocovariance(mask, n_conv=None, normal=True):
+    """
+    Normalized sample autocovariance of the mask, which only depends on the 
+    gap pattern.
+
+    Parameters
+    ----------
+    mask : ndarray
+        mask vector, M[i] = 1 if data is available, 0 otherwise
+    n_conv : int, optional
+        size of the FFT used to compute the autocovariance. Default is 
+        2 * len(mask) - 1.
+    normal : bool
+        if True, normalize by sum(mask**2), otherwise by len(mask)
+
+    Returns
+    -------
+    lambda_n : ndarray
+        autocovariance of the mask at lags 0, ..., n_conv - 1
+
+    """
+
+    n_data = len(mask)
+    if n_conv is None:
+        n_conv = 2 * n_data - 1
+    fx = fft(mask, n_conv)
+    if normal:
+        k2 = np.sum(mask ** 2)
+    else:
+        k2 = n_data
+
+    return np.real(ifft(fx * np.conj(fx))) / k2
+
+
+class MaskLeakageKernel(object):
+
+    def __init__(self, mask, normal=True, tol=1e-6, n_band_max=32, 
+                 oversample=2):
+        """
+        Spectral leakage kernel of a mask, computed once and applied to any 
+        PSD to get the expectation of the masked data periodogram.
+
+        The expected periodogram of masked data is the convolution of the 
+        PSD by the squared modulus of the mask's discrete-time Fourier 
+        transform, a continuous function of frequency. This kernel only 
+        depends on the mask, so it is precomputed on a frequency grid 
+        oversampled by a factor oversample with respect to the Fourier grid,
+        and the convolution is computed as a Riemann sum on this grid. With 
+        oversample=1, the leakage from frequencies between the Fourier bins 
+        is missed (circular approximation), which underestimates the 
+        expectation where the PSD is steep. With oversample=2, the result 
+        is the same as the lag-domain computation of 
+        periodogram_mean_masked.
+
+        If the kernel coefficients become smaller than tol times the 
+        central one within a bandwidth of n_band_max coefficients, the 
+        convolution is performed directly on this band. Otherwise, the full 
+        kernel is applied with FFTs. Sharp-edged gap masks have slowly 
+        decaying kernels and always use FFTs.
+
+        Parameters
+        ----------
+        mask : ndarray
+            mask vector, M[i] = 1 if data is available, 0 otherwise
+        normal : bool
+            if True, the periodogram is normalized by sum(mask**2), 
+            otherwise by len(mask)
+        tol : float
+            amplitude, relative to the central coefficient, below which the
+            kernel coefficients are neglected in the banded convolution
+        n_band_max : int
+            maximum number of kernel coefficients for which the convolution 
+            is performed directly instead of with FFTs
+        oversample : int
+            oversampling factor of the frequency grid
+
+        """
+
+        self.mask = mask
+        self.n_data = len(mask)
+        self.normal = normal
+        self.oversample = oversample
+        self.n_grid = oversample * self.n_data
+        if normal:
+            self.k2 = np.sum(mask ** 2)
+        else:
+            self.k2 = self.n_data
+        # Squared spectral kernel on the oversampled grid, normalized such 
+        # that it sums to 1 for normal=True
+        kernel = np.abs(fft(mask, self.n_grid)) ** 2 / (self.n_grid 
+                                                        * self.k2)
+        # Bandwidth out of which all coefficients are below the tolerance
+        offsets = np.arange(self.n_grid // 2 + 1)
+        kernel_sym = np.maximum(kernel[offsets], kernel[-offsets])
+        above = np.where(kernel_sym > tol * kernel[0])[0]
+        self.n_band = int(above[-1]) if above.shape[0] > 0 else 0
+        # Choice of the convolution method
+        self.banded = 2 * self.n_band + 1 <= n_band_max
+        if self.banded:
+            self.offsets = np.arange(-self.n_band, self.n_band + 1)
+            self.kernel = kernel[self.offsets]
+        else:
+            self.kernel_fft = fft(kernel)
+        # Mask autocovariance for the exact lag-domain computation
+        self.lambda_n = None
+
+    def frequencies(self, fe):
+        """
+        Frequencies of the oversampled grid where the PSD is evaluated, 
+        as in periodogram_mean_masked.
+
+        Parameters
+        ----------
+        fe : float
+            sampling frequency
+
+        Returns
+        -------
+        freq : ndarray
+            absolute frequencies np.fft.fftfreq(n_data * oversample) * fe,
+            where the zero frequency is replaced by the grid resolution.
+
+        """
+
+        freq = np.abs(np.fft.fftfreq(self.n_grid) * fe)
+        freq[0] = fe / self.n_grid
+
+        return freq
+
+    def convolve(self, psd):
+        """
+        Expected periodogram of the masked data given the PSD values on the 
+        oversampled grid.
+
+        Parameters
+        ----------
+        psd : ndarray
+            PSD values at the frequencies given by the frequencies method
+
+        Returns
+        -------
+        per_mean : ndarray
+            expected periodogram at frequencies np.fft.fftfreq(n_data) * fe
+
+        """
+
+        if self.banded:
+            per_mean = np.zeros(self.n_grid)
+            for d, k in zip(self.offsets, self.kernel):
+                per_mean += k * np.roll(psd, d)
+        else:
+            per_mean = np.real(ifft(fft(psd) * self.kernel_fft))
+
+        return per_mean[::self.oversample]
+
+    def periodogram_mean(self, func, fe):
+        """
+        Expected periodogram of the masked data for a PSD function.
+
+        Parameters
+        ----------
+        func : callable
+            PSD as a function of frequency
+        fe : float
+            sampling frequency
+
+        Returns
+        -------
+        per_mean : ndarray
+            expected periodogram at frequencies np.fft.fftfreq(n_data) * fe
+
+        """
+
+        return self.convolve(func(self.frequencies(fe)))
+
+    def periodogram_mean_exact(self, func, fe, n_freq=None, n_points=None):
+        """
+        Expected periodogram computed in the lag domain as in 
+        periodogram_mean_masked, reusing the mask autocovariance.
+
+        """
+
+        if self.lambda_n is None:
+            self.lambda_n = mask_autocovariance(self.mask, normal=self.normal)
+        if n_freq is None:
+            n_freq = self.n_data
+
+        return periodogram_mean_masked(func, fe, self.n_data, n_freq, 
+                                       self.mask, n_points=n_points, 
+                                       normal=self.normal, 
+                                       lambda_n=self.lambda_n)
+
+    def whittle_loglike(self, per, psd, inds=None):
+        """
+        Whittle log-likelihood of the masked data periodogram, accounting for 
+        the leakage due to the mask.
+
+        Parameters
+        ----------
+        per : ndarray
+            periodogram of the masked data on the Fourier grid
+        psd : ndarray
+            PSD values on the oversampled grid (see the frequencies method)
+        inds : ndarray, optional
+            indices of the frequencies included in the likelihood. 
+            Default is all positive frequencies.
+
+        Returns
+        -------
+        ll : float
+            value of the log-likelihood
+
+        """
+
+        per_mean = self.convolve(psd)
+        if inds is None:
+            inds = np.arange(1, (self.n_data - 1) // 2 + 1)
+
+        return -0.5 * np.sum(np.log(per_mean[inds]) 
+                             + per[inds] / per_mean[inds])
+
+
+class WindowConvolution(object):
+
+    def __init__(self, window, inds, scale=1.0, tol=1e-6, n_band_max=256,
+                 max_fraction=0.25):
+        """
+        Frequency-domain windowing operator for signals that are band-limited
+        to an analysis band. Multiplying a real time series by a window
+        amounts to convolving its DFT with the window's DFT, including the 
+        mirror images of the band at negative frequencies. The window
+        spectrum is precomputed and truncated to the bandwidth holding a 
+        fraction 1 - tol of its absolute sum, which bounds the relative 
+        amplitude error, so that the windowed DFT can be computed on the band
+        without going back to the time domain. Windows with sharp edges 
+        (like gap masks) have slowly decaying spectra: if the truncated 
+        kernel is a large fraction of the data size, the exact time-domain 
+        product is used instead.
+
+        Parameters
+        ----------
+        window : ndarray
+            time window, size n_data
+        inds : ndarray
+            sorted indices of the positive Fourier frequencies of the band, 
+            where the signal is defined and where the windowed signal is 
+            computed. The signal is assumed to vanish outside the band.
+        scale : float
+            rescaling factor applied to the windowed DFT
+        tol : float
+            fraction of the window spectrum absolute sum that can be 
+            neglected
+        n_band_max : int
+            maximum number of kernel coefficients for which the convolution 
+            is performed directly instead of with FFTs (overlap-add)
+        max_fraction : float
+            maximum size of the truncated kernel, as a fraction of n_data, 
+            above which the exact time-domain product is used
+
+        """
+
+        self.n_data = len(window)
+        self.inds = np.asarray(inds)
+        self.window = window
+        self.scale = scale
+        # Window spectrum, normalized such that fft(w * x) = kernel * fft(x)
+        kernel = fft(window) * scale / self.n_data
+        # Bandwidth holding the required fraction of the kernel absolute sum
+        amp = np.abs(kernel)
+        offsets = np.arange(self.n_data // 2 + 1)
+        cum = np.concatenate(([amp[0]], 
+                              amp[0] + np.cumsum(amp[offsets[1:]] 
+                                                 + amp[-offsets[1:]])))
+        self.n_band = int(np.min([np.searchsorted(cum, 
+                                                  (1 - tol) * np.sum(amp)),
+                                  (self.n_data - 1) // 2]))
+        # Choice of the method
+        self.exact = 2 * self.n_band + 1 > max_fraction * self.n_data
+        self.banded = 2 * self.n_band + 1 <= n_band_max
+        if self.exact:
+            return
+        self.offsets = np.arange(-self.n_band, self.n_band + 1)
+        self.kernel = kernel[self.offsets]
+        # The band is embedded in a contiguous span of frequencies
+        self.i0 = self.inds[0]
+        self.pos = self.inds - self.i0
+        self.n_span = self.pos[-1] + 1
+        # Self-conjugate bins (zero and Nyquist frequencies), where only the 
+        # real part of the signal is kept
+        self.self_conj = self.pos[(2 * self.inds) % self.n_data == 0]
+        # Contributions of negative frequencies n_data - j to bin k, through 
+        # the kernel at offsets s = k + j. They come from the two windows of
+        # s where the truncated kernel is not zero: near zero (mirror image 
+        # of the band around DC) and near n_data (mirror image around the 
+        # Nyquist frequency).
+        s_min = 2 * self.i0
+        s_max = 2 * self.inds[-1]
+        self.neg_windows = []
+        for center in [0, self.n_data]:
+            s_start = max(center - self.n_band, s_min)
+            s_end = min(center + self.n_band, s_max)
+            if s_start <= s_end:
+                s_vect = np.arange(s_start, s_end + 1)
+                self.neg_windows.append((s_start - s_min, 
+                                         kernel[s_vect % self.n_data]))
+
+    def convolve(self, x, kernel):
+        """
+        Full linear convolution, performed directly or with FFTs depending
+        on the kernel bandwidth.
+        """
+
+        if self.banded:
+            return np.convolve(x, kernel)
+        else:
+            return signal.oaconvolve(x, kernel)
+
+    def apply_exact(self, x_band):
+        """
+        DFT of the windowed signal on the band, computed with the product in
+        the time domain.
+        """
+
+        x = np.zeros(self.n_data, dtype=np.complex128)
+        x[self.inds] = x_band
+        x[(self.n_data - self.inds) % self.n_data] = np.conj(x_band)
+        y = fft(self.window * np.real(ifft(x))) * self.scale
+
+        return y[self.inds]
+
+    def apply(self, x_band):
+        """
+        Compute the DFT of the windowed signal on the band.
+
+        Parameters
+        ----------
+        x_band : ndarray
+            DFT of the signal at positive frequencies inds
+
+        Returns
+        -------
+        y_band : ndarray
+            DFT of the windowed signal at positive frequencies inds
+
+        """
+
+        if self.exact:
+            return self.apply_exact(x_band)
+        x = np.zeros(self.n_span, dtype=np.complex128)
+        x[self.pos] = x_band
+        # Self-conjugate bins are shared by the positive and negative parts
+        x[self.self_conj] = 0.5 * np.real(x[self.self_conj])
+        y = self.convolve(x, self.kernel)[self.n_band:self.n_band + self.n_span]
+        # Leakage from negative frequencies: y[a] += sum_b g[a + b] x*[b], 
+        # computed as a convolution with the reversed conjugate signal
+        x_rev = np.conj(x[::-1])
+        for t_start, g in self.neg_windows:
+            conv = self.convolve(g, x_rev)
+            # y[a] = conv[n_span - 1 - t_start + a], where it is defined
+            q_start = self.n_span - 1 - t_start
+            a_start = max(0, - q_start)
+            a_end = min(self.n_span, conv.size - q_start)
+            if a_start < a_end:
+                y[a_start:a_end] += conv[q_start + a_start:q_start + a_end]
+
+        return y[self.pos]
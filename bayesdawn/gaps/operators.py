@@ -11,6 +11,7 @@ import numpy as np
 import pyfftw
 from pyfftw.interfaces.numpy_fft import fft, ifft
 from scipy import sparse, linalg
+from scipy.fft import next_fast_len
 from bayesdawn.algebra import fastoeplitz
 pyfftw.interfaces.cache.enable()
 
@@ -276,6 +277,159 @@ class CovarianceOperator(object):
         
 
 
+class MissingDataDFT(object):
+
+    def __init__(self, mask, inds, window=None, scale=1.0):
+        """
+        Windowed DFT of a gapped time series restricted to a set of Fourier 
+        bins, updated when only the missing data change:
+
+        X[k] = scale * sum_n w[n] y[n] exp(-2 i pi k n / N)
+             = X_o[k] + scale * sum_{n missing} w[n] y[n] exp(-2 i pi k n / N)
+
+        The observed-data part X_o is computed once, and the missing-data part
+        is computed gap by gap with a chirp-z (Bluestein) transform evaluated 
+        on the span of the frequency bins only. A full FFT is used instead 
+        when it is cheaper (wide band or long gaps).
+
+        Parameters
+        ----------
+        mask : ndarray
+            binary mask (0 for missing data), size N
+        inds : array_like
+            indices of the Fourier bins where the DFT is computed (sorted)
+        window : ndarray or None
+            time window w applied before the DFT (no windowing if None)
+        scale : float
+            normalization factor applied to the DFT
+
+        """
+
+        self.n_data = len(mask)
+        self.inds = np.asarray(inds)
+        self.scale = scale
+        if window is None:
+            self.window = np.ones(self.n_data)
+        else:
+            self.window = window
+        self.ind_mis = np.where(mask == 0)[0]
+        # Missing data segments
+        breaks = np.where(np.diff(self.ind_mis) != 1)[0] + 1
+        self.n_starts = self.ind_mis[np.concatenate(([0], breaks))]
+        self.lengths = np.diff(np.concatenate((np.concatenate(([0], breaks)), 
+                                               [len(self.ind_mis)])))
+        self.n_gaps = len(self.n_starts)
+        # Span of the frequency bins
+        self.k0 = self.inds[0]
+        self.n_span = self.inds[-1] - self.k0 + 1
+        self.j_inds = self.inds - self.k0
+        self.x_obs = None
+
+        if self.n_gaps == 0:
+            self.method = 'none'
+            return
+        l_max = np.max(self.lengths)
+        self.n_fft = next_fast_len(l_max + self.n_span - 1)
+        # Chirp-z transform of all gaps at once (two complex FFTs) vs one
+        # real-data FFT
+        cost_czt = 4 * self.n_gaps * self.n_fft * np.log2(self.n_fft)
+        cost_fft = self.n_data * np.log2(self.n_data)
+        if cost_czt < cost_fft:
+            self.method = 'czt'
+            # Position of each missing sample in the gap x sample array
+            self.i_gap = np.repeat(np.arange(self.n_gaps), self.lengths)
+            self.i_sample = self.ind_mis - np.repeat(self.n_starts, 
+                                                     self.lengths)
+            # Chirp exp(-i pi n^2 / N), with n^2 reduced modulo 2N
+            n = np.arange(max(l_max, self.n_span))
+            chirp = np.exp(-1j * np.pi * (n ** 2 % (2 * self.n_data)) 
+                           / self.n_data)
+            self.chirp_in = chirp[0:l_max] * np.exp(
+                -2j * np.pi * (self.k0 * n[0:l_max] % self.n_data) 
+                / self.n_data)
+            self.chirp_out = chirp[self.j_inds]
+            # Convolution kernel exp(i pi n^2 / N), for -l_max < n < n_span
+            b = np.zeros(self.n_fft, dtype=np.complex128)
+            b[0:self.n_span] = np.conj(chirp[0:self.n_span])
+            b[self.n_fft - l_max + 1:] = np.conj(chirp[1:l_max][::-1])
+            self.kernel_fft = fft(b)
+            # Phase of each gap start
+            self.phases = np.exp(-2j * np.pi * (
+                np.outer(self.n_starts, self.inds) % self.n_data) / self.n_data)
+        else:
+            self.method = 'fft'
+
+    def set_observed(self, y):
+        """
+        Compute the DFT of the observed data.
+
+        Parameters
+        ----------
+        y : ndarray or list of ndarrays
+            time series (or several time series of size N). Missing data are 
+            ignored.
+
+        """
+
+        y_o = np.array(y, dtype=float)
+        y_o[..., self.ind_mis] = 0
+        self.x_obs = self.scale * fft(y_o * self.window, axis=-1)[..., self.inds]
+
+    def transform_missing(self, y_mis):
+        """
+        DFT of a time series that is zero everywhere except at missing data
+        points.
+
+        Parameters
+        ----------
+        y_mis : ndarray
+            values at the missing data points, size ... x n_mis
+
+        Returns
+        -------
+        x_mis : ndarray
+            windowed DFT on the frequency bins, size ... x n_freq
+
+        """
+
+        y_mis = np.asarray(y_mis) * self.window[self.ind_mis]
+        shape = y_mis.shape[:-1]
+        if self.method == 'none':
+            return np.zeros(shape + (len(self.inds),), dtype=np.complex128)
+        elif self.method == 'fft':
+            y_full = np.zeros(shape + (self.n_data,))
+            y_full[..., self.ind_mis] = y_mis
+            return self.scale * fft(y_full, axis=-1)[..., self.inds]
+        # Gaps stored as rows, multiplied by the input chirp
+        a = np.zeros(shape + (self.n_gaps, self.n_fft), dtype=np.complex128)
+        a[..., self.i_gap, self.i_sample] = y_mis * self.chirp_in[self.i_sample]
+        c = ifft(fft(a, axis=-1) * self.kernel_fft, axis=-1)
+        # DFT of each gap relative to its start, size ... x n_gaps x n_freq
+        x_gaps = c[..., self.j_inds] * self.chirp_out
+
+        return self.scale * np.sum(x_gaps * self.phases, axis=-2)
+
+    def transform(self, y):
+        """
+        Windowed DFT of a time series on the frequency bins, assuming that its
+        observed data are those given to set_observed.
+
+        Parameters
+        ----------
+        y : ndarray or list of ndarrays
+            time series of size N (only the missing data points are read)
+
+        Returns
+        -------
+        x : ndarray
+            windowed DFT on the frequency bins, size ... x n_freq
+
+        """
+
+        return self.x_obs + self.transform_missing(
+            np.asarray(y)[..., self.ind_mis])
+
+
 def mask_matrix(mat, threshold=1e-3):
 
     inds = np.where(np.abs(mat) < np.max(np.abs(mat)) * threshold)
@@ -9,6 +9,7 @@ import numpy as np
 
 from scipy import linalg as LA
 from . import samplers
+from .algebra import matrixalgebra
 
 # FTT modules
 import pyfftw
@@ -35,9 +36,7 @@ def gls(mat_fft, psd, y_fft):
 
     """
 
-    mat_fft_weighed = mat_fft / np.array([psd]).T
-
-    return LA.pinv(mat_fft_weighed.conj().T.dot(mat_fft)).dot(mat_fft_weighed.conj().T.dot(y_fft))
+    return matrixalgebra.gls(y_fft, mat_fft, psd)
 
 
 class GWModel(object):
@@ -208,8 +207,10 @@ class GWModel(object):
             mat_list = self.matrix_model(params)
 
             # Compute extrinsinc amplitudes for each channel
-            amplitudes = [gls(mat_list[i], spectrum[i][self.inds_pos], y_fft[i][self.inds_pos])
-                          for i in range(len(mat_list))]
+            amplitudes = matrixalgebra.gls_batch(
+                [y_fft[i][self.inds_pos] for i in range(len(mat_list))],
+                mat_list,
+                [spectrum[i][self.inds_pos] for i in range(len(mat_list))])
 
             # Stack the modeled signals
             s_fft_stack = self.concatenate_model([mat_list[i].dot(amplitudes[i]) for i in range(len(mat_list))])
@@ -288,10 +289,11 @@ class GWModel(object):
         # Weight matrix columns by the inverse of the PSD
         #mat_freq_w = np.array([mat_freq[:,j]/S[self.inds] for j in range(mat_freq.shape[1])]).T
         s2 = np.concatenate((s[self.inds_pos], s[self.inds_pos]))
-        mat_freq_w = np.array([mat_freq[:, j]/s2 for j in range(mat_freq.shape[1])]).T
+        mat_freq_w = mat_freq / s2[:, np.newaxis]
         
         # Inverse normal matrix
-        ZI = LA.pinv(np.dot(np.transpose(mat_freq).conj(), mat_freq_w))
+        ZI = matrixalgebra.inverse_normal(np.dot(np.transpose(mat_freq).conj(), 
+                                                 mat_freq_w))
 
         return mat_freq, mat_freq_w, ZI
 
@@ -5,12 +5,15 @@ Created on Tue Jan 22 17:11:56 2019
 @author: qbaghi
 """
 import numpy as np
-from scipy import linalg
+from collections import OrderedDict
+from scipy import linalg, special
+from scipy.fft import next_fast_len
 # FTT modules
 import pyfftw
 from pyfftw.interfaces.numpy_fft import fft, ifft
 # from .waveforms import lisaresp
 from . import gaps
+from .gaps import leakage, operators
 from .utils import physics
 from .algebra import matrixalgebra
 pyfftw.interfaces.cache.enable()
@@ -61,10 +64,53 @@ def gls(mat_fft, psd, y_fft):
 
     """
 
-    mat_fft_weighed = mat_fft / np.array([psd]).T
+    return matrixalgebra.gls(y_fft, mat_fft, psd)
 
-    return linalg.pinv(mat_fft_weighed.conj().T.dot(mat_fft)).dot(
-        mat_fft_weighed.conj().T.dot(y_fft))
+
+def relative_binning_edges(freq, eps=0.1, gammas=None):
+    """
+    Choose the coarse frequency bins used in the relative-binning
+    (heterodyned) likelihood, such that the phase of any post-Newtonian-like
+    deviation from the fiducial waveform changes by at most eps in each bin.
+
+    Parameters
+    ----------
+    freq : ndarray
+        sorted positive frequencies of the analysis band
+    eps : float
+        maximum dephasing allowed in one bin [rad]
+    gammas : array_like, optional
+        power laws of the frequency-dependent phase terms. Default is the 
+        post-Newtonian set [-5/3, -2/3, 1, 5/3, 7/3].
+
+    Returns
+    -------
+    i_edges : ndarray
+        indices of the bin edges in freq, including the first and last 
+        indices.
+
+    Reference
+    ---------
+    Zackay, Barak, Dai, Liang and Venumadhav, Tejaswi, Relative Binning and 
+    Fast Likelihood Evaluation for Gravitational Wave Parameter Estimation, 
+    2018
+
+    """
+
+    if gammas is None:
+        gammas = np.array([-5/3, -2/3, 1, 5/3, 7/3])
+    f_star = np.where(gammas > 0, freq[-1], freq[0])
+    # Maximum dephasing accumulated from the start of the band
+    dpsi = 2 * np.pi * np.sum(np.sign(gammas)[:, np.newaxis]
+                              * (freq[np.newaxis, :] 
+                                 / f_star[:, np.newaxis]) ** gammas[:, np.newaxis],
+                              axis=0)
+    dpsi -= dpsi[0]
+    n_bins = np.max([int(np.ceil(dpsi[-1] / eps)), 1])
+    i_edges = np.searchsorted(dpsi, np.linspace(0, dpsi[-1], n_bins + 1))
+    i_edges[-1] = freq.shape[0] - 1
+
+    return np.unique(i_edges)
 
 
 # class LikelihoodModel(object):
@@ -625,7 +671,12 @@ class LogLike(object):
                  signal_kwargs={},
                  normalized=False, channels=None,
                  model_cls=None, psd_cls=None, wd=None, wd_full=None,
-                 gap_convolution=False):
+                 gap_convolution=False,
+                 support_func=None,
+                 support_reduced_func=None,
+                 template_cache_size=0,
+                 signal_batch_func=None,
+                 narrowband_func=None):
         """
 
         Parameters
@@ -671,8 +722,36 @@ class LogLike(object):
         psd_cls : list bayesdawn.psdmodel.PSD instance
             noise PSD model
         gap_convolution : boolean
-            if True, the waveform is convolved with the gap window.
-            Significantly increases the likelihood evaluation time.
+            if True, the waveform is convolved with the gap window, in the 
+            frequency domain (see gaps.leakage.WindowConvolution).
+        support_func : callable or None
+            function taking the same arguments as signal_func (except the 
+            frequency vector) and returning the frequency interval 
+            (f_min, f_max) outside which the template is negligible. If 
+            provided, waveforms and inner products are only evaluated in 
+            this interval.
+        support_reduced_func : callable or None
+            same as support_func for the intrinsic parameters taken by 
+            signal_reduced_func.
+        template_cache_size : int
+            maximum number of recently computed templates kept in memory, so 
+            that auxiliary parameter updates reuse the templates of the last 
+            likelihood evaluations (0 disables the cache).
+        signal_batch_func : callable or None
+            function taking an array of full sampling parameter vectors of 
+            size n x ndim and returning the corresponding templates on the 
+            analysis band, as an array of size n x n_ch x nf (e.g. 
+            waveforms.service.WaveformService.compute_batch). If provided, 
+            the templates of batched likelihood evaluations missing from the 
+            template cache are computed in a single call.
+        narrowband_func : callable or None
+            narrowband waveform generator, taking the same arguments as 
+            signal_func except the frequency vector, and returning the 
+            template in compact form (i_start, values), where i_start is the 
+            index of its first Fourier bin and values the array of its values
+            at bins i_start, i_start + 1, .. (size n_ch x n_bins), see e.g. 
+            waveforms.lisaresp.UCBWaveform.narrowband_signal. If provided, 
+            it replaces signal_func and support_func for full templates.
 
 
         """
@@ -688,13 +767,36 @@ class LogLike(object):
         self.f = np.fft.fftfreq(self.n_data) / self.del_t
         # Fourier bin indices where we restrict the analysis
         # intersect, self.inds, comm2 = np.intersect1d(self.f, freq)
-        self.inds = inds
+        self.inds = np.asarray(inds)
+        # Contiguous bands are held as slices to get views instead of copies
+        if (self.nf > 1) & np.all(np.diff(self.inds) == 1):
+            self.band = slice(self.inds[0], self.inds[-1] + 1)
+            # Mirror band, listed in the same order as the positive one
+            self.band_neg = slice(self.n_data - self.inds[0], 
+                                  self.n_data - self.inds[-1] - 1, -1)
+        else:
+            self.band = self.inds
+            self.band_neg = self.n_data - self.inds
+        # Frequencies of the analysis band
+        self.f_band = self.f[self.band]
+        # Number of data channels
+        self.n_ch = len(self.data)
         
         # Waveform generators
         self.signal_func = signal_func
         self.signal_reduced_func = signal_reduced_func
         self.signal_args = signal_args
         self.signal_kwargs = signal_kwargs
+        # Frequency support of the templates
+        self.support_func = support_func
+        self.support_reduced_func = support_reduced_func
+        # Batched waveform generator
+        self.signal_batch_func = signal_batch_func
+        # Narrowband waveform generator
+        self.narrowband_func = narrowband_func
+        # Least recently used templates are discarded first
+        self.template_cache_size = template_cache_size
+        self.template_cache = OrderedDict()
 
         # Time windowing for gapped data
         if wd is None:
@@ -713,13 +815,22 @@ class LogLike(object):
         self.resc_full = self.n_data / np.sum(self.wd_full)
         # Convert time data to frequency domain and restrict it to the band of
         # interest
-        self.data_dft = [fft(self.wd * dat)[self.inds] * self.del_t * self.resc
-                         for dat in self.data]
-
-        if normalized:
-            self.ll_norm = self.log_norm(self.data_dft, sn)
-        else:
-            self.ll_norm = 0
+        # Contiguous store of the auxiliary parameters: data DFTs in the first 
+        # n_ch rows, PSDs in the last n_ch rows
+        self.par_aux = np.empty(2 * self.n_ch * self.nf, dtype=np.complex128)
+        aux = self.par_aux.reshape((2 * self.n_ch, self.nf))
+        for i in range(self.n_ch):
+            aux[i] = fft(self.wd * self.data[i])[self.band]
+            aux[self.n_ch + i] = sn[i]
+        aux[0:self.n_ch] *= self.del_t * self.resc
+        self.data_dft = list(aux[0:self.n_ch])
+        # Pre-whitened data, inverse-PSD weights and normalization
+        self.normalized = normalized
+        self.ll_norm = 0
+        self.aux_ref = None
+        # Counter incremented whenever the auxiliary parameters change
+        self.aux_version = 0
+        self.set_auxiliary_params(self.par_aux)
 
         if channels is None:
             self.channels = [1, 2]
@@ -728,10 +839,21 @@ class LogLike(object):
 
         # For missing data imputation
         self.model = model_cls
+        if model_cls is not None:
+            # In-band DFT of the imputed data, updated from the missing data 
+            # only
+            self.dft_update = operators.MissingDataDFT(
+                model_cls.mask, self.inds, window=self.wd_full, 
+                scale=self.del_t * self.resc_full)
+            self.dft_update.set_observed(self.data)
         # For noise PSD estimation
         self.psd_list = psd_cls
         # Gap convolution flag
         self.gap_convolution = gap_convolution
+        if gap_convolution:
+            # Frequency-domain windowing operator restricted to the band
+            self.window_conv = leakage.WindowConvolution(self.wd, self.inds,
+                                                         scale=self.resc)
 
     def update_psd(self, y_gw_list, data):
         """
@@ -755,7 +877,7 @@ class LogLike(object):
         [self.psd_list[i].estimate(data[i] - y_gw_list[i], wind='hanning')
          for i in range(len(data))]
         # Calculate the spectrum in the estimation band
-        sn = [psd.calculate(self.f[self.inds]) for psd in self.psd_list]
+        sn = [psd.calculate(self.f[self.band]) for psd in self.psd_list]
         # It is currently x fs / 2. Should correct for that.
         
         return sn
@@ -780,15 +902,14 @@ class LogLike(object):
         # Impute missing data
         y_imp = self.model.impute(self.data)
         # Transform back to Fourier domain, applying the windowing for complete
-        # time series, with re-scaling
-        resc = self.del_t * self.resc_full
-        data_dft = [fft(y_imp0 * self.wd_full)[self.inds] * resc
-                    for y_imp0 in y_imp]
+        # time series, with re-scaling. Only the contribution of the imputed
+        # values is computed.
+        data_dft = list(self.dft_update.transform(y_imp))
         # self.data_dft = data_dft[:]
         
         return y_imp, data_dft
     
-    def compute_signal(self, par):
+    def compute_signal(self, par, sel=None):
         """
         Compute the GW signal in the frequency domain
 
@@ -797,6 +918,9 @@ class LogLike(object):
         par : array_like
             array of sampling parameters 
             [Mc, q, tc, chi1, chi2, logDL, ci, sb, lam, psi, phi0]
+        sel : slice or None
+            positions in the analysis band where the signal is computed. 
+            If None, the full band is used.
 
         Returns
         -------
@@ -810,11 +934,37 @@ class LogLike(object):
 
         """
         
-        return self.signal_func(par, self.f[self.inds], 
+        if sel is None:
+            sel = slice(None)
+
+        return self.signal_func(par, self.f_band[sel], 
                                 *self.signal_args,
                                 **self.signal_kwargs)
         
-    def compute_signal_reduced(self, par_intr, data_dft, sn):
+    def compute_signal_batch(self, pars):
+        """
+        Compute the GW signals of a batch of parameter vectors on the full 
+        analysis band, with signal_batch_func if provided.
+
+        Parameters
+        ----------
+        pars : ndarray
+            array of sampling parameters of size n x ndim
+
+        Returns
+        -------
+        signals : ndarray
+            frequency-domain signals, size n x n_ch x nf
+
+        """
+
+        pars = np.atleast_2d(pars)
+        if self.signal_batch_func is None:
+            return np.array([self.compute_signal(par) for par in pars])
+
+        return self.signal_batch_func(pars)
+
+    def compute_signal_reduced(self, par_intr, data_dft, sn, sel=None):
         """
 
         Parameters
@@ -827,6 +977,9 @@ class LogLike(object):
             of interest
         sn : list of ndarrays
             list of noise PSDs computed at freq for each channel
+        sel : slice or None
+            positions in the analysis band where the signal is computed. 
+            If None, the full band is used.
 
         Returns
         -------
@@ -834,10 +987,240 @@ class LogLike(object):
             list of complex GW strains for each channel
 
         """
-        return self.signal_reduced_func(par_intr, self.f[self.inds], data_dft,
-                                        sn, 
+
+        if sel is None:
+            return self.signal_reduced_func(par_intr, self.f_band, data_dft,
+                                            sn, 
+                                            *self.signal_args,
+                                            **self.signal_kwargs)
+
+        return self.signal_reduced_func(par_intr, self.f_band[sel], 
+                                        [d[sel] for d in data_dft],
+                                        [s[sel] for s in sn], 
                                         *self.signal_args,
                                         **self.signal_kwargs)
+
+    def template_support(self, par, reduced=False):
+        """
+        Positions of the analysis band where the template is not negligible.
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters (intrinsic parameters if reduced 
+            is True)
+        reduced : bool
+            whether par is an intrinsic parameter vector
+
+        Returns
+        -------
+        sel : slice or None
+            slice of the analysis band covering the template support, or None
+            if no support function was provided.
+
+        """
+
+        support_func = self.support_reduced_func if reduced \
+            else self.support_func
+        if support_func is None:
+            return None
+        f_min, f_max = support_func(par, *self.signal_args,
+                                    **self.signal_kwargs)
+        i_min = np.searchsorted(self.f_band, f_min, side='left')
+        i_max = np.searchsorted(self.f_band, f_max, side='right')
+
+        return slice(i_min, max(i_min, i_max))
+
+    def template_key(self, par, par_aux, reduced=False):
+        """
+        Key of a template in the template cache, or None if the cache is 
+        disabled. Reduced templates also depend on the data and the PSD, 
+        which are identified by the version of the current auxiliary 
+        parameters; they are not cached if par_aux is not the current 
+        auxiliary parameter vector.
+        """
+
+        if self.template_cache_size == 0:
+            return None
+        key = (reduced, np.asarray(par, dtype=float).tobytes())
+        if reduced:
+            if par_aux is not self.aux_ref:
+                return None
+            key += (self.aux_version,)
+
+        return key
+
+    def cached_template(self, key):
+        """
+        Template cache entry for a given key, or None if it is not stored.
+        """
+
+        if key is None:
+            return None
+        entry = self.template_cache.get(key)
+        if entry is not None:
+            self.template_cache.move_to_end(key)
+
+        return entry
+
+    def store_template(self, key, entry):
+        """
+        Store a template entry in the cache, discarding the least recently 
+        used one if the cache is full.
+        """
+
+        if key is None:
+            return
+        self.template_cache[key] = entry
+        if len(self.template_cache) > self.template_cache_size:
+            self.template_cache.popitem(last=False)
+
+    def template_entry(self, par, par_aux=None, reduced=False):
+        """
+        Compute a template or get it from the template cache.
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters (intrinsic parameters if reduced 
+            is True)
+        par_aux :  ndarray
+            auxiliary parameters, used to compute reduced templates.
+        reduced : bool
+            whether to compute the template with signal_reduced_func
+
+        Returns
+        -------
+        entry : dict
+            dictionary with keys 'signal' (list of frequency-domain 
+            waveforms), 'sel' (positions of the band where they are 
+            computed, or None) and 'time' (list of time-domain waveforms, 
+            or None if not computed yet).
+
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        key = self.template_key(par, par_aux, reduced=reduced)
+        entry = self.cached_template(key)
+        if entry is not None:
+            return entry
+
+        if (self.narrowband_func is not None) & (not reduced):
+            entry = self.narrowband_entry(par)
+            self.store_template(key, entry)
+            return entry
+        sel = self.template_support(par, reduced=reduced)
+        if (sel is not None) and (sel.stop == sel.start):
+            # The template vanishes on the analysis band
+            signal = np.zeros((self.n_ch, 0), dtype=np.complex128)
+        elif reduced:
+            data_dft, sn = self.get_auxiliary_params(par_aux)
+            signal = self.compute_signal_reduced(par, data_dft, sn, sel=sel)
+        else:
+            signal = self.compute_signal(par, sel=sel)
+        entry = {'signal': signal, 'sel': sel, 'time': None}
+        self.store_template(key, entry)
+
+        return entry
+
+    def narrowband_entry(self, par):
+        """
+        Compute a template with the narrowband generator and restrict it to 
+        the analysis band.
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters
+
+        Returns
+        -------
+        entry : dict
+            template entry, as returned by template_entry.
+
+        """
+
+        i_start, values = self.narrowband_func(par, *self.signal_args, 
+                                               **self.signal_kwargs)
+        values = np.atleast_2d(values)
+        # Positions of the template bins in the analysis band
+        i_min = np.searchsorted(self.inds, i_start, side='left')
+        i_max = np.searchsorted(self.inds, i_start + values.shape[1], 
+                                side='left')
+        i_max = max(i_min, i_max)
+        if isinstance(self.band, slice):
+            cols = slice(self.inds[0] + i_min - i_start, 
+                         self.inds[0] + i_max - i_start)
+        else:
+            cols = self.inds[i_min:i_max] - i_start
+
+        return {'signal': values[:, cols], 'sel': slice(i_min, i_max), 
+                'time': None}
+
+    def template_entries(self, pars, par_aux=None):
+        """
+        Templates of a batch of full parameter vectors. If a batched waveform 
+        generator is available, the templates missing from the cache are 
+        computed in a single call.
+
+        Parameters
+        ----------
+        pars : ndarray
+            array of waveform parameters of size n_walkers x ndim
+        par_aux :  ndarray
+            auxiliary parameters
+
+        Returns
+        -------
+        entries : list of dict
+            template entries, as returned by template_entry.
+
+        """
+
+        pars = np.atleast_2d(pars)
+        if (self.signal_batch_func is None) | (self.support_func is not None) \
+                | (self.narrowband_func is not None):
+            return [self.template_entry(par, par_aux=par_aux) for par in pars]
+        if par_aux is None:
+            par_aux = self.par_aux
+        keys = [self.template_key(par, par_aux) for par in pars]
+        entries = [self.cached_template(key) for key in keys]
+        missing = [k for k in range(len(entries)) if entries[k] is None]
+        if len(missing) > 0:
+            signals = self.compute_signal_batch(pars[missing])
+            for k, signal in zip(missing, signals):
+                entries[k] = {'signal': signal, 'sel': None, 'time': None}
+                self.store_template(keys[k], entries[k])
+
+        return entries
+
+    def time_template(self, par, par_aux=None, reduced=False):
+        """
+        Time-domain template, computed from the frequency-domain template and
+        kept in the template cache.
+
+        Returns
+        -------
+        y_gw_list : list[ndarray]
+            list of time-domain waveforms (one for each channel), 
+            without windowing.
+
+        """
+
+        entry = self.template_entry(par, par_aux=par_aux, reduced=reduced)
+        if entry['time'] is None:
+            signal = entry['signal']
+            if entry['sel'] is not None:
+                # Templates computed on their support only
+                signal_band = np.zeros((len(signal), self.nf), 
+                                       dtype=np.complex128)
+                signal_band[:, entry['sel']] = signal
+                signal = signal_band
+            entry['time'] = [self.frequency_to_time(y_gw_fft_pos)
+                             for y_gw_fft_pos in signal]
+
+        return entry['time']
         
 
     def update_auxiliary_params(self, par, par_aux, 
@@ -860,28 +1243,27 @@ class LogLike(object):
         update_psd : bool, optional
             If True, perform PSD estimation step to update PSD
         """
-        # Extract Fourier-domain data
-        data_dft = [par_aux[i*self.nf:(i+1)*self.nf] 
-                    for i in range(len(self.channels))]
-        # Extract PSD
-        sn = [par_aux[i*self.nf:(i+1)*self.nf] 
-                for i in range(2, 2 + len(self.channels))]
+        # Extract Fourier-domain data and PSD (views of par_aux)
+        data_dft, sn = self.get_auxiliary_params(par_aux)
 
         if (self.psd_list is not None) | (self.model is not None):
-            # Compute waveform template in the frequency domain
-            if reduced:
-                at, et = self.compute_signal_reduced(par, data_dft, sn)
-            else:
-                at, et = self.compute_signal(par)
-            # Convert the signal in the time domain (factor 1 / del_t incluced)
-            y_gw_list = [self.frequency_to_time(y_gw_fft_pos)
-                         for y_gw_fft_pos in [at, et]]
+            # Waveform template in the time domain (factor 1 / del_t incluced),
+            # reused from the last likelihood evaluations when possible
+            y_gw_list = self.time_template(par, par_aux=par_aux, 
+                                           reduced=reduced)
         # Update missing data if requested
         if update_mis:
             data, data_dft = self.update_missing_data(y_gw_list)
         else:
             data = self.data[:]
         # Update PSD if requested
+        if update_psd & (not update_mis) & self.spline_psd():
+            # Only the PSD changes: update the likelihood quantities where 
+            # the spline coefficients moved
+            coeffs_list = [psd.fit_coeffs(data[i] - y_gw_list[i], 
+                                          wind='hanning')
+                           for i, psd in enumerate(self.psd_list)]
+            return self.update_psd_coeffs(par_aux, coeffs_list)
         if update_psd:
             sn = self.update_psd(y_gw_list, data)
             if update_mis:
@@ -890,8 +1272,333 @@ class LogLike(object):
                 # Pre-compute quantities depending on PSD
                 self.model.compute_offline()
 
-        # Encapsulate auxiliary parameters lists
-        return np.concatenate(data_dft + sn)
+        # Encapsulate auxiliary parameters lists in a new contiguous vector
+        par_aux_new = np.empty(2 * self.n_ch * self.nf, dtype=np.complex128)
+        aux = par_aux_new.reshape((2 * self.n_ch, self.nf))
+        for i in range(self.n_ch):
+            aux[i] = data_dft[i]
+            aux[self.n_ch + i] = sn[i]
+
+        return par_aux_new
+
+    def get_auxiliary_params(self, par_aux):
+        """
+        Extract the data DFTs and the PSDs from the auxiliary parameter 
+        vector, without copying it.
+
+        Parameters
+        ----------
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to 
+            the band of interest + PSD values in the same band, of size 
+            2 n_ch n_freq. If None, the likelihood's own data are used.
+
+        Returns
+        -------
+        data_dft : ndarray
+            windowed frequency-domain data, size n_ch x n_freq
+        sn : ndarray
+            PSDs, size n_ch x n_freq
+
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        aux = np.reshape(par_aux, (2 * self.n_ch, self.nf))
+
+        return aux[0:self.n_ch], aux[self.n_ch:].real
+
+    def set_auxiliary_params(self, par_aux, changed=None):
+        """
+        Update the pre-whitened data, the inverse-PSD weights and the 
+        normalization used in the likelihood. Nothing is computed if par_aux 
+        is the same object as in the previous call, so auxiliary parameter 
+        vectors should not be modified in place.
+
+        Parameters
+        ----------
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to 
+            the band of interest + PSD values in the same band. If None, the 
+            likelihood's own data are used.
+        changed : list of tuples, optional
+            list of (channel index, slice) pairs. If provided, par_aux is 
+            assumed to differ from the previous auxiliary parameters only in 
+            the PSD values of these channels and frequency slices, and the 
+            cached quantities are updated there only. In that case, par_aux
+            may also be the previous vector modified in place.
+
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        if (par_aux is not self.aux_ref) | (changed is not None):
+            data_dft, sn = self.get_auxiliary_params(par_aux)
+            if (changed is None) | (self.aux_ref is None):
+                # Inverse-PSD weights
+                self.weights = 1 / sn
+                # Pre-whitened data
+                self.data_w = data_dft * self.weights
+                # Log-determinant and data norm of each channel
+                self.log_det = np.sum(np.log(sn), axis=1)
+                self.data_norm = np.sum(np.real(np.conj(data_dft) 
+                                                * self.data_w), axis=1)
+            else:
+                for i, sl in changed:
+                    # Remove the previous contributions of the interval
+                    self.log_det[i] += np.sum(np.log(self.weights[i, sl]))
+                    self.data_norm[i] -= np.sum(
+                        np.real(np.conj(data_dft[i, sl]) * self.data_w[i, sl]))
+                    self.weights[i, sl] = 1 / sn[i, sl]
+                    self.data_w[i, sl] = data_dft[i, sl] * self.weights[i, sl]
+                    self.log_det[i] += np.sum(np.log(sn[i, sl]))
+                    self.data_norm[i] += np.sum(
+                        np.real(np.conj(data_dft[i, sl]) * self.data_w[i, sl]))
+            self.aux_ref = par_aux
+            self.aux_version += 1
+            self.update_log_norm()
+
+    def update_log_norm(self):
+        """
+        Update the normalizing constant of the log-likelihood from the 
+        current log-determinants and data norms, if the likelihood is 
+        normalized (see log_norm).
+        """
+
+        if self.normalized:
+            self.ll_norm = (- self.nf/2 * np.log(2 * np.pi * 2 * self.del_t)
+                            - 0.5 * np.sum(self.log_det) 
+                            - 0.5 * np.sum(self.data_norm))
+
+    def frequency_slices(self, intervals):
+        """
+        Convert frequency intervals into slices of the analysis band.
+
+        Parameters
+        ----------
+        intervals : list of tuples
+            list of frequency intervals (f_low, f_high)
+
+        Returns
+        -------
+        slices : list of slices
+            non-empty slices of the band frequencies f_low <= f <= f_high
+
+        """
+
+        slices = []
+        for f_low, f_high in intervals:
+            i0 = np.searchsorted(self.f_band, f_low, side='left')
+            i1 = np.searchsorted(self.f_band, f_high, side='right')
+            if i1 > i0:
+                slices.append(slice(i0, i1))
+
+        return slices
+
+    def update_psd_intervals(self, par_aux, intervals_list, inplace=False):
+        """
+        Update the PSD part of the auxiliary parameters after a local change 
+        of the PSD models (e.g. a move of one spline coefficient, see 
+        psdmodel.PSDSpline.update_coeffs), recomputing the PSD values and 
+        the likelihood quantities only over the frequency intervals that 
+        were modified.
+
+        Parameters
+        ----------
+        par_aux : ndarray
+            current auxiliary parameters
+        intervals_list : list
+            list of frequency intervals (f_low, f_high) where the PSD model 
+            of each channel changed
+        inplace : bool
+            if True, par_aux is modified in place instead of being copied, 
+            so that the cost only depends on the size of the intervals. 
+            Auxiliary parameter vectors held elsewhere (e.g. by a sampler) 
+            then change as well.
+
+        Returns
+        -------
+        par_aux_new : ndarray
+            updated auxiliary parameters
+
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        self.set_auxiliary_params(par_aux)
+        par_aux_new = par_aux if inplace else np.copy(par_aux)
+        aux = par_aux_new.reshape((2 * self.n_ch, self.nf))
+        changed = []
+        for i, intervals in enumerate(intervals_list):
+            for sl in self.frequency_slices(intervals):
+                aux[self.n_ch + i, sl] = self.psd_list[i].calculate(
+                    self.f_band[sl])
+                changed.append((i, sl))
+        self.set_auxiliary_params(par_aux_new, changed=changed)
+
+        return par_aux_new
+
+    def spline_psd(self):
+        """
+        Whether all PSD models are fitted splines that report the frequency 
+        intervals where they change (see psdmodel.PSDSpline.update_coeffs).
+        """
+
+        if self.psd_list is None:
+            return False
+
+        return all([hasattr(psd, 'update_coeffs') 
+                    and (psd.log_psd_fn is not None)
+                    for psd in self.psd_list])
+
+    def update_psd_coeffs(self, par_aux, coeffs_list):
+        """
+        Set the spline coefficients of the PSD models and update the 
+        auxiliary parameters over the frequency intervals where the PSDs 
+        changed only.
+
+        Parameters
+        ----------
+        par_aux : ndarray
+            current auxiliary parameters
+        coeffs_list : list of ndarrays
+            new spline coefficients of the PSD model of each channel
+
+        Returns
+        -------
+        par_aux_new : ndarray
+            updated auxiliary parameters
+
+        """
+
+        intervals_list = [psd.update_coeffs(coeffs) for psd, coeffs 
+                          in zip(self.psd_list, coeffs_list)]
+
+        return self.update_psd_intervals(par_aux, intervals_list)
+
+    def local_psd_likelihood(self):
+        """
+        Whether the log-likelihood is a sum of independent contributions of 
+        the band frequencies, so that the effect of a local PSD change can 
+        be computed on the modified frequencies only.
+        """
+
+        return (type(self).log_likelihood is LogLike.log_likelihood) & (
+            not self.gap_convolution)
+
+    def interval_log_likelihood(self, entry, i, slices):
+        """
+        Contribution of some frequencies of one channel to the normalized 
+        log-likelihood of a template, with the current auxiliary parameters.
+
+        Parameters
+        ----------
+        entry : dict
+            template entry, as returned by template_entry
+        i : int
+            channel index
+        slices : list of slices
+            positions in the analysis band
+
+        Returns
+        -------
+        ll : float
+            sum of the log-likelihood terms over the slices
+
+        """
+
+        data_dft = self.get_auxiliary_params(self.aux_ref)[0]
+        sel = entry['sel']
+        ll = 0
+        for sl in slices:
+            # Template values on the slice, zero outside its support
+            if sel is None:
+                h = entry['signal'][i][sl]
+            else:
+                h = np.zeros(sl.stop - sl.start, dtype=np.complex128)
+                i0 = max(sl.start, sel.start)
+                i1 = min(sl.stop, sel.stop)
+                if i1 > i0:
+                    h[i0 - sl.start:i1 - sl.start] = \
+                        entry['signal'][i][i0 - sel.start:i1 - sel.start]
+            weights = self.weights[i, sl]
+            data_w = self.data_w[i, sl]
+            ll += 4.0 * self.df * (
+                np.real(np.vdot(h, data_w))
+                - 0.5 * np.dot(h.real ** 2 + h.imag ** 2, weights))
+            # Normalization terms
+            ll += 0.5 * np.sum(np.log(weights)) - 0.5 * np.real(
+                np.vdot(data_dft[i, sl], data_w))
+
+        return ll
+
+    def psd_coeff_step(self, par, i, j, scale, par_aux=None, rng=None):
+        """
+        Metropolis-Hastings step on one spline coefficient of the PSD model 
+        of a channel, conditional on the waveform parameters, with a flat 
+        prior on the coefficient. The coefficient only changes the PSD over 
+        D + 1 knot intervals, where the PSD model and the auxiliary 
+        parameters are updated in place, so that the cost of the step does 
+        not depend on the size of the band (if local_psd_likelihood() is 
+        True and the template is cached).
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters
+        i : int
+            channel index
+        j : int
+            index of the spline coefficient
+        scale : float
+            standard deviation of the Gaussian proposal
+        par_aux : ndarray or None
+            auxiliary parameters, modified in place. Default is the 
+            likelihood's own auxiliary parameters.
+        rng : numpy.random.Generator or None
+            random number generator
+
+        Returns
+        -------
+        accepted : bool
+            whether the proposed coefficient was accepted
+
+        """
+
+        if not self.normalized:
+            raise ValueError("The PSD can only be sampled with a normalized "
+                             "likelihood.")
+        if par_aux is None:
+            par_aux = self.par_aux
+        if rng is None:
+            rng = np.random.default_rng()
+        self.set_auxiliary_params(par_aux)
+        psd = self.psd_list[i]
+        coeffs = np.array(psd.get_spline_control_points(), dtype=float)
+        coeffs_new = coeffs.copy()
+        coeffs_new[j] += scale * rng.standard_normal()
+        local = self.local_psd_likelihood()
+        if local:
+            entry = self.template_entry(par, par_aux)
+        else:
+            ll_old = self.log_likelihood(par, par_aux)
+        intervals_list = [[] for k in range(self.n_ch)]
+        intervals_list[i] = psd.update_coeffs(coeffs_new)
+        if local:
+            slices = self.frequency_slices(intervals_list[i])
+            ll_old = self.interval_log_likelihood(entry, i, slices)
+        self.update_psd_intervals(par_aux, intervals_list, inplace=True)
+        if local:
+            ll_new = self.interval_log_likelihood(entry, i, slices)
+        else:
+            ll_new = self.log_likelihood(par, par_aux)
+        if np.log(rng.uniform()) < ll_new - ll_old:
+            return True
+        # Rejected: restore the previous coefficients
+        psd.update_coeffs(coeffs)
+        self.update_psd_intervals(par_aux, intervals_list, inplace=True)
+
+        return False
 
     def log_norm(self, data_dft, sn):
         """
@@ -928,8 +1635,8 @@ class LogLike(object):
         """
 
         y_gw_fft = np.zeros(self.n_data, dtype=np.complex128)
-        y_gw_fft[self.inds] = y_gw_fft_pos
-        y_gw_fft[self.n_data - self.inds] = np.conj(y_gw_fft_pos)
+        y_gw_fft[self.band] = y_gw_fft_pos
+        y_gw_fft[self.band_neg] = np.conj(y_gw_fft_pos)
 
         return np.real(ifft(y_gw_fft))/self.del_t
     
@@ -948,14 +1655,9 @@ class LogLike(object):
             list of distorted frequency-domain waveforms for all channels.
         """
         
-        # Convert waveform to time domain
-        y_gw_list = [self.frequency_to_time(y_gw_fft_pos[i]) 
-                     for i in range(len(y_gw_fft_pos))]
-        # Apply mask window and Fourier transform back
-        y_gw_masked_fft = [fft(self.wd * dat)[self.inds] * self.del_t * self.resc
-                           for dat in y_gw_list]
-        
-        return y_gw_masked_fft
+        # Convolve the waveform DFT with the window DFT on the band
+        return [self.window_conv.apply(y_gw_fft_pos[i]) 
+                for i in range(len(y_gw_fft_pos))]
 
     def log_likelihood(self, par, par_aux):
         """
@@ -976,34 +1678,11 @@ class LogLike(object):
 
         """
 
-        if par_aux is None:
-            data_dft = self.data_dft
-            sn = self.sn
-        else:
-            data_dft = [par_aux[i*self.nf:(i+1)*self.nf] 
-                        for i in range(len(self.channels))]
-            sn = [par_aux[i*self.nf:(i+1)*self.nf] 
-                  for i in range(2, 2 + len(self.channels))]
-
-        # Compute waveform template
-        at, et = self.compute_signal(par)
-        # Convolve with gap window if requested
-        if self.gap_convolution:
-            at, et = self.apply_gap_convolution([at, et])
-
-        # (h | y)
-        sna = np.sum(np.real(data_dft[0] * np.conjugate(at)) / sn[0])
-        sne = np.sum(np.real(data_dft[1] * np.conjugate(et)) / sn[1])
-
-        # (h | h)
-        aa = np.sum(np.abs(at) ** 2 / sn[0])
-        ee = np.sum(np.abs(et) ** 2 / sn[1])
-
-        # (h | y) - 1/2 (h | h)
-        ll_a = 4.0 * self.df * (sna - 0.5*aa)
-        ll_e = 4.0 * self.df * (sne - 0.5*ee)
+        self.set_auxiliary_params(par_aux)
+        # Compute waveform template, restricted to its support
+        entry = self.template_entry(par, par_aux=par_aux)
 
-        return np.real(ll_a + ll_e + self.ll_norm)
+        return self.signal_log_likelihood(entry['signal'], sel=entry['sel'])
 
     # def compute_signal_reduced(self, par_intr, data_dft, sn):
     #     """
@@ -1071,31 +1750,1356 @@ class LogLike(object):
 
         """
         
-        if par_aux is None:
-            data_dft = self.data_dft
-            sn = self.sn
-        else:
-            data_dft = [par_aux[i*self.nf:(i+1)*self.nf] 
-                        for i in range(len(self.channels))]
-            sn = [par_aux[i*self.nf:(i+1)*self.nf] 
-                  for i in range(len(self.channels), 2*len(self.channels))]
+        self.set_auxiliary_params(par_aux)
+        # Compute the signal in the frequency domain, restricted to its support
+        entry = self.template_entry(par_intr, par_aux=par_aux, reduced=True)
+
+        return self.signal_log_likelihood(entry['signal'], sel=entry['sel'])
+
+    def signal_log_likelihood(self, signal, sel=None):
+        """
+        Log-likelihood of a template given the current pre-whitened data and 
+        inverse-PSD weights.
+
+        Parameters
+        ----------
+        signal : list[ndarray]
+            list of frequency-domain waveforms (one for each channel)
+        sel : slice or None
+            positions in the analysis band where the waveforms are given. 
+            The template is assumed to vanish elsewhere. If None, the 
+            waveforms cover the full band.
 
-        # Compute the signal in the frequency domain
-        at, et = self.compute_signal_reduced(par_intr, data_dft, sn)
+        Returns
+        -------
+        ll : float
+            log-likekihood
+
+        """
+
+        if sel is None:
+            sel = slice(None)
         # Convolve with gap window if requested
         if self.gap_convolution:
-            at, et = self.apply_gap_convolution([at, et])
+            if sel != slice(None):
+                # The window spreads the template outside its support
+                signal_band = np.zeros((len(signal), self.nf), 
+                                       dtype=np.complex128)
+                signal_band[:, sel] = signal
+                signal = signal_band
+                sel = slice(None)
+            signal = self.apply_gap_convolution(signal)
+
+        ll = 0
+        for i in range(len(signal)):
+            # (h | y) - 1/2 (h | h)
+            ll += np.real(np.vdot(signal[i], self.data_w[i, sel]))
+            ll -= 0.5 * np.dot(signal[i].real ** 2 + signal[i].imag ** 2,
+                               self.weights[i, sel])
+
+        return 4.0 * self.df * ll + np.real(self.ll_norm)
+
+    def log_likelihood_batch(self, pars, par_aux=None):
+        """
+        Log-likelihood of a batch of parameter vectors, for instance all the
+        walkers of an ensemble sampler.
 
-        # (h | y)
-        sna = np.sum(np.real(data_dft[0] * np.conjugate(at)) / sn[0])
-        sne = np.sum(np.real(data_dft[1] * np.conjugate(et)) / sn[1])
+        Parameters
+        ----------
+        pars : ndarray
+            array of waveform parameters of size n_walkers x ndim, with 
+            parameters in the same order as in log_likelihood.
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to the 
+            band of interest + PSD values in the same band.
 
-        # (h | h)
-        aa = np.sum(np.abs(at) ** 2 / sn[0])
-        ee = np.sum(np.abs(et) ** 2 / sn[1])
+        Returns
+        -------
+        ll : ndarray
+            log-likelihood values, size n_walkers
 
-        # (h | y) - 1/2 (h | h)
-        ll_a = 4.0 * self.df * (sna - 0.5 * aa)
-        ll_e = 4.0 * self.df * (sne - 0.5 * ee)
+        """
+
+        sparse = (self.support_func is not None) \
+            | (self.narrowband_func is not None)
+        if sparse & self.gap_convolution:
+            # The window spreads the templates outside their supports
+            return np.array([self.log_likelihood(par, par_aux)
+                             for par in np.atleast_2d(pars)])
+        self.set_auxiliary_params(par_aux)
+        entries = self.template_entries(pars, par_aux=par_aux)
+        if sparse:
+            # Templates restricted to different supports
+            return self.sparse_log_likelihood(entries)
+        # Stack all templates in a n_walkers x n_channels x n_freq array
+        signals = [entry['signal'] for entry in entries]
+
+        return self.stacked_log_likelihood(signals)
+
+    def log_likelihood_reduced_batch(self, pars_intr, par_aux=None):
+        """
+        Reduced log-likelihood of a batch of intrinsic parameter vectors.
+
+        Parameters
+        ----------
+        pars_intr : ndarray
+            array of intrinsic waveform parameters of size n_walkers x ndim, 
+            with parameters in the same order as in log_likelihood_reduced.
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to the 
+            band of interest + PSD values in the same band.
+
+        Returns
+        -------
+        ll : ndarray
+            log-likelihood values, size n_walkers
+
+        """
+
+        if (self.support_reduced_func is not None) & self.gap_convolution:
+            # The window spreads the templates outside their supports
+            return np.array([self.log_likelihood_reduced(par_intr, par_aux)
+                             for par_intr in np.atleast_2d(pars_intr)])
+        self.set_auxiliary_params(par_aux)
+        entries = [self.template_entry(par_intr, par_aux=par_aux, reduced=True)
+                   for par_intr in np.atleast_2d(pars_intr)]
+        if self.support_reduced_func is not None:
+            # Templates restricted to different supports
+            return self.sparse_log_likelihood(entries)
+
+        return self.stacked_log_likelihood([entry['signal'] 
+                                            for entry in entries])
+
+    def stacked_log_likelihood(self, signals):
+        """
+        Compute the log-likelihoods of several templates at once, with the 
+        noise-weighted inner products performed as stacked array operations.
+
+        Parameters
+        ----------
+        signals : list
+            list of templates, each template being a list of frequency-domain
+            waveforms (one for each channel)
+
+        Returns
+        -------
+        ll : ndarray
+            log-likelihood values, one for each template
+
+        """
+
+        # Convolve with gap window if requested
+        if self.gap_convolution:
+            signals = [self.apply_gap_convolution(sig) for sig in signals]
+        h = np.asarray(signals)
+        n_ch = h.shape[1]
+        # (h | y)
+        hy = np.real(np.einsum('wcf,cf->w', h.conj(), self.data_w[0:n_ch]))
+        # (h | h)
+        hh = np.einsum('wcf,cf->w', h.real ** 2 + h.imag ** 2, 
+                       self.weights[0:n_ch])
+
+        # (h | y) - 1/2 (h | h)
+        return 4.0 * self.df * (hy - 0.5 * hh) + np.real(self.ll_norm)
+
+    def sparse_log_likelihood(self, entries):
+        """
+        Compute the log-likelihoods of several templates restricted to 
+        different supports at once. The templates are stacked in an array 
+        whose width is the largest support size, and only the data and 
+        weights at their supports are gathered, so that the cost does not 
+        depend on the total bandwidth.
+
+        Parameters
+        ----------
+        entries : list of dict
+            template entries, as returned by template_entry
+
+        Returns
+        -------
+        ll : ndarray
+            log-likelihood values, one for each template
+
+        """
+
+        sels = [slice(0, self.nf) if entry['sel'] is None else entry['sel'] 
+                for entry in entries]
+        starts = np.array([sel.start for sel in sels], dtype=int)
+        widths = np.array([sel.stop - sel.start for sel in sels], dtype=int)
+        n_ch = len(entries[0]['signal'])
+        width = max(np.max(widths), 1)
+        # Zero-padded templates, size n_walkers x n_channels x width
+        h = np.zeros((len(entries), n_ch, width), dtype=np.complex128)
+        for k, entry in enumerate(entries):
+            h[k, :, 0:widths[k]] = entry['signal']
+        # Band positions of the stacked templates, padding included
+        pos = np.minimum(starts[:, np.newaxis] + np.arange(width), 
+                         self.nf - 1)
+        # (h | y)
+        hy = np.real(np.einsum('wcf,cwf->w', h.conj(), 
+                               self.data_w[0:n_ch, pos]))
+        # (h | h)
+        hh = np.einsum('wcf,cwf->w', h.real ** 2 + h.imag ** 2, 
+                       self.weights[0:n_ch, pos])
+
+        # (h | y) - 1/2 (h | h)
+        return 4.0 * self.df * (hy - 0.5 * hh) + np.real(self.ll_norm)
+
+
+class RelativeBinningLogLike(LogLike):
+
+    def __init__(self, data, sn, inds, tobs, del_t,
+                 signal_func,
+                 signal_reduced_func,
+                 par_fid,
+                 design_matrix_func=None,
+                 eps=0.1,
+                 h0_tol=1e-10,
+                 **kwargs):
+        """
+        Heterodyned (relative-binning) version of the log-likelihood. The 
+        ratio between the template and a fiducial waveform is assumed to be 
+        linear in frequency within coarse bins, so that the likelihood only 
+        requires waveforms at the bin edges, and summary data pre-computed on
+        the full band.
+
+        Parameters
+        ----------
+        data, sn, inds, tobs, del_t, signal_func, signal_reduced_func : 
+            see LogLike
+        par_fid : array_like
+            full waveform parameter vector of the fiducial waveform, in the 
+            same order as in log_likelihood. It should be close to the 
+            maximum likelihood.
+        design_matrix_func : callable, optional
+            function taking as input the intrinsic sampling parameter vector 
+            and a frequency vector (plus signal_args and signal_kwargs), and
+            outputing a list of F-statistics design matrices of size 
+            n_freq x p (one for each channel). Required by 
+            log_likelihood_reduced.
+        eps : float
+            maximum dephasing allowed in each bin, see relative_binning_edges
+        h0_tol : float
+            relative amplitude below which the fiducial waveform is 
+            considered to vanish. The bins are restricted to the support of 
+            the fiducial waveform, and the bin edges where it vanishes in any
+            channel are removed, since the template ratio is undefined there.
+            Outside this support, the template is assumed to vanish as the 
+            fiducial waveform.
+        **kwargs : 
+            other keyword arguments of LogLike
+
+        """
+
+        # Summary data are computed once the fiducial waveform is known
+        self.h0_edges = None
+
+        super(RelativeBinningLogLike, self).__init__(data, sn, inds, tobs, 
+                                                     del_t,
+                                                     signal_func,
+                                                     signal_reduced_func,
+                                                     **kwargs)
+        if self.gap_convolution:
+            raise ValueError("Relative binning does not support gap convolution.")
+        
+        self.par_fid = par_fid
+        self.design_matrix_func = design_matrix_func
+        # Fiducial waveform on the full band
+        f_band = self.f[self.band]
+        self.h0 = np.asarray(self.compute_signal(par_fid))
+        h0_abs = np.abs(self.h0)
+        valid = np.all(h0_abs > h0_tol * np.max(h0_abs, axis=1, 
+                                                keepdims=True), axis=0)
+        i_valid = np.where(valid)[0]
+        if i_valid.shape[0] < 2:
+            raise ValueError("The fiducial waveform vanishes on the "
+                             "analysis band.")
+        # Coarse frequency bins on the fiducial support, without the edges 
+        # where the fiducial waveform vanishes
+        i_edges = i_valid[0] + relative_binning_edges(
+            f_band[i_valid[0]:i_valid[-1] + 1], eps=eps)
+        self.i_edges = i_edges[valid[i_edges]]
+        self.f_edges = f_band[self.i_edges]
+        self.n_bins = self.i_edges.shape[0] - 1
+        # Bin of each frequency of the band (the last bin is closed)
+        self.i_bins = np.clip(
+            np.searchsorted(self.i_edges, np.arange(f_band.shape[0]), 
+                            side='right') - 1, 0, self.n_bins - 1)
+        # Frequencies relative to the bin lower edges
+        self.f_rel = f_band - self.f_edges[self.i_bins]
+        # Fiducial waveform at the bin edges
+        self.h0_edges = self.h0[:, self.i_edges]
+        # Compute the summary data
+        self.aux_ref = None
+        self.set_auxiliary_params(self.par_aux)
+
+    def set_auxiliary_params(self, par_aux, changed=None):
+        """
+        Update the pre-whitened data, the inverse-PSD weights and the 
+        relative-binning summary data if par_aux changed. If the changed 
+        intervals are given, only the bins overlapping them are recomputed.
+
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        if (par_aux is not self.aux_ref) | (changed is not None):
+            incremental = (changed is not None) & (self.aux_ref is not None)
+            super(RelativeBinningLogLike, self).set_auxiliary_params(
+                par_aux, changed=changed)
+            if self.h0_edges is not None:
+                if incremental:
+                    for i, sl in changed:
+                        self.update_summary_data(i, sl)
+                else:
+                    self.compute_summary_data()
+
+    def bin_sum(self, x):
+        """
+        Sum an array of size n_ch x n_freq over each coarse bin.
+        """
+
+        return np.add.reduceat(x[..., 0:self.i_edges[-1] + 1], 
+                               self.i_edges[:-1], axis=-1)
+
+    def compute_summary_data(self):
+        """
+        Compute the relative-binning summary data from the current 
+        pre-whitened data and inverse-PSD weights, i.e. the bin sums of 
+        conj(h0) d / S and |h0|^2 / S weighted by powers of the frequency
+        offset from the bin lower edge.
+
+        """
+
+        n_ch = self.h0.shape[0]
+        h0_dw = np.conj(self.h0) * self.data_w[0:n_ch]
+        h0_w = (self.h0.real ** 2 + self.h0.imag ** 2) * self.weights[0:n_ch]
+        self.a0 = self.bin_sum(h0_dw)
+        self.a1 = self.bin_sum(h0_dw * self.f_rel)
+        self.b0 = self.bin_sum(h0_w)
+        self.b1 = self.bin_sum(h0_w * self.f_rel)
+        self.b2 = self.bin_sum(h0_w * self.f_rel ** 2)
+
+    def update_summary_data(self, i, sl):
+        """
+        Recompute the summary data of channel i in the bins overlapping the 
+        frequency slice sl of the band.
+
+        """
+
+        # Restrict the slice to the binned support
+        start = max(sl.start, self.i_edges[0])
+        stop = min(sl.stop, self.i_edges[-1] + 1)
+        if start >= stop:
+            return
+        b0 = self.i_bins[start]
+        b1 = self.i_bins[stop - 1] + 1
+        i0 = self.i_edges[b0]
+        i1 = self.i_edges[b1] if b1 < self.n_bins else self.i_edges[-1] + 1
+        ind = self.i_edges[b0:b1] - i0
+        h0 = self.h0[i, i0:i1]
+        f_rel = self.f_rel[i0:i1]
+        h0_dw = np.conj(h0) * self.data_w[i, i0:i1]
+        h0_w = (h0.real ** 2 + h0.imag ** 2) * self.weights[i, i0:i1]
+        self.a0[i, b0:b1] = np.add.reduceat(h0_dw, ind)
+        self.a1[i, b0:b1] = np.add.reduceat(h0_dw * f_rel, ind)
+        self.b0[i, b0:b1] = np.add.reduceat(h0_w, ind)
+        self.b1[i, b0:b1] = np.add.reduceat(h0_w * f_rel, ind)
+        self.b2[i, b0:b1] = np.add.reduceat(h0_w * f_rel ** 2, ind)
+
+    def heterodyne(self, signal_edges, h0_edges):
+        """
+        Compute the linear coefficients of the ratio between a waveform and 
+        the fiducial waveform in each bin.
+
+        Parameters
+        ----------
+        signal_edges : ndarray
+            waveform computed at the bin edges, size n_edges x ...
+        h0_edges : ndarray
+            fiducial waveform at the bin edges, broadcastable to signal_edges
+
+        Returns
+        -------
+        r0 : ndarray
+            ratio at the lower edge of each bin, size n_bins x ...
+        r1 : ndarray
+            slope of the ratio in each bin, size n_bins x ...
+
+        """
+
+        r = signal_edges / h0_edges
+        r1 = np.diff(r, axis=0) / np.diff(self.f_edges).reshape(
+            (-1,) + (1,) * (r.ndim - 1))
+        
+        return r[:-1], r1
+
+    def log_likelihood(self, par, par_aux):
+        """
+        Relative-binning approximation of LogLike.log_likelihood.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        signal = self.signal_func(par, self.f_edges, 
+                                  *self.signal_args,
+                                  **self.signal_kwargs)
+        ll = 0
+        for i in range(len(signal)):
+            r0, r1 = self.heterodyne(signal[i], self.h0_edges[i])
+            # (h | y)
+            ll += np.sum(np.real(self.a0[i] * np.conj(r0)
+                                 + self.a1[i] * np.conj(r1)))
+            # (h | h)
+            ll -= 0.5 * np.sum(self.b0[i] * np.abs(r0) ** 2
+                               + 2 * self.b1[i] * np.real(r0 * np.conj(r1))
+                               + self.b2[i] * np.abs(r1) ** 2)
+
+        return 4.0 * self.df * ll + np.real(self.ll_norm)
+
+    def log_likelihood_reduced(self, par_intr, par_aux):
+        """
+        Relative-binning approximation of LogLike.log_likelihood_reduced,
+        where the amplitudes are estimated by generalized least-squares from
+        the binned normal equations.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        mat_list = self.design_matrix_func(par_intr, self.f_edges,
+                                           *self.signal_args,
+                                           **self.signal_kwargs)
+        ll = 0
+        for i in range(len(mat_list)):
+            r0, r1 = self.heterodyne(mat_list[i], 
+                                     self.h0_edges[i][:, np.newaxis])
+            # Projection of the data on the basis
+            v = np.dot(r0.conj().T, self.a0[i]) + np.dot(r1.conj().T, 
+                                                         self.a1[i])
+            # Normal matrix
+            r0_b1 = r0 * self.b1[i][:, np.newaxis]
+            mat = np.dot((r0 * self.b0[i][:, np.newaxis]).conj().T, r0)
+            mat += np.dot(r0_b1.conj().T, r1) + np.dot(r1.conj().T, r0_b1)
+            mat += np.dot((r1 * self.b2[i][:, np.newaxis]).conj().T, r1)
+            amps = matrixalgebra.solve_normal(mat, v)
+            # (h | y) - 1/2 (h | h)
+            ll += np.real(np.vdot(amps, v)) 
+            ll -= 0.5 * np.real(np.vdot(amps, mat.dot(amps)))
+
+        return 4.0 * self.df * ll + np.real(self.ll_norm)
+
+    def log_likelihood_batch(self, pars, par_aux=None):
+        """
+        Relative-binning log-likelihoods of a batch of parameter vectors.
+
+        """
+
+        return np.array([self.log_likelihood(par, par_aux) 
+                         for par in np.atleast_2d(pars)])
+
+    def log_likelihood_reduced_batch(self, pars_intr, par_aux=None):
+        """
+        Relative-binning reduced log-likelihoods of a batch of intrinsic 
+        parameter vectors.
+
+        """
+
+        return np.array([self.log_likelihood_reduced(par_intr, par_aux) 
+                         for par_intr in np.atleast_2d(pars_intr)])
+
+
+def build_roq_bases(design_matrix_func, freq, lower_bounds, upper_bounds,
+                    n_train=1000, tol=1e-8, n_max=None,
+                    signal_args=[], signal_kwargs={}, rng=None):
+    """
+    Offline construction of the reduced-order quadrature (ROQ) bases used by
+    ROQLogLike. Training design matrices are drawn uniformly in the prior 
+    volume, and greedy reduced bases and empirical interpolants are built for
+    the design-matrix columns (linear part) and their pairwise products 
+    (quadratic part). All channels share the same bases.
+
+    The quadratic basis is trained on the real and imaginary parts of the 
+    products conj(M_k) M_l, so that it is real and spans the products in 
+    both orders (parts whose relative squared norm is below tol are 
+    skipped). The bases are extended after each training draw, so that 
+    the training set is never stored.
+
+    Parameters
+    ----------
+    design_matrix_func : callable
+        function taking as input the intrinsic sampling parameter vector 
+        and a frequency vector (plus signal_args and signal_kwargs), and
+        outputing a list of design matrices of size n_freq x p (one for 
+        each channel).
+    freq : ndarray
+        frequencies of the analysis band
+    lower_bounds : array_like
+        lower bounds of the intrinsic parameters
+    upper_bounds : array_like
+        upper bounds of the intrinsic parameters
+    n_train : int
+        number of training design matrices
+    tol : float
+        tolerance of the greedy algorithm (squared relative projection error)
+    n_max : int, optional
+        maximum number of basis vectors
+    signal_args : list
+        list of secondary arguments to pass to design_matrix_func
+    signal_kwargs : dictionnary
+        keyword arguments to pass to design_matrix_func
+    rng : numpy.random.Generator or None
+        random number generator used to draw the training parameters
+
+    Returns
+    -------
+    roq : dictionnary
+        nodes and interpolants of the linear and quadratic bases, 
+        with keys 'nodes_lin', 'interp_lin', 'nodes_quad', 'interp_quad'
+
+    Reference
+    ---------
+    Canizares, Priscilla et al., Accelerated gravitational-wave parameter 
+    estimation with reduced order modeling, 2015
+
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+    lo = np.asarray(lower_bounds)
+    hi = np.asarray(upper_bounds)
+    bases = {'lin': None, 'quad': None}
+
+    for j in range(n_train):
+        par_intr = lo + (hi - lo) * rng.uniform(size=lo.shape[0])
+        mat_list = design_matrix_func(par_intr, freq, 
+                                      *signal_args, **signal_kwargs)
+        train_lin = np.concatenate([mat.T for mat in mat_list])
+        prods = []
+        for mat in mat_list:
+            inds_k, inds_l = np.triu_indices(mat.shape[1])
+            prods.append((mat[:, inds_k].conj() * mat[:, inds_l]).T)
+        prods = np.concatenate(prods)
+        train_quad = np.concatenate([prods.real, prods.imag])
+        # Parts below the tolerance (e.g. rounding errors in the imaginary 
+        # part of |M_k|^2) would add spurious basis vectors
+        norms = np.sum(np.abs(train_quad) ** 2, axis=1)
+        train_quad = train_quad[norms > tol * np.tile(norms[0:prods.shape[0]]
+                                                      + norms[prods.shape[0]:],
+                                                      2)]
+        for key, train in zip(['lin', 'quad'], [train_lin, train_quad]):
+            bases[key] = matrixalgebra.greedy_basis(train, tol=tol, 
+                                                    n_max=n_max,
+                                                    basis=bases[key])
+
+    roq = {}
+    for key in ['lin', 'quad']:
+        roq['nodes_' + key], roq['interp_' + key] = \
+            matrixalgebra.empirical_interpolation(bases[key])
+
+    return roq
+
+
+class ROQLogLike(LogLike):
+
+    def __init__(self, data, sn, inds, tobs, del_t,
+                 signal_func,
+                 signal_reduced_func,
+                 design_matrix_func,
+                 roq,
+                 **kwargs):
+        """
+        Reduced-order quadrature version of the log-likelihood, where 
+        waveforms are only computed at the empirical interpolation nodes.
+
+        Parameters
+        ----------
+        data, sn, inds, tobs, del_t, signal_func, signal_reduced_func : 
+            see LogLike
+        design_matrix_func : callable
+            function taking as input the intrinsic sampling parameter vector 
+            and a frequency vector (plus signal_args and signal_kwargs), and
+            outputing a list of F-statistics design matrices of size 
+            n_freq x p (one for each channel).
+        roq : dictionnary
+            ROQ bases built on the frequencies of the band by build_roq_bases
+        **kwargs : 
+            other keyword arguments of LogLike
+
+        """
+
+        # ROQ weights are computed once the bases are known
+        self.roq = None
+
+        super(ROQLogLike, self).__init__(data, sn, inds, tobs, del_t,
+                                         signal_func,
+                                         signal_reduced_func,
+                                         **kwargs)
+        if self.gap_convolution:
+            raise ValueError("ROQ does not support gap convolution.")
+        
+        self.design_matrix_func = design_matrix_func
+        self.roq = roq
+        # Union of linear and quadratic nodes, to call waveforms only once
+        f_band = self.f[self.band]
+        nodes, inv = np.unique(np.concatenate([roq['nodes_lin'], 
+                                               roq['nodes_quad']]), 
+                               return_inverse=True)
+        self.f_nodes = f_band[nodes]
+        self.i_lin = inv[0:len(roq['nodes_lin'])]
+        self.i_quad = inv[len(roq['nodes_lin']):]
+        # Compute the ROQ weights
+        self.aux_ref = None
+        self.set_auxiliary_params(self.par_aux)
+
+    def set_auxiliary_params(self, par_aux, changed=None):
+        """
+        Update the pre-whitened data, the inverse-PSD weights and the 
+        ROQ weights if par_aux changed. If the changed intervals are given,
+        the ROQ weights are corrected by the contributions of these 
+        intervals only.
+
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        if (par_aux is not self.aux_ref) | (changed is not None):
+            if (changed is not None) & (self.aux_ref is not None) & (
+                    self.roq is not None):
+                # Previous values on the changed intervals
+                old = [(self.data_w[i, sl].copy(), self.weights[i, sl].copy())
+                       for i, sl in changed]
+                super(ROQLogLike, self).set_auxiliary_params(par_aux, 
+                                                             changed=changed)
+                for (i, sl), (dw_old, w_old) in zip(changed, old):
+                    self.w_lin[i] += np.dot(
+                        self.data_w[i, sl] - dw_old,
+                        self.roq['interp_lin'][:, sl].conj().T)
+                    self.w_quad[i] += np.dot(
+                        self.weights[i, sl] - w_old,
+                        self.roq['interp_quad'][:, sl].T)
+                return
+            super(ROQLogLike, self).set_auxiliary_params(par_aux, 
+                                                         changed=changed)
+            if self.roq is not None:
+                # Linear weights for (h | y)
+                self.w_lin = np.dot(self.data_w, 
+                                    self.roq['interp_lin'].conj().T)
+                # Quadratic weights for (h | h)
+                self.w_quad = np.dot(self.weights, self.roq['interp_quad'].T)
+
+    def log_likelihood(self, par, par_aux):
+        """
+        ROQ approximation of LogLike.log_likelihood.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        signal = self.signal_func(par, self.f_nodes, 
+                                  *self.signal_args,
+                                  **self.signal_kwargs)
+        ll = 0
+        for i in range(len(signal)):
+            # (h | y)
+            ll += np.real(np.vdot(signal[i][self.i_lin], self.w_lin[i]))
+            # (h | h)
+            ll -= 0.5 * np.real(np.sum(np.abs(signal[i][self.i_quad]) ** 2 
+                                       * self.w_quad[i]))
+
+        return 4.0 * self.df * ll + np.real(self.ll_norm)
+
+    def log_likelihood_reduced(self, par_intr, par_aux):
+        """
+        ROQ approximation of LogLike.log_likelihood_reduced, where the 
+        amplitudes are estimated by generalized least-squares from the 
+        ROQ normal equations.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        mat_list = self.design_matrix_func(par_intr, self.f_nodes,
+                                           *self.signal_args,
+                                           **self.signal_kwargs)
+        ll = 0
+        for i in range(len(mat_list)):
+            # Projection of the data on the basis
+            v = np.dot(mat_list[i][self.i_lin].conj().T, self.w_lin[i])
+            # Normal matrix
+            mat_q = mat_list[i][self.i_quad]
+            mat = np.dot(mat_q.conj().T * self.w_quad[i], mat_q)
+            amps = matrixalgebra.solve_normal(mat, v)
+            # (h | y) - 1/2 (h | h)
+            ll += np.real(np.vdot(amps, v)) 
+            ll -= 0.5 * np.real(np.vdot(amps, mat.dot(amps)))
+
+        return 4.0 * self.df * ll + np.real(self.ll_norm)
+
+    def log_likelihood_batch(self, pars, par_aux=None):
+        """
+        ROQ log-likelihoods of a batch of parameter vectors.
+
+        """
+
+        return np.array([self.log_likelihood(par, par_aux) 
+                         for par in np.atleast_2d(pars)])
+
+    def log_likelihood_reduced_batch(self, pars_intr, par_aux=None):
+        """
+        ROQ reduced log-likelihoods of a batch of intrinsic parameter 
+        vectors.
+
+        """
+
+        return np.array([self.log_likelihood_reduced(par_intr, par_aux) 
+                         for par_intr in np.atleast_2d(pars_intr)])
+
+
+class TimeMarginalizedLogLike(LogLike):
+
+    def __init__(self, data, sn, inds, tobs, del_t,
+                 signal_func,
+                 signal_reduced_func,
+                 tc_bounds,
+                 i_tc=2,
+                 tc_sign=1,
+                 maximize=False,
+                 upsampling=4,
+                 design_matrix_func=None,
+                 **kwargs):
+        """
+        Log-likelihood marginalized (or maximized) over the coalescence time.
+        The template is computed once at a reference time, and the overlaps 
+        with the data for all time shifts are obtained with one inverse FFT.
+        The sampling parameter vectors do not include the coalescence time.
+
+        Parameters
+        ----------
+        data, sn, inds, tobs, del_t, signal_func, signal_reduced_func : 
+            see LogLike
+        tc_bounds : array_like
+            lower and upper bounds of the (uniform) coalescence time prior.
+            Its width must be smaller than the data duration.
+        i_tc : int
+            index of the coalescence time in the full sampling parameter 
+            vector (same for the intrinsic parameter vector)
+        tc_sign : int
+            +1 if increasing tc by dt multiplies the template by 
+            exp(-2j pi f dt) (same convention as numpy's FFT), -1 if it 
+            multiplies it by exp(2j pi f dt). The lisabeta templates of 
+            waveforms.lisaresp (e.g. lisabeta_template) are conjugated after 
+            the lisabeta time shift, so that increasing Deltat multiplies them
+            by exp(2j pi f dt): they require tc_sign=-1.
+        maximize : bool
+            if True, the likelihood is maximized over tc instead of being 
+            marginalized
+        upsampling : int
+            oversampling factor of the time grid with respect to the 
+            highest frequency of the band
+        design_matrix_func : callable, optional
+            function taking as input the intrinsic sampling parameter vector 
+            and a frequency vector (plus signal_args and signal_kwargs), and
+            outputing a list of F-statistics design matrices of size 
+            n_freq x p (one for each channel). Required by 
+            log_likelihood_reduced.
+        **kwargs : 
+            other keyword arguments of LogLike
+
+        """
+
+        super(TimeMarginalizedLogLike, self).__init__(data, sn, inds, tobs, 
+                                                      del_t,
+                                                      signal_func,
+                                                      signal_reduced_func,
+                                                      **kwargs)
+        if self.gap_convolution:
+            raise ValueError("Time marginalization does not support gap convolution.")
+
+        self.i_tc = i_tc
+        self.tc_sign = tc_sign
+        self.maximize = maximize
+        self.design_matrix_func = design_matrix_func
+        # Reference coalescence time, at the center of the prior
+        self.tc_ref = 0.5 * (tc_bounds[0] + tc_bounds[1])
+        # Time grid of the inverse FFT, with period 1 / df
+        self.n_fft = next_fast_len(upsampling * (self.inds[-1] + 1))
+        taus = np.arange(self.n_fft) / (self.n_fft * self.df)
+        taus[taus >= 0.5 / self.df] -= 1 / self.df
+        # Restriction to the prior support, sorted in increasing time
+        j_tc = np.where((taus >= tc_bounds[0] - self.tc_ref) 
+                        & (taus <= tc_bounds[1] - self.tc_ref))[0]
+        self.j_tc = j_tc[np.argsort(taus[j_tc])]
+        self.tc_grid = self.tc_ref + taus[self.j_tc]
+
+    def insert_tc(self, par):
+        """
+        Insert the reference coalescence time in a parameter vector.
+        """
+
+        return np.insert(par, self.i_tc, self.tc_ref)
+
+    def shifted_sums(self, z):
+        """
+        Compute sum_f z(f) exp(2j pi f tau tc_sign) for all time shifts tau
+        of the grid.
+
+        Parameters
+        ----------
+        z : ndarray
+            values on the band, size ... x n_freq
+
+        Returns
+        -------
+        z_tau : ndarray
+            sums for all time shifts, size ... x n_tc
+
+        """
+
+        z_pad = np.zeros(z.shape[:-1] + (self.n_fft,), dtype=np.complex128)
+        if self.tc_sign > 0:
+            z_pad[..., self.inds] = z
+            return self.n_fft * ifft(z_pad, axis=-1)[..., self.j_tc]
+        else:
+            z_pad[..., self.inds] = np.conj(z)
+            return np.conj(self.n_fft * ifft(z_pad, axis=-1)[..., self.j_tc])
+
+    def shifted_sums_at(self, z, taus):
+        """
+        Compute sum_f z(f) exp(2j pi f tau tc_sign) for arbitrary time shifts
+        tau, by direct summation.
+
+        Parameters
+        ----------
+        z : ndarray
+            values on the band, size ... x n_freq
+        taus : ndarray
+            time shifts with respect to tc_ref, size n_tau
+
+        Returns
+        -------
+        z_tau : ndarray
+            sums for all time shifts, size ... x n_tau
+
+        """
+
+        f = self.inds * self.df
+        z_tau = np.empty(z.shape[:-1] + (taus.shape[0],), dtype=np.complex128)
+        # Blocks of time shifts, to bound the size of the exponential matrix
+        n_block = max(1, 2 ** 22 // f.shape[0])
+        for i0 in range(0, taus.shape[0], n_block):
+            exps = np.exp(2j * np.pi * self.tc_sign 
+                          * np.outer(f, taus[i0:i0 + n_block]))
+            z_tau[..., i0:i0 + n_block] = np.dot(z, exps)
+
+        return z_tau
+
+    def grid_terms(self, par, par_aux, reduced=False):
+        """
+        Frequency-domain terms whose time-shifted sums give the 
+        log-likelihood at any coalescence time.
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters without coalescence time 
+            (intrinsic parameters if reduced is True)
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to 
+            the band of interest + PSD values in the same band.
+        reduced : bool
+            if True, the amplitudes are maximized with design_matrix_func
+
+        Returns
+        -------
+        z : ndarray
+            values on the band, size ... x n_freq
+        ll_func : callable
+            function giving the log-likelihood values from the time-shifted 
+            sums of z (see shifted_sums and shifted_sums_at)
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        ll_norm = np.real(self.ll_norm)
+
+        if not reduced:
+            signal = np.asarray(self.compute_signal(self.insert_tc(par)))
+            n_ch = signal.shape[0]
+            # (h | h) does not depend on the time shift
+            hh = np.sum((signal.real ** 2 + signal.imag ** 2) 
+                        * self.weights[0:n_ch])
+
+            def ll_func(z_tau):
+                # (h | y) for all time shifts
+                return 4.0 * self.df * (np.real(z_tau) - 0.5 * hh) + ll_norm
+
+            return np.sum(np.conj(signal) * self.data_w[0:n_ch], axis=0), \
+                ll_func
+
+        mat_list = self.design_matrix_func(self.insert_tc(par), 
+                                           self.f[self.band],
+                                           *self.signal_args,
+                                           **self.signal_kwargs)
+        # Normal matrices
+        normal = [np.dot(mat.conj().T * self.weights[i], mat)
+                  for i, mat in enumerate(mat_list)]
+
+        def ll_func(v):
+            # (h | y) - 1/2 (h | h) at the amplitudes maximum, from the 
+            # projections v of the data on the basis (size n_ch x p x n_tc)
+            ll = 0
+            for i in range(len(normal)):
+                ll += 0.5 * np.real(np.sum(
+                    v[i].conj() * matrixalgebra.solve_normal(normal[i], v[i]),
+                    axis=0))
+            return 4.0 * self.df * ll + ll_norm
+
+        return np.array([mat.conj().T * self.data_w[i] 
+                         for i, mat in enumerate(mat_list)]), ll_func
+
+    def log_likelihood_grid(self, par, par_aux):
+        """
+        Log-likelihood computed on the coalescence time grid tc_grid.
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters without coalescence time
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to 
+            the band of interest + PSD values in the same band.
+
+        Returns
+        -------
+        ll : ndarray
+            log-likelihood values for all coalescence times of tc_grid
+
+        """
+
+        z, ll_func = self.grid_terms(par, par_aux)
+
+        return ll_func(self.shifted_sums(z))
+
+    def log_likelihood_reduced_grid(self, par_intr, par_aux):
+        """
+        Reduced log-likelihood computed on the coalescence time grid tc_grid.
+
+        Parameters
+        ----------
+        par_intr : array_like
+            vector of intrinsic waveform parameters without coalescence time
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to 
+            the band of interest + PSD values in the same band.
+
+        Returns
+        -------
+        ll : ndarray
+            log-likelihood values for all coalescence times of tc_grid
+
+        """
+
+        z, ll_func = self.grid_terms(par_intr, par_aux, reduced=True)
+
+        return ll_func(self.shifted_sums(z))
+
+    def reduce_grid(self, ll, z=None, ll_func=None, ll_tol=30.0, 
+                    n_iter=4):
+        """
+        Marginalize or maximize log-likelihood values over the time grid.
+
+        The marginal likelihood is the midpoint-rule integral over the cells 
+        of the time grid. If the grid terms z and ll_func are given (see 
+        grid_terms), the cells where the likelihood is within ll_tol of its 
+        maximum (and their neighbours) are subdivided, with a spacing set by
+        the curvature of the log-likelihood peak, and the likelihood is 
+        computed exactly on the sub-grid. This removes the discretization 
+        error when the peak is narrower than the grid spacing.
+
+        Parameters
+        ----------
+        ll : ndarray
+            log-likelihood values on tc_grid
+        z : ndarray, optional
+            grid terms used to refine the marginalization
+        ll_func : callable, optional
+            function giving the log-likelihood from the shifted sums of z
+        ll_tol : float
+            log-likelihood drop below the maximum beyond which cells are not
+            refined
+        n_iter : int
+            maximum number of refinements of the sub-grid spacing
+
+        Returns
+        -------
+        ll_red : float
+            marginalized or maximized log-likelihood
+
+        """
+
+        if self.maximize:
+            j = np.argmax(ll)
+            if (j > 0) & (j < ll.shape[0] - 1):
+                # Parabolic interpolation of the maximum between grid points
+                a = 0.5 * (ll[j - 1] + ll[j + 1]) - ll[j]
+                b = 0.5 * (ll[j + 1] - ll[j - 1])
+                if a < 0:
+                    return ll[j] - b ** 2 / (4 * a)
+            return ll[j]
+
+        # Uniform prior on the grid
+        n_tc = ll.shape[0]
+        if (z is None) | (n_tc < 3):
+            return special.logsumexp(ll) - np.log(n_tc)
+        # Cells where the integrand is not negligible, with their neighbours
+        sel = np.convolve(ll > np.max(ll) - ll_tol, np.ones(3), 
+                          mode='same') > 0
+        taus = self.tc_grid[sel] - self.tc_ref
+        dt = 1 / (self.n_fft * self.df)
+        ll_fine = ll[sel]
+        n_sub = 1
+        for it in range(n_iter):
+            # Sub-grid spacing of half the width of the peak
+            k = np.clip(np.argmax(ll_fine), 1, ll_fine.shape[0] - 2)
+            a = 0.5 * (ll_fine[k - 1] + ll_fine[k + 1]) - ll_fine[k]
+            if (ll_fine.shape[0] < 3) | (a >= -1 / 8):
+                break
+            n_sub *= int(np.ceil(2 * np.sqrt(- 2 * a)))
+            offsets = ((np.arange(n_sub) + 0.5) / n_sub - 0.5) * dt
+            ll_fine = ll_func(self.shifted_sums_at(
+                z, (taus[:, np.newaxis] + offsets).ravel()))
+
+        return special.logsumexp(np.concatenate(
+            (ll_fine - np.log(n_sub), ll[~sel]))) - np.log(n_tc)
+
+    def log_likelihood(self, par, par_aux):
+        """
+        Log-likelihood marginalized or maximized over the coalescence time.
+
+        """
+
+        z, ll_func = self.grid_terms(par, par_aux)
+
+        return self.reduce_grid(ll_func(self.shifted_sums(z)), z, ll_func)
+
+    def log_likelihood_reduced(self, par_intr, par_aux):
+        """
+        Reduced log-likelihood marginalized or maximized over the coalescence
+        time.
+
+        """
+
+        z, ll_func = self.grid_terms(par_intr, par_aux, reduced=True)
+
+        return self.reduce_grid(ll_func(self.shifted_sums(z)), z, ll_func)
+
+    def log_likelihood_batch(self, pars, par_aux=None):
+        """
+        Time-marginalized log-likelihoods of a batch of parameter vectors.
+
+        """
+
+        return np.array([self.log_likelihood(par, par_aux) 
+                         for par in np.atleast_2d(pars)])
+
+    def log_likelihood_reduced_batch(self, pars_intr, par_aux=None):
+        """
+        Time-marginalized reduced log-likelihoods of a batch of intrinsic 
+        parameter vectors.
+
+        """
+
+        return np.array([self.log_likelihood_reduced(par_intr, par_aux) 
+                         for par_intr in np.atleast_2d(pars_intr)])
+
+    def tc_posterior(self, par, par_aux=None, reduced=False):
+        """
+        Conditional posterior distribution of the coalescence time given the
+        other parameters, on the time grid. Can be used in post-processing to 
+        reconstruct the coalescence time samples.
+
+        Parameters
+        ----------
+        par : array_like
+            vector of waveform parameters without coalescence time
+        par_aux :  ndarray
+            Concatenated list of windowed frequency-domain data restricted to 
+            the band of interest + PSD values in the same band.
+        reduced : bool
+            if True, par are intrinsic parameters and the reduced likelihood
+            is used
+
+        Returns
+        -------
+        tc_grid : ndarray
+            coalescence times
+        post : ndarray
+            posterior probabilities of each coalescence time
+
+        """
+
+        if reduced:
+            ll = self.log_likelihood_reduced_grid(par, par_aux)
+        else:
+            ll = self.log_likelihood_grid(par, par_aux)
+
+        return self.tc_grid, np.exp(ll - special.logsumexp(ll))
+
+    def draw_tc(self, par, par_aux=None, reduced=False):
+        """
+        Draw a coalescence time from its conditional posterior distribution.
+        """
+
+        tc_grid, post = self.tc_posterior(par, par_aux=par_aux, 
+                                          reduced=reduced)
+
+        return np.random.choice(tc_grid, p=post)
+
+
+class GapMarginalizedLogLike(LogLike):
+
+    def __init__(self, data, sn, inds, tobs, del_t,
+                 signal_func,
+                 signal_reduced_func,
+                 design_matrix_func=None,
+                 **kwargs):
+        """
+        Exact log-likelihood of the observed data in the time domain,
+
+        log L = h_o^T C_oo^{-1} d_o - 1/2 h_o^T C_oo^{-1} h_o + const,
+
+        where the missing data are marginalized instead of being imputed. 
+        The solution C_oo^{-1} d_o is computed once for each PSD, so that 
+        each template requires a single linear solve, performed with the 
+        method of the data model (PCG warm-started from the previous 
+        solution, tapered or Woodbury). Batches of templates are solved 
+        together.
+
+        Parameters
+        ----------
+        data : list of ndarrays
+            TDI data in the time domain, with zeros in the gaps.
+        design_matrix_func : callable, optional
+            function taking as input the intrinsic sampling parameter vector 
+            and a frequency vector (plus signal_args and signal_kwargs), and
+            outputing a list of F-statistics design matrices of size 
+            n_freq x p (one for each channel). If provided, the reduced 
+            likelihood maximizes the exact likelihood over the amplitudes.
+            Otherwise, it uses the template given by signal_reduced_func.
+        **kwargs : 
+            other keyword arguments of LogLike. model_cls must be a 
+            datamodel.GaussianStationaryProcess instance using the 'PCG', 
+            'tapered' or 'woodbury' method.
+
+        """
+
+        # Observed data solutions, computed once the data model is set
+        self.ind_obs = None
+        self.x_data = None
+        self.sn_ref = None
+        self.normalized = kwargs.get('normalized', False)
+        super(GapMarginalizedLogLike, self).__init__(data, sn, inds, tobs, 
+                                                     del_t,
+                                                     signal_func,
+                                                     signal_reduced_func,
+                                                     **kwargs)
+        if self.gap_convolution:
+            raise ValueError("Gap marginalization does not support gap convolution.")
+        if self.model is None:
+            raise ValueError("Gap marginalization requires a data model.")
+
+        self.design_matrix_func = design_matrix_func
+        # Observed data
+        self.ind_obs = self.model.ind_obs
+        self.data_o = [dat[self.ind_obs] for dat in self.data]
+        # Last solutions of the template systems, used as first guesses
+        self.x_warm = [None for i in range(self.n_ch)]
+        self.update_covariance()
+        self.sn_ref = np.array(self.get_auxiliary_params(self.par_aux)[1])
+
+    def set_auxiliary_params(self, par_aux, changed=None):
+        """
+        Update the data solutions C_oo^{-1} d_o when the PSD values of the 
+        auxiliary parameters change. The observed-data covariance mixes all 
+        frequencies, so local PSD changes trigger a full update.
+        """
+
+        if par_aux is None:
+            par_aux = self.par_aux
+        new_aux = (par_aux is not self.aux_ref) | (changed is not None)
+        super(GapMarginalizedLogLike, self).set_auxiliary_params(
+            par_aux, changed=changed)
+        if new_aux & (self.sn_ref is not None):
+            sn = self.get_auxiliary_params(par_aux)[1]
+            if not np.array_equal(sn, self.sn_ref):
+                self.update_covariance()
+                self.sn_ref = np.array(sn)
+
+    def update_covariance(self):
+        """
+        Recompute the observed data covariance from the current PSD models, 
+        and solve C_oo x = d_o for each channel.
+        """
+
+        if self.psd_list is not None:
+            self.model.update_psd(self.psd_list)
+        self.model.compute_offline()
+        if (self.model.method == 'PCG') | (self.model.method == 'tapered'):
+            self.model.compute_preconditioner()
+        # Start from the solutions obtained with the previous PSD
+        x0 = self.x_data if self.x_data is not None else [None] * self.n_ch
+        self.x_data = [self.model.solve_coo(self.data_o[i], i=i, x0=x0[i])
+                       for i in range(self.n_ch)]
+        if self.normalized:
+            # Normalization up to the log-determinant of C_oo
+            self.ll_norm = - 0.5 * sum([np.dot(self.data_o[i], self.x_data[i])
+                                        for i in range(self.n_ch)])
+
+    def update_log_norm(self):
+        """
+        The normalization is set by update_covariance.
+        """
+
+        pass
+
+    def update_auxiliary_params(self, par, par_aux, 
+                                reduced=True,
+                                update_mis=False,
+                                update_psd=True):
+        """
+        Update the PSD. Missing data are marginalized, so they are never 
+        imputed.
+        """
+
+        return super(GapMarginalizedLogLike, self).update_auxiliary_params(
+            par, par_aux, reduced=reduced, update_mis=False, 
+            update_psd=update_psd)
+
+    def observed_signal(self, y_gw_fft_pos):
+        """
+        Time-domain waveforms at observed times, from their values at 
+        positive Fourier frequencies.
+
+        Parameters
+        ----------
+        y_gw_fft_pos : array_like
+            frequency-domain waveforms, size ... x n_freq
+
+        Returns
+        -------
+        y_gw_o : ndarray
+            time-domain waveforms at observed times, size ... x n_obs
+
+        """
+
+        y_gw_fft_pos = np.asarray(y_gw_fft_pos)
+        y_gw_fft = np.zeros(y_gw_fft_pos.shape[:-1] + (self.n_data,), 
+                            dtype=np.complex128)
+        y_gw_fft[..., self.band] = y_gw_fft_pos
+        y_gw_fft[..., self.band_neg] = np.conj(y_gw_fft_pos)
+
+        return np.real(ifft(y_gw_fft, axis=-1))[..., self.ind_obs] / self.del_t
+
+    def solve_templates(self, h_o, i):
+        """
+        Solve C_oo x = h_o for the templates h_o (size n_obs or n_obs x K) of
+        channel i, starting from the previous solutions if they have the same
+        shape.
+        """
+
+        x0 = self.x_warm[i]
+        if x0 is not None:
+            if x0.shape != h_o.shape:
+                x0 = None
+        self.x_warm[i] = self.model.solve_coo(h_o, i=i, x0=x0)
+
+        return self.x_warm[i]
+
+    def observed_log_likelihood(self, h_o_list):
+        """
+        Log-likelihood of templates given at observed times.
+
+        Parameters
+        ----------
+        h_o_list : list[ndarray]
+            list of time-domain templates at observed times (one for each
+            channel), of size n_obs or n_obs x K for K templates.
+
+        Returns
+        -------
+        ll : float or ndarray
+            log-likelihood values
+
+        """
+
+        ll = 0
+        for i in range(len(h_o_list)):
+            x = self.solve_templates(h_o_list[i], i)
+            # h_o^T C_oo^{-1} d_o - 1/2 h_o^T C_oo^{-1} h_o
+            ll += np.dot(self.x_data[i], h_o_list[i])
+            ll -= 0.5 * np.sum(h_o_list[i] * x, axis=0)
+
+        return ll + np.real(self.ll_norm)
+
+    def log_likelihood(self, par, par_aux):
+        """
+        Gap-marginalized log-likelihood.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+
+        return self.observed_log_likelihood(
+            list(self.observed_signal(self.compute_signal(par))))
+
+    def log_likelihood_reduced(self, par_intr, par_aux):
+        """
+        Gap-marginalized reduced log-likelihood.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        if self.design_matrix_func is None:
+            data_dft, sn = self.get_auxiliary_params(par_aux)
+            signal = self.compute_signal_reduced(par_intr, data_dft, sn)
+            return self.observed_log_likelihood(
+                list(self.observed_signal(signal)))
+
+        mat_list = self.design_matrix_func(par_intr, self.f_band,
+                                           *self.signal_args,
+                                           **self.signal_kwargs)
+        ll = 0
+        for i in range(len(mat_list)):
+            # Real time-domain basis of the templates M a for complex a
+            mat = np.hstack([mat_list[i], 1j * mat_list[i]])
+            mat_o = self.observed_signal(mat.T).T
+            x = self.solve_templates(mat_o, i)
+            # Projections of the data on the basis and normal matrix
+            v = np.dot(mat_o.T, self.x_data[i])
+            normal = np.dot(mat_o.T, x)
+            # h_o^T C_oo^{-1} d_o - 1/2 h_o^T C_oo^{-1} h_o at the maximum
+            ll += 0.5 * np.dot(v, matrixalgebra.solve_normal(normal, v))
+
+        return ll + np.real(self.ll_norm)
+
+    def log_likelihood_batch(self, pars, par_aux=None):
+        """
+        Gap-marginalized log-likelihoods of a batch of parameter vectors, 
+        with the template systems solved together.
+
+        """
+
+        self.set_auxiliary_params(par_aux)
+        # Templates at observed times, size n_walkers x n_channels x n_obs
+        h_o = self.observed_signal(self.compute_signal_batch(pars))
+
+        return self.observed_log_likelihood([h_o[:, i, :].T 
+                                             for i in range(h_o.shape[1])])
+
+    def log_likelihood_reduced_batch(self, pars_intr, par_aux=None):
+        """
+        Gap-marginalized reduced log-likelihoods of a batch of intrinsic 
+        parameter vectors.
+
+        """
 
-        return np.real(ll_a + ll_e + self.ll_norm)
+        return np.array([self.log_likelihood_reduced(par_intr, par_aux) 
+                         for par_intr in np.atleast_2d(pars_intr)])
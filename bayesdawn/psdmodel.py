@@ -9,6 +9,8 @@ import pyfftw
 from scipy import interpolate
 from scipy import linalg as la
 from scipy import optimize
+from scipy import special
+from scipy import sparse
 from pyfftw.interfaces.numpy_fft import fft, ifft
 try:
     import tdi
@@ -32,6 +34,65 @@ class MyLSQUnivariateSpline(interpolate.LSQUnivariateSpline):
         data[9][:n-k-1] = coeffs
         self._data = data
 
+class LogPSDSpline(interpolate.BSpline):
+    """
+    B-spline representation of a log-PSD, evaluated with the same
+    extrapolation modes as LSQUnivariateSpline.
+    """
+
+    def __init__(self, t, c, k, ext=3):
+        """
+
+        Parameters
+        ----------
+        t : ndarray
+            full knot vector (including boundary knots with multiplicity k+1)
+        c : ndarray
+            spline coefficients
+        k : int
+            degree of the spline
+        ext : extint or str, optional
+            extrapolation mode, as in LSQUnivariateSpline. The default is 3
+            (return the boundary value).
+        """
+
+        interpolate.BSpline.__init__(self, t, c, k,
+                                     extrapolate=ext in [0, 'extrapolate'])
+        self.ext = ext
+
+    def __call__(self, x, nu=0, extrapolate=None):
+
+        x = np.asarray(x)
+        xb = self.t[self.k]
+        xe = self.t[-self.k - 1]
+        if self.ext in [3, 'const']:
+            return interpolate.BSpline.__call__(self, np.clip(x, xb, xe), nu)
+        y = interpolate.BSpline.__call__(self, x, nu, extrapolate=extrapolate)
+        if self.ext in [1, 'zeros']:
+            y = np.where((x < xb) | (x > xe), 0, y)
+        elif self.ext in [2, 'raise']:
+            if np.any((x < xb) | (x > xe)):
+                raise ValueError("x value out of bounds")
+
+        return y
+
+    def get_coeffs(self):
+        """
+        Spline coefficients, as returned by LSQUnivariateSpline.get_coeffs.
+        """
+
+        return self.c
+
+    def get_coeffs(self):
+        """Return spline coefficients."""
+        return self.c
+
+    def get_knots(self):
+        """Return the positions of the interior knots, including the
+        boundaries, as LSQUnivariateSpline does."""
+        return self.t[self.k:-self.k]
+
+
 # ==============================================================================
 # SPLINES
 # ==============================================================================
@@ -41,6 +102,153 @@ def least_squares(mat, y):
         mat.conjugate().transpose().dot(y))
 
 
+def log_bin_periodogram(freq, per, n_bins=1000):
+    """
+
+    Average the periodogram over logarithmically spaced frequency bins.
+
+    At low frequencies, where the bins are narrower than the frequency
+    resolution, each bin contains a single Fourier frequency, so that no
+    information is lost where the spectrum varies the most.
+
+    Parameters
+    ----------
+    freq : ndarray
+        positive frequencies, sorted in increasing order
+    per : ndarray
+        periodogram computed at frequencies freq. If several periodograms are
+        stacked in a 2d array, the averaging is done along the last axis.
+    n_bins : int
+        number of logarithmic bins spanning [freq[0], freq[-1]]
+
+    Returns
+    -------
+    freq_bin : ndarray
+        geometric mean of the frequencies in each non-empty bin
+    per_bin : ndarray
+        mean periodogram in each bin
+    n_avg : ndarray
+        number of periodogram values averaged in each bin
+
+    """
+
+    edges = np.logspace(np.log10(freq[0]), np.log10(freq[-1]), n_bins + 1)
+    starts = np.unique(np.searchsorted(freq, edges[:-1], side='left'))
+    starts = starts[starts < freq.size]
+    n_avg = np.diff(np.append(starts, freq.size))
+    per_bin = np.add.reduceat(per, starts, axis=-1) / n_avg
+    freq_bin = np.exp(np.add.reduceat(np.log(freq), starts) / n_avg)
+
+    return freq_bin, per_bin, n_avg
+
+
+def periodogram_bin_correlation(window, n_lags=16):
+    """
+
+    Correlation coefficients of periodogram values at Fourier frequencies
+    separated by 0, 1, ..., n_lags bins, for a PSD that is locally flat and a
+    time window applied before the DFT. The covariance of the windowed DFT
+    at bins separated by d is proportional to the DFT of window**2 at d, so
+    that the correlation of the periodogram values is its squared modulus.
+    It vanishes for d > 0 if no window is applied, and is 4/9 and 1/36 at
+    d = 1 and 2 for the Hann window.
+
+    Parameters
+    ----------
+    window : ndarray
+        time window applied to the data
+    n_lags : int
+        number of bin separations computed
+
+    Returns
+    -------
+    rho : ndarray
+        correlation coefficients, size n_lags + 1, with rho[0] = 1
+
+    """
+
+    c = fft(window ** 2)
+
+    return np.abs(c[0:n_lags + 1] / c[0]) ** 2
+
+
+def effective_n_avg(n_avg, rho=None):
+    """
+
+    Effective number of independent periodogram values in averages over
+    n_avg adjacent Fourier frequencies, defined such that the variance of the
+    average is the one of n_eff independent values.
+
+    Parameters
+    ----------
+    n_avg : int or ndarray
+        number of averaged periodogram values
+    rho : ndarray or None
+        correlation coefficients of periodogram values at bins separated by
+        0, 1, ..., len(rho) - 1 (see periodogram_bin_correlation). If None,
+        the values are assumed independent.
+
+    Returns
+    -------
+    n_eff : float or ndarray
+        n_avg / sum_d (1 - |d| / n_avg) rho[|d|], for |d| < n_avg
+
+    """
+
+    if rho is None:
+        return n_avg
+    n_avg = np.asarray(n_avg, dtype=float)
+    d = np.arange(1, rho.shape[0])
+    weights = np.clip(1 - d / n_avg[..., np.newaxis], 0, None)
+
+    return n_avg / (1 + 2 * np.sum(weights * rho[1:], axis=-1))
+
+
+def log_periodogram_bias(n_avg):
+    """
+
+    Mean of the logarithm of a periodogram averaged over n_avg independent
+    frequency bins, relative to the log-PSD. This generalizes the Euler
+    constant C0 = -0.57721, which corresponds to n_avg = 1. For correlated
+    bins, the average is approximately Gamma-distributed with the effective
+    number of independent values (see effective_n_avg).
+
+    Parameters
+    ----------
+    n_avg : int, float or ndarray
+        number (or effective number) of averaged periodogram values
+
+    Returns
+    -------
+    bias : float or ndarray
+        psi(n_avg) - log(n_avg), where psi is the digamma function
+
+    """
+
+    return special.digamma(n_avg) - np.log(n_avg)
+
+
+def log_periodogram_variance(n_avg):
+    """
+
+    Variance of the logarithm of a periodogram averaged over n_avg
+    independent frequency bins (pi^2 / 6 for n_avg = 1).
+
+    Parameters
+    ----------
+    n_avg : int, float or ndarray
+        number (or effective number) of averaged periodogram values
+
+    Returns
+    -------
+    var : float or ndarray
+        trigamma function evaluated at n_avg
+
+    """
+
+    return special.polygamma(1, n_avg)
+
+
 def find_closest_points(f_target, f):
     """
 
@@ -53,7 +261,7 @@ def find_closest_points(f_target, f):
     return inds
 
 
-def spline_loglike(beta, per, a_mat):
+def spline_loglike(beta, per, a_mat, n_avg=1):
     """
 
     Whittle log-likelihood with spline PSD model
@@ -65,6 +273,9 @@ def spline_loglike(beta, per, a_mat):
         vector of periodogram calculated at log-frequencies
     spl : instance of PSDSpline
         spline object
+    n_avg : int or array_like
+        number of periodogram values averaged in each element of per, if it
+        is a log-binned periodogram (see log_bin_periodogram)
 
 
     Returns
@@ -77,10 +288,10 @@ def spline_loglike(beta, per, a_mat):
 
     psdmodel = a_mat.dot(beta)
 
-    return - 0.5 * np.sum(np.log(psdmodel) + per / psdmodel)
+    return - 0.5 * np.sum(n_avg * (np.log(psdmodel) + per / psdmodel))
 
 
-def spline_loglike_grad(beta, per, A):
+def spline_loglike_grad(beta, per, A, n_avg=1):
     """
 
     Gradient of the Whittle log-likelihood with spline PSD model
@@ -91,6 +302,8 @@ def spline_loglike_grad(beta, per, A):
         vector of periodogram
     spl : instance of PSDSpline
         spline object
+    n_avg : int or array_like
+        number of periodogram values averaged in each element of per
 
 
     Returns
@@ -101,21 +314,21 @@ def spline_loglike_grad(beta, per, A):
 
     """
 
-    psdmodel = np.dot(A, beta)
+    psdmodel = A.dot(beta)
 
-    grad_ll = - 0.5 * np.dot(A.T, 1 / psdmodel * (1 - per / psdmodel))
+    grad_ll = - 0.5 * A.T.dot(n_avg / psdmodel * (1 - per / psdmodel))
 
     return grad_ll
 
 
-def spline_loglike_hessian(beta, per, A):
+def spline_loglike_hessian(beta, per, A, n_avg=1):
     """
 
     Hessian matrix of the Whittle log-likelihood with spline model for the PSD
 
     Parameters
     ----------
-    A : array_like
+    A : array_like or scipy.sparse matrix
         design matrix
     x : array_like
         vector of log-frequencies taken into account in the likelihood
@@ -123,6 +336,8 @@ def spline_loglike_hessian(beta, per, A):
         vector of periodogram calculated at log-frequencies minus C0
     spl : instance of PSDSpline
         spline object
+    n_avg : int or array_like
+        number of periodogram values averaged in each element of per
 
 
     Returns
@@ -133,24 +348,112 @@ def spline_loglike_hessian(beta, per, A):
 
     """
 
-    psdmodel = np.dot(A, beta)
+    psdmodel = A.dot(beta)
 
-    E = 1 / psdmodel ** 2 * (-1 + 2 * per / psdmodel)
+    E = n_avg / psdmodel ** 2 * (-1 + 2 * per / psdmodel)
 
-    AE = np.array([A[:, j] * E for j in range(A.shape[1])]).T
-
-    hessian = - 0.5 * np.dot(A.T, AE)
+    if sparse.issparse(A):
+        AE = A.multiply(E[:, np.newaxis])
+        hessian = - 0.5 * A.T.dot(AE).toarray()
+    else:
+        hessian = - 0.5 * A.T.dot(A * E[:, np.newaxis])
 
     # grad_ll = np.array([np.sum( spl.derivatives() )])
 
     return hessian
 
 
-def newton_raphson(beta_0, grad_func, hess_func, maxiter=1000, tol=1e-4):
+def spline_loglike_hessian_banded(beta, per, A, D, n_avg=1):
+    """
+
+    Hessian matrix of the Whittle log-likelihood with a B-spline model for
+    the PSD, in LAPACK banded storage.
+
+    Each row of the B-spline design matrix has at most D + 1 consecutive
+    non-zero entries, so the Hessian is banded with D sub- and
+    super-diagonals and its computation is linear in the number of
+    frequencies.
+
+    Parameters
+    ----------
+    beta : array_like
+        spline coefficients
+    per : array_like
+        vector of periodogram
+    A : scipy.sparse matrix
+        B-spline design matrix, as returned by bspline_matrix
+    D : int
+        degree of the splines
+    n_avg : int or array_like
+        number of periodogram values averaged in each element of per
+
+    Returns
+    -------
+    hess_banded : 2d numpy array
+        Hessian matrix of size (2D+1) x n_coeffs in the banded form accepted
+        by scipy.linalg.solve_banded with (l, u) = (D, D)
+
+    """
+
+    psdmodel = A.dot(beta)
+
+    E = n_avg / psdmodel ** 2 * (-1 + 2 * per / psdmodel)
+
+    hessian = - 0.5 * A.T.dot(A.multiply(E[:, np.newaxis])).tocoo()
+
+    return sparse_to_banded(hessian, D, D)
+
+
+def sparse_to_banded(mat, l, u):
+    """
+
+    Convert a sparse banded square matrix to LAPACK banded storage.
+
+    Parameters
+    ----------
+    mat : scipy.sparse matrix
+        square matrix with l sub-diagonals and u super-diagonals
+    l : int
+        number of non-zero lower diagonals
+    u : int
+        number of non-zero upper diagonals
+
+    Returns
+    -------
+    ab : 2d numpy array
+        matrix of size (l + u + 1) x n such that ab[u + i - j, j] = mat[i, j]
+
+    """
+
+    mat = sparse.coo_matrix(mat)
+    ab = np.zeros((l + u + 1, mat.shape[1]), dtype=mat.dtype)
+    ab[u + mat.row - mat.col, mat.col] = mat.data
+
+    return ab
+
+
+def newton_raphson(beta_0, grad_func, hess_func, maxiter=1000, tol=1e-4,
+                   bands=None):
     """
 
     Newton-Raphson algorithm to compute the maximum likelihood
 
+    Parameters
+    ----------
+    beta_0 : array_like
+        starting point
+    grad_func : callable
+        gradient of the function to maximize
+    hess_func : callable
+        Hessian of the function to maximize
+    maxiter : int
+        maximum number of iterations
+    tol : float
+        tolerance on the relative change of the parameters
+    bands : tuple (l, u) or None
+        if provided, hess_func returns the Hessian in the banded storage of
+        scipy.linalg.solve_banded, with l lower and u upper diagonals
+
     """
 
     eps = 1.0
@@ -158,7 +461,14 @@ def newton_raphson(beta_0, grad_func, hess_func, maxiter=1000, tol=1e-4):
     beta_old = beta_0
 
     while (i < maxiter) & (eps > tol):
-        beta = beta_old - la.inv(hess_func(beta_old)).dot(grad_func(beta_old))
+        # Solve for the Newton step instead of inverting the Hessian
+        if bands is None:
+            step = la.solve(hess_func(beta_old), grad_func(beta_old),
+                            check_finite=False)
+        else:
+            step = la.solve_banded(bands, hess_func(beta_old),
+                                   grad_func(beta_old), check_finite=False)
+        beta = beta_old - step
         eps = la.norm(beta - beta_old) / la.norm(beta_old)
         beta_old = copy.deepcopy(beta)
         i = i + 1
@@ -174,12 +484,48 @@ def spline_fisher(a_mat):
 
     Compute the Fisher matrix for the spline PSD model parameters.
 
+    If a_mat is a sparse B-spline design matrix, the result is a sparse
+    banded matrix.
 
     """
 
     return 0.5 * a_mat.conj().T.dot(a_mat)
 
 
+def bspline_matrix(x, knots, D, bounds=None):
+    """
+
+    Sparse design matrix of the B-spline basis with compact support.
+
+    Contrary to the truncated-power basis of spline_matrix, each basis
+    function is non-zero on at most D + 1 knot intervals, so that each row
+    has at most D + 1 non-zero entries and the matrix stays well conditioned.
+
+    Parameters
+    ----------
+    x : numpy array of size n_data
+        abscisse points where to compute the spline, sorted in increasing order
+    knots : numpy array
+        interior knots of the spline
+    D : scalar integer
+        degree of the spline
+    bounds : tuple or None
+        boundaries of the spline interval. Default is (x[0], x[-1]).
+
+    Returns
+    -------
+    a_mat : scipy.sparse.csr_matrix
+        spline design matrix of size n_data x (len(knots) + D + 1)
+
+    """
+
+    if bounds is None:
+        bounds = (x[0], x[-1])
+    t = np.concatenate(([bounds[0]] * (D + 1), knots, [bounds[1]] * (D + 1)))
+
+    return sparse.csr_matrix(interpolate.BSpline.design_matrix(x, t, D))
+
+
 def spline_matrix(x, knots, D):
     """
 
@@ -419,7 +765,7 @@ class PSD(object):
 class PSDSpline(PSD):
 
     def __init__(self, n_data, fs, n_knots=30, d=3,
-                 fmin=None, fmax=None, f_knots=None, ext=3):
+                 fmin=None, fmax=None, f_knots=None, ext=3, n_bins=None):
         """
 
         Parameters
@@ -446,6 +792,10 @@ class PSDSpline(PSD):
                 if ext=2 or ‘raise’, raise a ValueError
                 if ext=3 of ‘const’, return the boundary value
             The default value is 3.
+        n_bins : int or None
+            if provided, the periodogram is averaged over n_bins logarithmic
+            frequency bins before fitting, so that the cost of the fit does not
+            depend on the data size. If None, all Fourier frequencies are used.
         """
 
         PSD.__init__(self, n_data, fs, fmin=fmin, fmax=fmax)
@@ -480,6 +830,12 @@ class PSDSpline(PSD):
         self.logsc = []
         # Spline extension
         self.ext = ext
+        # Number of logarithmic bins for periodogram compression
+        self.n_bins = n_bins
+        # Correlation of adjacent periodogram values due to the time window
+        self.bin_corr = None
+        # Factorizations of the spline design matrices, for each fit grid
+        self.lsqr_cache = {}
         # Variance function values at control frequencies
         self.varlogsc = np.pi**3 / 6 * np.ones(self.n_knots + 1)
         # self.varlogsc = np.array(
@@ -504,6 +860,23 @@ class PSDSpline(PSD):
         self.logf_knots = np.log(self.f_knots)
         self.logfc = np.concatenate(
             (np.log(self.f_knots), [np.log(self.fs / 2)]))
+        self.lsqr_cache = {}
+
+    def __copy__(self):
+        """
+        Shallow copy with its own factorization cache, log-PSD function and
+        log-PSD values, which are updated in place by update_coeffs.
+
+        """
+
+        psd_cls = self.__class__.__new__(self.__class__)
+        psd_cls.__dict__.update(self.__dict__)
+        psd_cls.lsqr_cache = dict(self.lsqr_cache)
+        for name in ['log_psd_fn', 'logs', 'logsc']:
+            if name in self.__dict__:
+                setattr(psd_cls, name, copy.copy(self.__dict__[name]))
+
+        return psd_cls
 
     def choose_knots(self):
         """
@@ -542,17 +915,82 @@ class PSDSpline(PSD):
         """
         
         return self.log_psd_fn.get_coeffs()
-        
-    def estimate(self, y, wind='hanning'):
+
+    def update_coeffs(self, coeffs):
         """
+        Set the spline coefficients of the log-PSD, and report the frequency
+        intervals where the PSD changed. Since the B-spline basis function j
+        is supported on [t_j, t_{j+D+1}], only the coefficients that differ
+        from the current ones contribute, and the stored log-PSD values are 
+        only recomputed on these intervals. Moving a single coefficient 
+        changes the PSD over D + 1 knot intervals; a refit (see fit_coeffs) 
+        usually moves all of them.
 
-        Estimate the log-PSD using spline model by least-square method
+        Parameters
+        ----------
+        coeffs : ndarray
+            new spline coefficients, of the same size as the current ones
+
+        Returns
+        -------
+        intervals : list of tuples
+            sorted, disjoint frequency intervals (f_low, f_high) outside of
+            which the PSD is unchanged. Intervals touching the boundaries of
+            the knot sequence extend to 0 or infinity, because of the
+            extrapolation.
+
+        """
+
+        if not isinstance(self.log_psd_fn, interpolate.BSpline):
+            # Equivalent B-spline of a fitted LSQUnivariateSpline
+            t, c, k = self.log_psd_fn._eval_args
+            self.log_psd_fn = LogPSDSpline(t, c[0:t.shape[0] - k - 1], k,
+                                           ext=self.log_psd_fn.ext)
+        t = self.log_psd_fn.t
+        k = self.log_psd_fn.k
+        ind = np.where(coeffs != self.log_psd_fn.c)[0]
+        self.log_psd_fn.c = np.array(coeffs, dtype=float)
+        self.beta = self.log_psd_fn.c
+        # Merge the supports of the modified basis functions
+        intervals = []
+        for j in ind:
+            lo = t[j] if t[j] > t[k] else -np.inf
+            hi = t[j + k + 1] if t[j + k + 1] < t[-k - 1] else np.inf
+            if (len(intervals) > 0) and (lo <= intervals[-1][1]):
+                intervals[-1][1] = hi
+            else:
+                intervals.append([lo, hi])
+        # Update the log-PSD at Fourier and control frequencies on the 
+        # modified intervals only
+        self.logs = np.asarray(self.logs, dtype=float)
+        self.logsc = np.asarray(self.logsc, dtype=float)
+        for logf, logs in [(self.logf[self.n_data], self.logs), 
+                           (self.logfc, self.logsc)]:
+            for lo, hi in intervals:
+                i0 = np.searchsorted(logf, lo, side='left')
+                i1 = np.searchsorted(logf, hi, side='right')
+                logs[i0:i1] = self.log_psd_fn(logf[i0:i1])
+
+        return [(np.exp(lo), np.exp(hi)) for lo, hi in intervals]
+
+    def windowed_periodogram(self, y, wind='hanning'):
+        """
+
+        Periodogram of windowed data, normalized by the window power. The
+        correlation of adjacent periodogram values due to the window is
+        stored in the bin_corr attribute.
 
         Parameters
         ----------
         y : array_like
             data (typically model residuals) in the time domain
+        wind : str or ndarray
+            time window applied to the data
 
+        Returns
+        -------
+        per : ndarray
+            periodogram at the Fourier frequencies
 
         """
 
@@ -562,7 +1000,48 @@ class PSDSpline(PSD):
             w = np.hanning(len(y))
 
         k2 = np.sum(w ** 2)
-        per = self.periodogram(fft(y * w), k2=k2)
+        self.bin_corr = periodogram_bin_correlation(w)
+
+        return self.periodogram(fft(y * w), k2=k2)
+
+    def fit_coeffs(self, y, wind='hanning'):
+        """
+
+        Least-squares spline coefficients of the log-PSD of the data,
+        without modifying the current PSD model. They can be set with
+        update_coeffs, which reports where the PSD changed.
+
+        Parameters
+        ----------
+        y : array_like
+            data (typically model residuals) in the time domain
+        wind : str or ndarray
+            time window applied to the data
+
+        Returns
+        -------
+        coeffs : ndarray
+            spline coefficients
+
+        """
+
+        return self.spline_lsqr(self.windowed_periodogram(
+            y, wind=wind)).get_coeffs()
+
+    def estimate(self, y, wind='hanning'):
+        """
+
+        Estimate the log-PSD using spline model by least-square method
+
+        Parameters
+        ----------
+        y : array_like
+            data (typically model residuals) in the time domain
+
+
+        """
+
+        per = self.windowed_periodogram(y, wind=wind)
 
         # Compute the spline parameter vector for the log-PSD model
         self.estimate_from_periodogram(per)
@@ -642,31 +1121,218 @@ class PSDSpline(PSD):
 
             n = int((NI - 1) / 2.)
             z = per[1:n + 1]
-            v = np.log(z) - self.C0
 
             # Spline estimator of the log-PSD
             inds_est = np.where((self.f_min_est <= f[1:self.n + 1]) & (
                         f[1:self.n + 1] <= self.f_max_est))[0]
-            spl = interpolate.LSQUnivariateSpline(self.logf[NI][inds_est],
-                                                  v[inds_est],
-                                                  self.logf_knots,
-                                                  k=self.D,
-                                                  ext=self.ext)
+            x, v, w = self.log_periodogram_points(self.logf[NI][inds_est],
+                                                  z[inds_est])
 
         else:
             # If the frequencies are given
-            v = np.log(per) - self.C0
-            # Spline estimator of the log-PSD
             inds_est = np.where((self.f_min_est <= freq)
                                 & (freq <= self.f_max_est))[0]
-            spl = interpolate.LSQUnivariateSpline(np.log(freq)[inds_est],
-                                                  v[inds_est],
-                                                  self.logf_knots,
-                                                  k=self.D,
-                                                  ext=self.ext)
+            x, v, w = self.log_periodogram_points(np.log(freq)[inds_est],
+                                                  per[inds_est])
+
+        # Spline estimator of the log-PSD
+        spl = interpolate.LSQUnivariateSpline(x, v, self.logf_knots, w=w,
+                                              k=self.D, ext=self.ext)
 
         return spl
 
+    def log_periodogram_points(self, logf, per):
+        """
+
+        Points and weights used to fit the log-PSD. If n_bins is set, the
+        periodogram is first averaged over logarithmic frequency bins, and the
+        log-periodogram is corrected for the bias and weighted by the inverse
+        standard deviation corresponding to the effective number of
+        independent averaged values, given the correlation of adjacent bins
+        due to the time window (bin_corr attribute).
+
+        Parameters
+        ----------
+        logf : ndarray
+            log-frequencies
+        per : ndarray
+            periodogram at frequencies exp(logf), possibly stacked in a 2d array
+            of size n_channels x n_freq
+
+        Returns
+        -------
+        x : ndarray
+            log-frequencies of the fitted points
+        v : ndarray
+            unbiased log-periodogram
+        w : ndarray or None
+            least-squares weights (None for uniform weights)
+
+        """
+
+        if self.n_bins is None:
+            return logf, np.log(per) - self.C0, None
+
+        f_bin, per_bin, n_avg = log_bin_periodogram(np.exp(logf), per,
+                                                    n_bins=self.n_bins)
+        n_eff = effective_n_avg(n_avg, rho=self.bin_corr)
+        v = np.log(per_bin) - log_periodogram_bias(n_eff)
+        w = 1 / np.sqrt(log_periodogram_variance(n_eff))
+
+        return np.log(f_bin), v, w
+
+    def spline_normal_factor(self, x, w=None):
+        """
+
+        Full knot vector, sparse design matrix and Cholesky factor of the
+        normal matrix of the spline least-squares problem at abscissa x.
+        The result only depends on the fit grid and on the knots, so it is
+        cached.
+
+        Parameters
+        ----------
+        x : ndarray
+            log-frequencies where the log-periodogram is fitted
+        w : ndarray or None
+            least-squares weights, which are fixed by the fit grid
+
+        Returns
+        -------
+        t : ndarray
+            full knot vector
+        a_mat : scipy.sparse matrix
+            weighted spline design matrix, size len(x) x n_coeffs
+        chol : tuple
+            Cholesky factorization of a_mat^T a_mat, as returned by
+            scipy.linalg.cho_factor
+
+        """
+
+        key = (x.tobytes(), None if w is None else w.tobytes())
+        if key not in self.lsqr_cache:
+            t = np.concatenate(([x[0]] * (self.D + 1), self.logf_knots,
+                                [x[-1]] * (self.D + 1)))
+            a_mat = interpolate.BSpline.design_matrix(x, t, self.D).tocsc()
+            if w is not None:
+                a_mat = a_mat.multiply(w[:, np.newaxis]).tocsc()
+            # The B-spline basis is well conditioned, so the normal equations
+            # are safe and much cheaper than a dense QR
+            chol = la.cho_factor(a_mat.T.dot(a_mat).toarray(),
+                                 check_finite=False)
+            self.lsqr_cache[key] = (t, a_mat, chol)
+
+        return self.lsqr_cache[key]
+
+    def spline_lsqr_channels(self, per, freq=None):
+        """
+
+        Fit splines to the log periodograms of several channels at once,
+        using a single factorization of the design matrix.
+
+        Parameters
+        ----------
+        per : ndarray
+            periodograms, array of size n_channels x n_freq
+        freq : ndarray or None
+            frequencies where per is computed. If None, per is assumed to be
+            computed on the full Fourier grid, like in spline_lsqr.
+
+        Returns
+        -------
+        spl_list : list of LogPSDSpline
+            log-PSD spline of each channel
+
+        """
+
+        per = np.atleast_2d(per)
+
+        if freq is None:
+            NI = per.shape[1]
+            if NI not in list(self.logf.keys()):
+                f = np.fft.fftfreq(NI) * self.fs
+                self.logf[NI] = np.log(f[f > 0])
+            n = int((NI - 1) / 2.)
+            logf = self.logf[NI]
+            z = per[:, 1:n + 1]
+        else:
+            logf = np.log(freq)
+            z = per
+
+        f = np.exp(logf)
+        inds_est = np.where((self.f_min_est <= f) & (f <= self.f_max_est))[0]
+        x, v, w = self.log_periodogram_points(logf[inds_est], z[:, inds_est])
+        # Least-squares solutions of all channels from the shared factorization
+        t, a_mat, chol = self.spline_normal_factor(x, w=w)
+        if w is not None:
+            v = v * w
+        beta = la.cho_solve(chol, a_mat.T.dot(v.T), check_finite=False)
+
+        return [LogPSDSpline(t, beta[:, i], self.D, ext=self.ext)
+                for i in range(beta.shape[1])]
+
+    def estimate_channels(self, y, wind='hanning'):
+        """
+
+        Joint estimation of the log-PSDs of several channels with the same
+        spline model
+
+        Parameters
+        ----------
+        y : array_like
+            data (typically model residuals) in the time domain, array of size
+            n_channels x n_data or list of arrays of size n_data
+        wind : str or ndarray
+            time window applied to all channels
+
+        Returns
+        -------
+        psd_list : list of PSDSpline instances
+            estimated PSD of each channel
+
+        """
+
+        y = np.asarray(y)
+        if type(wind) == np.ndarray:
+            w = wind[:]
+        elif wind == 'hanning':
+            w = np.hanning(y.shape[1])
+
+        k2 = np.sum(w ** 2)
+        self.bin_corr = periodogram_bin_correlation(w)
+        per = self.periodogram(fft(y * w, axis=1), k2=k2)
+
+        return self.estimate_channels_from_periodogram(per)
+
+    def estimate_channels_from_periodogram(self, per):
+        """
+
+        Joint estimation of the PSDs of several channels from their
+        periodograms.
+
+        Parameters
+        ----------
+        per : ndarray
+            periodograms, array of size n_channels x n_freq
+
+        Returns
+        -------
+        psd_list : list of PSDSpline instances
+            copies of the present instance holding the estimated PSD of each
+            channel
+
+        """
+
+        psd_list = []
+        for spl in self.spline_lsqr_channels(per):
+            psd_cls = copy.copy(self)
+            psd_cls.log_psd_fn = spl
+            psd_cls.beta = spl.get_coeffs()
+            psd_cls.logs = spl(self.logf[self.n_data])
+            psd_cls.logsc = spl(self.logfc)
+            psd_list.append(psd_cls)
+
+        return psd_list
+
 
 # ==============================================================================
 # Spline PSD model
@@ -726,7 +1392,7 @@ class PSDEstimator(object):
         self.log_psd_fn = None
         self.psd_fn = None
         
-    def estimate(self, freq, per):
+    def estimate(self, freq, per, n_avg=None):
         """
         Estimate the spline coefficients from the periodogram 
         or cross-periodogram.
@@ -740,14 +1406,24 @@ class PSDEstimator(object):
         complex : bool
             if True, per is assumed to be a complex cross-periodogram. 
             Thus, its phase is estimated along with its amplitude. 
+        n_avg : ndarray or None
+            if per is a log-binned periodogram (see log_bin_periodogram),
+            number of periodogram values averaged in each bin. It sets the
+            bias correction and the weights of the log-PSD fit.
         """
         if not self.cross:
             # If the frequencies are given
-            v = np.log(per.real) - self.c0
+            if n_avg is None:
+                v = np.log(per.real) - self.c0
+                w = None
+            else:
+                v = np.log(per.real) - log_periodogram_bias(n_avg)
+                w = 1 / np.sqrt(log_periodogram_variance(n_avg))
             # Spline estimator of the log-PSD
             self.log_psd_fn = interpolate.LSQUnivariateSpline(np.log(freq),
                                                               v,
                                                               self.logf_knots,
+                                                              w=w,
                                                               k=self.d,
                                                               ext=self.ext)
             # self.log_psd_fn = MyLSQUnivariateSpline(np.log(freq), v,
@@ -857,7 +1533,7 @@ class PSDEstimator(object):
             # Update the log-PSD function of the log-frequency
             self.psd_fn = lambda x: s_real_func(x) + 1j * s_imag_func(x)   
     
-    def likelihood(self, x, logfr, per):
+    def likelihood(self, x, logfr, per, n_avg=1):
         """
 
         Compute log-likelihood for the PSD update
@@ -870,6 +1546,9 @@ class PSDEstimator(object):
             logarithm of frequency vector
         per : array_like
             periodogram computed at frequencies fr
+        n_avg : int or array_like
+            number of periodogram values averaged in each element of per, if
+            it is log-binned (see log_bin_periodogram)
             
         Returns
         -------
@@ -884,7 +1563,7 @@ class PSDEstimator(object):
         # If only one segment of data is analyzed
         if type(per) == np.ndarray:
             logs = self.log_psd_fn(logfr)
-            ll = np.real(-0.5*np.sum(logs + per * np.exp(-logs)))
+            ll = np.real(-0.5*np.sum(n_avg * (logs + per * np.exp(-logs))))
             
         # If several segments of different lengths are considered:
         elif type(per) == list:
@@ -904,13 +1583,13 @@ class PSDEstimator(object):
 
         return -0.5 * np.sum(np.abs(x - self.logs_knots)**2 / (2*self.varlogsc))
 
-    def posterior(self, x_psd, logfr, per):
+    def posterior(self, x_psd, logfr, per, n_avg=1):
         """
         Compute the log-posterior probability density for the PSD parameters
 
         """
 
-        return self.likelihood(x_psd, logfr, per) + self.prior(x_psd)
+        return self.likelihood(x_psd, logfr, per, n_avg=n_avg) + self.prior(x_psd)
 
 
 # =============================================================================
@@ -1278,12 +1957,14 @@ t    options work analogously, but fit the data to a B-spline, with the number o
             self.chdata=data[channel]
         except: pass            
         
-        if fmax is not None:
-            if self.chdata is not None: self.chdata=self.chdata[f<=fmax]
-            f = f[f<=fmax]
-        if fmin is not None:
-            if self.chdata is not None: self.chdata=self.chdata[f>=fmin]
-            f = f[f>=fmin]            
+        #Frequency grid and selection of the band, kept for later refits on the same grid
+        self.fgrid=np.array(f)
+        fsel=np.ones(len(f),dtype=bool)
+        if fmax is not None: fsel&=f<=fmax
+        if fmin is not None: fsel&=f>=fmin
+        if self.chdata is not None: self.chdata=self.chdata[fsel]
+        f = f[fsel]
+        self.fsel=fsel
 
         self.fin=f.copy()
         
@@ -1304,10 +1985,18 @@ t    options work analogously, but fit the data to a B-spline, with the number o
             Sinit=None
             if fit_type is None: raise ValueError("Must specify at least fit_type or noise_model")
         self.Sinit=None
+        self.logSinit_fin=None
         if Sinit is not None:
             self.logSinit=interpolate.interp1d(np.log(f),np.log(Sinit),fill_value="extrapolate")
             self.Sinit=lambda x:np.exp(self.logSinit(np.log(x)))
-        
+            #Base model values on the data grid, reused by each (re)fit
+            self.logSinit_fin=self.logSinit(np.log(f))
+
+        #Cached fit factorization and fixed-grid evaluators (see refit and grid_evaluator)
+        self.fit_qr=None
+        self.grid_cache={}
+        self.grid_cache_size=2
+
         self.fit=None
         if fit_type is None:
             return
@@ -1342,28 +2031,7 @@ t    options work analogously, but fit the data to a B-spline, with the number o
         self.fit_func=fit_func
 
         # prepare the data for fitting
-        y=np.abs(self.chdata)**2*self.scalefac                
-        if not fit_scale=='log' and self.Sinit is not None:
-            zero=2*(max(y)+max(Sinit))
-        else: zero=1
-        self.fit_zero=zero
-
-        if self.Sinit is not None:
-            if fit_scale=='linear':
-                y=y/self.Sinit(self.fin)
-            elif fit_scale=='log':
-                y=np.log(y/zero)/np.log(self.Sinit(self.fin)/zero)
-            elif fit_scale=='logratio':
-                y=np.log(y/self.Sinit(self.fin))
-            else: raise ValueError('Unknown fit_scale '+fit_scale)
-        else:
-            if fit_scale=='linear':
-                pass
-            elif fit_scale=='log':
-                y=np.log(y/zero)
-            elif fit_scale=='logratio':
-                y=np.log(y)
-            else: raise ValueError('Unknown fit_scale '+fit_scale)
+        y=self.fit_data(self.chdata)
 
         # Offset the data when the fit is in log space
         # Because the mean of log is lower than the log of the mean by euler_gamma
@@ -1372,11 +2040,14 @@ t    options work analogously, but fit the data to a B-spline, with the number o
         #perform the fit
         w=1/f
         if fit_weight_corner>0:w[f<fit_weight_corner]=1/fit_weight_corner
+        self.fit_x=x
+        self.fit_w=w
         if fit_func=='poly':
             pf = np.polyfit(x,y,fit_dof+1,w=w)
             #print('poly fit:',pf)
             fitpoly=np.poly1d(pf)
             self.fit = lambda x: fitpoly(x)
+            self.fit_coeff_values=pf
         elif fit_func=='spline':
             # I tried using the functionality in psdmodel.py but couldn't get it working.
             # to stay close to the existing implementation in psdmodel.py                    
@@ -1434,10 +2105,175 @@ t    options work analogously, but fit the data to a B-spline, with the number o
             self.fit=lambda x:fitspline(x)
             self.interior_knots=fitspline.get_knots()
             self.spline_coeffs=fitspline.get_coeffs()
+            self.fit_coeff_values=self.spline_coeffs
                 
         else:    
             raise ValueError('fit_func '+str(fit_func)+' not recognized.')            
 
+    def fit_data(self, chdata):
+        '''
+        Transform channel Fourier data into the quantity which is fitted, according to fit_scale.
+
+        Arguments:
+            chdata : Numpy array
+                Fourier data of the channel on the fit frequencies self.fin
+
+        Returns:
+            Numpy array with the fit target values
+        '''
+        fit_scale=self.fit_scale
+        y=np.abs(chdata)**2*self.scalefac
+        if not fit_scale=='log' and self.Sinit is not None:
+            zero=2*(max(y)+np.exp(max(self.logSinit_fin)))
+        else: zero=1
+        self.fit_zero=zero
+
+        if self.Sinit is not None:
+            if fit_scale=='linear':
+                y=y/np.exp(self.logSinit_fin)
+            elif fit_scale=='log':
+                y=np.log(y/zero)/(self.logSinit_fin-np.log(zero))
+            elif fit_scale=='logratio':
+                y=np.log(y)-self.logSinit_fin
+            else: raise ValueError('Unknown fit_scale '+fit_scale)
+        else:
+            if fit_scale=='linear':
+                pass
+            elif fit_scale=='log':
+                y=np.log(y/zero)
+            elif fit_scale=='logratio':
+                y=np.log(y)
+            else: raise ValueError('Unknown fit_scale '+fit_scale)
+        return y
+
+    def spline_knots(self):
+        '''
+        Full (boundary-padded) knot vector of the cubic fit spline, in fit coordinates.
+        '''
+        t=np.asarray(self.interior_knots)
+        return np.concatenate((3*[t[0]],t,3*[t[-1]]))
+
+    def fit_basis(self, x):
+        '''
+        Dense design matrix of the fit spline basis evaluated at fit coordinates x.
+        '''
+        t=self.spline_knots()
+        return interpolate.BSpline.design_matrix(np.clip(x,t[0],t[-1]),t,3).toarray()
+
+    def fit_factorization(self):
+        '''
+        QR factorization of the weighted design matrix on the fit grid.
+
+        It only depends on the knots, the frequencies and the weights, so it is computed once
+        and reused by all subsequent refits.
+        '''
+        if self.fit_qr is None:
+            mat=self.fit_w[:,np.newaxis]*self.fit_basis(self.fit_x)
+            self.fit_qr=la.qr(mat,mode='economic',check_finite=False)
+        return self.fit_qr
+
+    def set_fit_coeff_values(self, coeffs):
+        '''
+        Reset the fit function from a new set of coefficients, keeping the basis unchanged.
+        '''
+        self.fit_coeff_values=coeffs
+        if self.fit_func=='poly':
+            fitpoly=np.poly1d(coeffs)
+            self.fit=lambda x: fitpoly(x)
+        else:
+            t=self.spline_knots()
+            spline=interpolate.BSpline(t,coeffs,3,extrapolate=False)
+            #Clipping reproduces the ext=3 behavior of the original fit
+            self.fit=lambda x: spline(np.clip(x,t[0],t[-1]))
+            self.spline_coeffs=coeffs
+
+    def refit(self, data):
+        '''
+        Update the fit from new Fourier data without rebuilding the model.
+
+        The knots, the base noise model values and the QR factorization of the weighted
+        spline design matrix are kept from the previous fit; only the coefficients are
+        recomputed (one triangular solve). The result is the same as constructing a new instance
+        with the same arguments on the new data.
+
+        Arguments:
+            data : numpy rec-array (or dict)
+                Multichannel Fourier data set with the same frequency grid as the one used
+                at construction.
+
+        Returns:
+            self
+        '''
+        if self.fit is None: raise ValueError('No fit to update since fit_type is None')
+        chdata=data[self.channel]
+        if not self.same_grid(data['f']): raise ValueError('Data frequency grid differs from the fitted one')
+        self.chdata=chdata[self.fsel]
+        y=self.fit_data(self.chdata)
+        if self.fit_func=='poly':
+            #Polynomial fits have no knots to keep and are cheap to redo
+            coeffs=np.polyfit(self.fit_x,y,len(self.fit_coeff_values)-1,w=self.fit_w)
+        else:
+            q,r=self.fit_factorization()
+            coeffs=la.solve_triangular(r,q.T.dot(self.fit_w*y),check_finite=False)
+        self.set_fit_coeff_values(coeffs)
+        return self
+
+    def same_grid(self, f):
+        '''
+        Whether the frequency grid f is the one used at construction, so that the fit can be
+        updated with refit.
+        '''
+        return np.array_equal(self.fgrid, f)
+
+    def fit_to_psd(self, fitval, logsinit):
+        '''
+        Convert fit function values into PSD values, given the log base model values.
+        '''
+        if self.fit_scale=='linear':
+            dm = np.abs(fitval)
+            if logsinit is not None:
+                dm = dm*np.exp(logsinit)
+        elif self.fit_scale=='log':
+            logdm = fitval
+            zero=self.fit_zero
+            if logsinit is not None:
+                logdm = logdm*(logsinit-np.log(zero))
+            dm=zero*np.exp(logdm)
+        elif self.fit_scale=='logratio':
+            logdm = fitval
+            if logsinit is not None:
+                logdm = logdm+logsinit
+            dm=np.exp(logdm)
+        if self.offset_log_fit:
+            dm=dm*np.exp(np.euler_gamma)
+        return dm
+
+    def grid_evaluator(self, x):
+        '''
+        Build an evaluator of the PSD on a fixed frequency grid.
+
+        The fit coordinates and the base model values on the grid are computed once, so that
+        each call only evaluates the fit function with the current coefficients. The evaluator
+        follows later refits.
+
+        Arguments:
+            x : Numpy array
+                Frequency grid
+
+        Returns:
+            function with no argument returning the PSD values on x
+        '''
+        x=np.array(x,dtype=float)
+        logsinit=None
+        if self.Sinit is not None:
+            logsinit=self.logSinit(np.log(x))
+        if self.fit is None:
+            psd=np.exp(logsinit)
+            return lambda: psd
+        xx=x
+        if self.fit_logx: xx=np.log(x)
+        return lambda: self.fit_to_psd(self.fit(xx),logsinit)
+
             
     def choose_knots(self,x,verbose=False):
         '''
@@ -1608,31 +2444,31 @@ t    options work analogously, but fit the data to a B-spline, with the number o
         self.coeffs=splinedict['coeffs']
         self.spline=interpolate.BSpline(knots,self.coeffs,3)
         self.fit=lambda x:self.spline(x)
+        self.spline_coeffs=self.coeffs
+        self.fit_coeff_values=self.coeffs
+        #The knots may have changed
+        self.fit_qr=None
     
     def psd_fn(self, x):
         # returns the psd function defined earlier           
 
         if self.fit is not None:
+            if self.grid_cache_size>0 and isinstance(x,np.ndarray) and x.ndim==1 and len(x)>0:
+                # Repeated calls on the same grid (e.g. from calculate) use a cached evaluator
+                key=(len(x),x[0],x[-1])
+                if key in self.grid_cache and np.array_equal(self.grid_cache[key][0],x):
+                    return self.grid_cache[key][1]()
+                if len(self.grid_cache)>=self.grid_cache_size:
+                    self.grid_cache.pop(next(iter(self.grid_cache)))
+                self.grid_cache[key]=(x.copy(),self.grid_evaluator(x))
+                return self.grid_cache[key][1]()
             xx=x.copy()
             if self.fit_logx:
                 xx=np.log(x)
-            if self.fit_scale=='linear':
-                dm = np.abs(self.fit(xx))            
-                if self.Sinit is not None:
-                    dm = dm*self.Sinit(x)
-            elif self.fit_scale=='log':
-                logdm = self.fit(xx)
-                zero=self.fit_zero
-                if self.Sinit is not None:
-                    logdm*=(self.logSinit(np.log(x))-np.log(zero))
-                dm=zero*np.exp(logdm)
-            elif self.fit_scale=='logratio':
-                logdm = self.fit(xx)
-                if self.Sinit is not None:
-                    logdm+=self.logSinit(np.log(x))
-                dm=np.exp(logdm)
-            if self.offset_log_fit:
-                dm=dm*np.exp(np.euler_gamma)
+            logsinit=None
+            if self.Sinit is not None:
+                logsinit=self.logSinit(np.log(x))
+            dm=self.fit_to_psd(self.fit(xx),logsinit)
         else:
             dm = self.Sinit(x)
 
@@ -15,7 +15,8 @@ from scipy import interpolate
 
 class PSDSampler(psdmodel.PSDSpline, samplers.MHSampler):
     
-    def __init__(self, n_eff, fs, n_knots=30, d=3, fmin=None, fmax=None):
+    def __init__(self, n_eff, fs, n_knots=30, d=3, fmin=None, fmax=None,
+                 n_bins=None):
         """[summary]
 
         Parameters
@@ -32,34 +33,101 @@ class PSDSampler(psdmodel.PSDSpline, samplers.MHSampler):
             Minimum frequency where the data is analysed, by default None
         fmax : float, optional
             Maximum frequency where the data is analysed, by default None
+        n_bins : int, optional
+            Number of logarithmic frequency bins used to compress the 
+            periodogram in the likelihood, by default None (no compression)
         """
 
         psdmodel.PSDSpline.__init__(self, n_eff, fs, n_knots=n_knots, d=d, 
-                                    fmin=fmin, fmax=fmax)
+                                    fmin=fmin, fmax=fmax, n_bins=n_bins)
         
         # Periodogram of the residuals is an attribute
         self.I = []
+        # Log-binned periodogram, log-frequencies and effective number of 
+        # independent averaged values
+        self.I_bin = None
+        self.logf_bin = None
+        self.n_avg = None
         # Initialize the sampler
         samplers.MHSampler.__init__(self, n_knots + 1, self.psd_posterior)
 
-    def set_periodogram(self, z_fft, K2=None):
+    def set_periodogram(self, z_fft, K2=None, wind=None):
         """
         Assign a value to the periodogram attribute
 
         Parameters
         ----------
-        z_fft : array_like
-            vector of residal DFT     
+        z_fft : array_like or list
+            vector of residal DFT, or list of DFTs of data segments (possibly
+            of different sizes). Segments are log-binned and weighted 
+            separately.
         K2 : scalar float
             periodogram normalization. Should always be 
             sum(W**2) where W is the window function applied in the time domain.
             If k2 is None, the length n_data of the data is taken.
+        wind : array_like, optional
+            time window W applied to the data before the DFT. It sets the 
+            correlation of adjacent periodogram values, hence the effective 
+            number of independent values in the log-binned periodogram. 
+            If None, the last window used to estimate the PSD is assumed.
         
         """
+        if wind is not None:
+            self.bin_corr = psdmodel.periodogram_bin_correlation(wind)
         if type(z_fft) == np.ndarray :
             self.I = self.periodogram(z_fft, k2= K2)
+            if self.n_bins is not None:
+                # Compress the periodogram once, for all likelihood calls
+                f_bin, self.I_bin, n_avg = psdmodel.log_bin_periodogram(
+                    np.exp(self.logf[self.n_data]), self.I[1:self.n+1],
+                    n_bins=self.n_bins)
+                self.n_avg = psdmodel.effective_n_avg(n_avg, 
+                                                      rho=self.bin_corr)
+                self.logf_bin = np.log(f_bin)
         elif type(z_fft) == list:
             self.I = [self.periodogram(zf, k2= K2) for zf in z_fft]
+            # Positive-frequency values of each segment, compressed like a
+            # single periodogram
+            segments = [self.segment_periodogram(per) for per in self.I]
+            self.logf_bin = [seg[0] for seg in segments]
+            self.I_bin = [seg[1] for seg in segments]
+            self.n_avg = [seg[2] for seg in segments]
+
+    def segment_periodogram(self, per):
+        """
+        Log-frequencies, periodogram values and weights entering the 
+        likelihood for one data segment, whose size may differ from n_data.
+
+        Parameters
+        ----------
+        per : ndarray
+            periodogram of the segment at all its Fourier frequencies
+
+        Returns
+        -------
+        logf : ndarray
+            log-frequencies
+        per_pos : ndarray
+            periodogram at positive frequencies, log-binned if n_bins is set
+        n_avg : ndarray or None
+            effective number of independent values averaged in each bin 
+            (None if the periodogram is not binned)
+
+        """
+
+        n_seg = len(per)
+        if n_seg not in self.logf:
+            f = np.fft.fftfreq(n_seg) * self.fs
+            self.logf[n_seg] = np.log(f[f > 0])
+        logf = self.logf[n_seg]
+        per_pos = per[1:logf.shape[0] + 1]
+        if self.n_bins is None:
+            return logf, per_pos, None
+        f_bin, per_bin, n_avg = psdmodel.log_bin_periodogram(
+            np.exp(logf), per_pos, n_bins=self.n_bins)
+
+        return np.log(f_bin), per_bin, psdmodel.effective_n_avg(
+            n_avg, rho=self.bin_corr)
 
     def psd_likelihood(self, x):
         """
@@ -82,21 +150,27 @@ class PSDSampler(psdmodel.PSDSpline, samplers.MHSampler):
                                         fill_value="extrapolate")
         
         # If only one segment of data is analyzed
-        if type(self.I) == np.ndarray:
+        if type(self.I) == np.ndarray and self.I_bin is not None:
+            # Whittle likelihood of the log-binned periodogram
+            logS = logSfunc(self.logf_bin)
+            I_weighted = self.I_bin * np.exp( - logS )
+            ll = np.real( -0.5*np.sum( self.n_avg * (logS + I_weighted) ) )
+
+        elif type(self.I) == np.ndarray:
             logS = logSfunc(self.logf[self.n_data])
             I_weighted = self.I[1:self.n+1] * np.exp( - logS )
             ll = np.real( -0.5*np.sum( logS + I_weighted ) )
             
         # If several segments of different lengths are considered:
         elif type(self.I) == list:
-            Nsegs = list(self.logf.keys())
-            Ls = len(Nsegs)
-            logS_list = [logSfunc(self.logf[self.NI]) for NI in Nsegs]
-            
-            I_weighted_list = [self.I[j][1:np.int((Nsegs[j]-1)/2)+1] * np.exp( - logS_list[j] ) \
-                          for j in range(Ls)]
-            
-            ll = sum([np.real( -0.5*np.sum( logS_list[j] + I_weighted_list[j] ) ) for j in range(Ls)])
+            ll = 0
+            for logf, per, n_avg in zip(self.logf_bin, self.I_bin, 
+                                        self.n_avg):
+                logS = logSfunc(logf)
+                terms = logS + per * np.exp( - logS )
+                if n_avg is not None:
+                    terms = n_avg * terms
+                ll += np.real( -0.5*np.sum( terms ) )
 
         return ll
 
@@ -290,6 +290,105 @@ class MHSampler(object):
         return x_samples, logp_samples
 
 
+class VectorizedPool(object):
+
+    def __init__(self, batch_funcs=None, pool=None):
+        """
+        Pool-like object that evaluates the log-likelihood of all the walkers
+        of an ensemble sampler in a single batched call.
+
+        Samplers like ptemcee or dynesty evaluate the log-likelihood through
+        the map method of the pool they are given. This class intercepts the
+        map calls and replaces the walker-by-walker evaluations by a single 
+        call to a batched version of the log-likelihood, taking an array of 
+        size n_walkers x ndim and returning an array of size n_walkers.
+
+        Parameters
+        ----------
+        batch_funcs : dict, optional
+            dictionary mapping the scalar log-likelihood functions to their
+            batched counterparts. If a function is not found, the batched 
+            function is looked for as a method of the same object with the 
+            suffix '_batch' (e.g. LogLike.log_likelihood_batch for 
+            LogLike.log_likelihood).
+        pool : object, optional
+            pool to use for the evaluations that cannot be batched. If None, 
+            the built-in map is used.
+
+        """
+
+        if batch_funcs is None:
+            batch_funcs = {}
+        self.batch_funcs = batch_funcs
+        self.pool = pool
+
+    def get_batch_function(self, func):
+        """
+        Returns the batched version of a scalar function, or None if there is
+        not any.
+        """
+
+        try:
+            if func in self.batch_funcs:
+                return self.batch_funcs[func]
+        except TypeError:
+            return None
+        if hasattr(func, '__self__') & hasattr(func, '__name__'):
+            return getattr(func.__self__, func.__name__ + '_batch', None)
+
+        return None
+
+    def map(self, func, iterable, *args, **kwargs):
+        """
+        Apply a function to every item of iterable, batching the 
+        log-likelihood evaluations when possible.
+
+        """
+
+        # ptemcee likelihood-prior evaluator
+        if all([hasattr(func, attr) for attr in ['logl', 'logp', 'loglargs']]):
+            batch_func = self.get_batch_function(func.logl)
+            if batch_func is not None:
+                return self.map_likeprior(func, batch_func, iterable)
+        # dynesty-like function wrapper
+        elif all([hasattr(func, attr) for attr in ['func', 'args', 'kwargs']]):
+            batch_func = self.get_batch_function(func.func)
+            if batch_func is not None:
+                x = np.asarray(list(iterable))
+                return list(batch_func(x, *func.args, **func.kwargs))
+
+        if self.pool is None:
+            return list(map(func, iterable))
+        return self.pool.map(func, iterable, *args, **kwargs)
+
+    def map_likeprior(self, func, batch_func, iterable):
+        """
+        Evaluate the log-prior and the log-likelihood of a set of walkers,
+        following ptemcee's LikePriorEvaluator conventions.
+
+        """
+
+        x = np.asarray(list(iterable))
+        lp = np.array([func.logp(xi, *func.logpargs, **func.logpkwargs) 
+                       for xi in x], dtype=np.float64)
+        if np.isnan(lp).any():
+            raise ValueError('Prior function returned NaN.')
+        ll = np.zeros(x.shape[0], dtype=np.float64)
+        # The likelihood is not computed outside the prior support
+        inds = np.where(lp != -np.inf)[0]
+        if inds.size > 0:
+            ll[inds] = batch_func(x[inds], *func.loglargs, **func.loglkwargs)
+            if np.isnan(ll).any():
+                raise ValueError('Log likelihood function returned NaN.')
+
+        return list(zip(ll, lp))
+
+    def close(self):
+
+        if self.pool is not None:
+            self.pool.close()
+
+
 class ExtendedPTMCMC(ptemcee.Sampler):
 
     def __init__(self, *args, **kwargs):
@@ -14,6 +14,8 @@ from bayesdawn.gaps import gapgenerator
 c_light = 299792458.0
 pc = 3.085677581491367e+16
 year = 31557600.0
+# Solar mass in seconds (G M_sun / c^3)
+t_sun = 4.925490947641267e-06
 
 
 def compute_masses(mc, q):
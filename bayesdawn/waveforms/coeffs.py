@@ -9,6 +9,28 @@ Created on Fri Feb  1 15:36:02 2019
 import numpy as np
 
 
+def stack_coeffs(coeff_list, zero):
+    """
+    Stack coefficients along a last axis, broadcasting scalars and arrays
+    to the shape of the sky positions.
+
+    Parameters
+    ----------
+    coeff_list : list
+        list of scalars or arrays
+    zero : ndarray
+        array of zeros with the broadcast shape of the inputs
+
+    Returns
+    -------
+    coeffs : ndarray
+        array of size zero.shape + (len(coeff_list), )
+
+    """
+
+    return np.stack([zero + co for co in coeff_list], axis=-1)
+
+
 def k_coeffs(params, Phi_rot, i, j):
     """
 
@@ -41,8 +63,8 @@ def k_coeffs(params, Phi_rot, i, j):
     # Two vectors of size 10: coeffs_p = da_p,db_p and coeffs_c = da_c,db_c
     coeffs_p, coeffs_c = xi_diff_coeffs(theta, phi, Phi_rot, i, j)
 
-    k_p = coeffs_p[0:5] - 1j*coeffs_p[5:10]
-    k_c = coeffs_c[0:5] - 1j*coeffs_c[5:10]
+    k_p = coeffs_p[..., 0:5] - 1j*coeffs_p[..., 5:10]
+    k_c = coeffs_c[..., 0:5] - 1j*coeffs_c[..., 5:10]
 
     return k_p, k_c
 
@@ -80,20 +102,18 @@ def kn_coeffs(theta, phi, phi_rot, i):
 
     # phi_i = (2 * i + 1) * np.pi / 3 - phi_rot
     phi_i = (phi_rot_i_func(i + 2, phi_rot) + phi_rot_i_func(i + 1, phi_rot))/2
-
-    a = np.zeros(3, dtype=np.float64)
-    b = np.zeros(3, dtype=np.float64)
+    zero = np.zeros(np.broadcast(theta, phi, phi_i).shape)
 
     # m = 0
-    a[0] = 3 / 4 * np.sin(theta) * np.sin(phi_i - phi)
+    a0 = 3 / 4 * np.sin(theta) * np.sin(phi_i - phi)
     # m = 1
-    a[1] = np.sqrt(3) / 2 * np.cos(theta) * np.sin(phi_i)
-    b[1] = - np.sqrt(3) / 2 * np.cos(theta) * np.cos(phi_i)
+    a1 = np.sqrt(3) / 2 * np.cos(theta) * np.sin(phi_i)
+    b1 = - np.sqrt(3) / 2 * np.cos(theta) * np.cos(phi_i)
     # m = 2
-    a[2] = - np.sin(theta) / 4 * np.sin(phi + phi_i)
-    b[2] = np.sin(theta) / 4 * np.cos(phi + phi_i)
+    a2 = - np.sin(theta) / 4 * np.sin(phi + phi_i)
+    b2 = np.sin(theta) / 4 * np.cos(phi + phi_i)
 
-    return a, b
+    return stack_coeffs([a0, a1, a2], zero), stack_coeffs([0, b1, b2], zero)
 
 
 def kn_bar_coeffs(theta, phi, phi_rot, i):
@@ -127,20 +147,18 @@ def kn_bar_coeffs(theta, phi, phi_rot, i):
 
     # phi_i = (2 * i + 1) * np.pi / 3 - phi_rot
     phi_i = (phi_rot_i_func(i, phi_rot) + phi_rot_i_func(i - 1, phi_rot))/2
-
-    a = np.zeros(3, dtype=np.float64)
-    b = np.zeros(3, dtype=np.float64)
+    zero = np.zeros(np.broadcast(theta, phi, phi_i).shape)
 
     # m = 0
-    a[0] = - 3 / 8 * np.sin(theta) * np.cos(phi - phi_i)
+    a0 = - 3 / 8 * np.sin(theta) * np.cos(phi - phi_i)
     # m = 1
-    a[1] = - np.sqrt(3) / 4 * np.cos(theta) * np.cos(phi_i)
-    b[1] = - np.sqrt(3) / 4 * np.cos(theta) * np.sin(phi_i)
+    a1 = - np.sqrt(3) / 4 * np.cos(theta) * np.cos(phi_i)
+    b1 = - np.sqrt(3) / 4 * np.cos(theta) * np.sin(phi_i)
     # m = 2
-    a[2] = np.sin(theta) / 8 * np.cos(phi + phi_i)
-    b[2] = np.sin(theta) / 8 * np.sin(phi + phi_i)
+    a2 = np.sin(theta) / 8 * np.cos(phi + phi_i)
+    b2 = np.sin(theta) / 8 * np.sin(phi + phi_i)
 
-    return a, b
+    return stack_coeffs([a0, a1, a2], zero), stack_coeffs([0, b1, b2], zero)
 
 
 def ku_coeffs(theta, phi, phi_rot, i):
@@ -173,20 +191,18 @@ def ku_coeffs(theta, phi, phi_rot, i):
 
     # phi_i = (2 * i + 1) * np.pi / 3 - phi_rot
     phi_rot_i = phi_rot_i_func(i, phi_rot)
-
-    a = np.zeros(3, dtype=np.float64)
-    b = np.zeros(3, dtype=np.float64)
+    zero = np.zeros(np.broadcast(theta, phi, phi_rot_i).shape)
 
     # m = 0
-    a[0] = 3 / 4 * np.sin(theta) * np.cos(phi - phi_rot_i)
+    a0 = 3 / 4 * np.sin(theta) * np.cos(phi - phi_rot_i)
     # m = 1
-    a[1] = np.sqrt(3) / 2 * np.cos(theta) * np.cos(phi_rot_i)
-    b[1] = np.sqrt(3) / 2 * np.cos(theta) * np.sin(phi_rot_i)
+    a1 = np.sqrt(3) / 2 * np.cos(theta) * np.cos(phi_rot_i)
+    b1 = np.sqrt(3) / 2 * np.cos(theta) * np.sin(phi_rot_i)
     # m = 2
-    a[2] = - np.sin(theta) / 4 * np.cos(phi + phi_rot_i)
-    b[2] = - np.sin(theta) / 4 * np.sin(phi + phi_rot_i)
+    a2 = - np.sin(theta) / 4 * np.cos(phi + phi_rot_i)
+    b2 = - np.sin(theta) / 4 * np.sin(phi + phi_rot_i)
 
-    return a, b
+    return stack_coeffs([a0, a1, a2], zero), stack_coeffs([0, b1, b2], zero)
 
 
 def xi_diff_coeffs(theta, phi, phi_rot, i, j):
@@ -236,46 +252,37 @@ def xi_diff_coeffs(theta, phi, phi_rot, i, j):
     cos2theta = np.cos(2 * theta)
     sin2theta = np.sin(2 * theta)
     sinPhi_minus = np.sin(Phi_minus)
+    zero = np.zeros(np.broadcast(theta, phi, Phi_plus).shape)
 
     # Compute the coefficients for + polarization
-    da_p = np.zeros(5, dtype=np.float64)
-    da_p[0] = -9 / 32 * np.sin(2 * phi - Phi_plus) * (cos2theta + 3)
-    da_p[1] = -3 * np.sqrt(3) / 8 * sin2theta * np.sin(-phi + Phi_plus)
-    da_p[2] = 9 / 16 * (1 - cos2theta) * np.sin(Phi_plus)
-    da_p[3] = np.sqrt(3) / 8 * sin2theta * np.sin(phi + Phi_plus)
-    da_p[4] = 1 / 32. * (cos2theta + 3) * np.sin(2 * phi + Phi_plus)
-    da_p = sinPhi_minus * da_p
-
-    db_p = np.zeros(5, dtype=np.float64)
-    db_p[0] = 0
-    db_p[1] = 3 * np.sqrt(3) / 8 * sin2theta * np.cos(-phi + Phi_plus)
-    db_p[2] = -9 / 16 * (1 - cos2theta) * np.cos(Phi_plus)
-    db_p[3] = -np.sqrt(3) / 8 * sin2theta * np.cos(phi + Phi_plus)
-    db_p[4] = -1 / 32. * (cos2theta + 3) * np.cos(2 * phi + Phi_plus)
-
-    db_p = sinPhi_minus * db_p
+    da_p = [-9 / 32 * np.sin(2 * phi - Phi_plus) * (cos2theta + 3),
+            -3 * np.sqrt(3) / 8 * sin2theta * np.sin(-phi + Phi_plus),
+            9 / 16 * (1 - cos2theta) * np.sin(Phi_plus),
+            np.sqrt(3) / 8 * sin2theta * np.sin(phi + Phi_plus),
+            1 / 32. * (cos2theta + 3) * np.sin(2 * phi + Phi_plus)]
+
+    db_p = [0,
+            3 * np.sqrt(3) / 8 * sin2theta * np.cos(-phi + Phi_plus),
+            -9 / 16 * (1 - cos2theta) * np.cos(Phi_plus),
+            -np.sqrt(3) / 8 * sin2theta * np.cos(phi + Phi_plus),
+            -1 / 32. * (cos2theta + 3) * np.cos(2 * phi + Phi_plus)]
 
     # Compute coefficients for x polarization
-    da_c = np.zeros(5, dtype=np.float64)
-    da_c[0] = - 9 / 8. * costheta * np.cos(2 * phi - Phi_plus)
-    da_c[1] = 3 / 4. * np.sqrt(3) * sintheta * np.cos(phi - Phi_plus)
-    da_c[2] = 0
-    da_c[3] = (1 / 4.) * np.sqrt(3) * sintheta * np.cos(phi + Phi_plus)
-    da_c[4] = 1 / 8. * costheta * np.cos(2 * phi + Phi_plus)
-
-    da_c = sinPhi_minus * da_c
-
-    db_c = np.zeros(5, dtype=np.float64)
-    db_c[0] = 0
-    db_c[1] = - 3 / 4. * np.sqrt(3) * sintheta * np.sin(phi - Phi_plus)
-    db_c[2] = 0
-    db_c[3] = 1 / 4. * np.sqrt(3) * sintheta * np.sin(phi + Phi_plus)
-    db_c[4] = 1 / 8. * costheta * np.sin(2 * phi + Phi_plus)
-
-    db_c = sinPhi_minus * db_c
-
-    coeffs_plus = np.concatenate((da_p, db_p))
-    coeffs_cros = np.concatenate((da_c, db_c))
+    da_c = [- 9 / 8. * costheta * np.cos(2 * phi - Phi_plus),
+            3 / 4. * np.sqrt(3) * sintheta * np.cos(phi - Phi_plus),
+            0,
+            (1 / 4.) * np.sqrt(3) * sintheta * np.cos(phi + Phi_plus),
+            1 / 8. * costheta * np.cos(2 * phi + Phi_plus)]
+
+    db_c = [0,
+            - 3 / 4. * np.sqrt(3) * sintheta * np.sin(phi - Phi_plus),
+            0,
+            1 / 4. * np.sqrt(3) * sintheta * np.sin(phi + Phi_plus),
+            1 / 8. * costheta * np.sin(2 * phi + Phi_plus)]
+
+    sinPhi_minus = np.asarray(sinPhi_minus)[..., np.newaxis]
+    coeffs_plus = sinPhi_minus * stack_coeffs(da_p + db_p, zero)
+    coeffs_cros = sinPhi_minus * stack_coeffs(da_c + db_c, zero)
 
     return coeffs_plus, coeffs_cros
 
@@ -307,8 +314,8 @@ def k_coeffs_single(params, phi_rot, i):
     # Two vectors of size 10: coeffs_p = da_p,db_p and coeffs_c = da_c,db_c
     coeffs_p, coeffs_c = xi_coeffs(theta, phi, phi_rot, i)
 
-    k_p = coeffs_p[0:5] - 1j*coeffs_p[5:10]
-    k_c = coeffs_c[0:5] - 1j*coeffs_c[5:10]
+    k_p = coeffs_p[..., 0:5] - 1j*coeffs_p[..., 5:10]
+    k_c = coeffs_c[..., 0:5] - 1j*coeffs_c[..., 5:10]
 
     return k_p, k_c
 
@@ -359,44 +366,219 @@ def xi_coeffs(theta, phi, phi_rot, i):
     cos2theta = np.cos(2 * theta)
     sin2theta = np.sin(2 * theta)
 
+    zero = np.zeros(np.broadcast(theta, phi, phi_i).shape)
+
     # Compute the coefficients for + polarization
-    a_p = np.zeros(5, dtype=np.float64)
-    a_p[0] = -1/64 * (9 * np.cos(2 * phi - 2 * phi_i) * (cos2theta + 3) + 2 * (cos2theta - 1))
-    a_p[1] = np.sqrt(3) / 16 * sin2theta * (3 * np.cos(phi - 2 * phi_i) - 2 * np.cos(phi))
-    # a_p[2] = 3 / 32 * (3 * np.cos(2 * phi_i) * (cos2theta - 2) - np.cos(2 * phi) * (cos2theta + 6))
-    a_p[2] = 3 / 32 * (3 * np.cos(2 * phi_i) * (cos2theta - 1) - np.cos(2 * phi) * (cos2theta + 3))
-    a_p[3] = - np.sqrt(3) / 16 * sin2theta * np.cos(phi + 2 * phi_i)
-    a_p[4] = - 1/64 * np.cos(2 * phi + 2 * phi_i) * (cos2theta + 3)
-
-    b_p = np.zeros(5, dtype=np.float64)
-    b_p[0] = 0
-    b_p[1] = - np.sqrt(3) / 16 * sin2theta * (3 * np.sin(phi - 2 * phi_i) + 2 * np.sin(phi))
-    # b_p[2] = 3 / 32 * (3 * np.sin(2 * phi_i) * (cos2theta - 2) - np.sin(2 * phi) * (cos2theta + 6))
-    b_p[2] = 3 / 32 * (3 * np.sin(2 * phi_i) * (cos2theta - 1) - np.sin(2 * phi) * (cos2theta + 3))
-    b_p[3] = - np.sqrt(3) / 16 * sin2theta * np.sin(phi + 2 * phi_i)
-    b_p[4] = - 1/64 * np.sin(2 * phi + 2 * phi_i) * (cos2theta + 3)
+    a_p = [-1/64 * (9 * np.cos(2 * phi - 2 * phi_i) * (cos2theta + 3) + 2 * (cos2theta - 1)),
+           np.sqrt(3) / 16 * sin2theta * (3 * np.cos(phi - 2 * phi_i) - 2 * np.cos(phi)),
+           # 3 / 32 * (3 * np.cos(2 * phi_i) * (cos2theta - 2) - np.cos(2 * phi) * (cos2theta + 6))
+           3 / 32 * (3 * np.cos(2 * phi_i) * (cos2theta - 1) - np.cos(2 * phi) * (cos2theta + 3)),
+           - np.sqrt(3) / 16 * sin2theta * np.cos(phi + 2 * phi_i),
+           - 1/64 * np.cos(2 * phi + 2 * phi_i) * (cos2theta + 3)]
+
+    b_p = [0,
+           - np.sqrt(3) / 16 * sin2theta * (3 * np.sin(phi - 2 * phi_i) + 2 * np.sin(phi)),
+           # 3 / 32 * (3 * np.sin(2 * phi_i) * (cos2theta - 2) - np.sin(2 * phi) * (cos2theta + 6))
+           3 / 32 * (3 * np.sin(2 * phi_i) * (cos2theta - 1) - np.sin(2 * phi) * (cos2theta + 3)),
+           - np.sqrt(3) / 16 * sin2theta * np.sin(phi + 2 * phi_i),
+           - 1/64 * np.sin(2 * phi + 2 * phi_i) * (cos2theta + 3)]
 
     # Compute coefficients for x polarization
-    a_c = np.zeros(5, dtype=np.float64)
-    a_c[0] = 9/16 * costheta * np.sin(2 * phi - 2 * phi_i)
-    a_c[1] = np.sqrt(3) / 8 * sintheta * (2 * np.sin(phi) - 3 * np.sin(phi - 2 * phi_i))
-    a_c[2] = 3 / 8 * costheta * np.sin(2 * phi)
-    a_c[3] = np.sqrt(3) / 8 * sintheta * np.sin(phi + 2 * phi_i)
-    a_c[4] = 1 / 16 * costheta * np.sin(2 * phi + 2 * phi_i)
-
-    b_c = np.zeros(5, dtype=np.float64)
-    b_c[0] = 0
-    b_c[1] = - np.sqrt(3) / 8 * sintheta * (2 * np.cos(phi) + 3 * np.cos(phi - 2 * phi_i))
-    b_c[2] = - 3 / 8 * costheta * np.cos(2 * phi)
-    b_c[3] = - np.sqrt(3) / 8 * sintheta * np.cos(phi + 2 * phi_i)
-    b_c[4] = - 1 / 16 * costheta * np.cos(2 * phi + 2 * phi_i)
+    a_c = [9/16 * costheta * np.sin(2 * phi - 2 * phi_i),
+           np.sqrt(3) / 8 * sintheta * (2 * np.sin(phi) - 3 * np.sin(phi - 2 * phi_i)),
+           3 / 8 * costheta * np.sin(2 * phi),
+           np.sqrt(3) / 8 * sintheta * np.sin(phi + 2 * phi_i),
+           1 / 16 * costheta * np.sin(2 * phi + 2 * phi_i)]
 
-    coeffs_plus = np.concatenate((a_p, b_p))
-    coeffs_cros = np.concatenate((a_c, b_c))
+    b_c = [0,
+           - np.sqrt(3) / 8 * sintheta * (2 * np.cos(phi) + 3 * np.cos(phi - 2 * phi_i)),
+           - 3 / 8 * costheta * np.cos(2 * phi),
+           - np.sqrt(3) / 8 * sintheta * np.cos(phi + 2 * phi_i),
+           - 1 / 16 * costheta * np.cos(2 * phi + 2 * phi_i)]
+
+    coeffs_plus = stack_coeffs(a_p + b_p, zero)
+    coeffs_cros = stack_coeffs(a_c + b_c, zero)
 
     return coeffs_plus, coeffs_cros
 
 
+def response_coeffs(theta, phi, phi_rot, channel='TDIAET'):
+    """
+    Compute the response coefficients k_+ and k_x of the three arms for 
+    any number of sky positions at once.
+
+    Parameters
+    ----------
+    theta : scalar float or ndarray
+        colatitude angle: theta = beta + pi/2 if beta is the ecliptic latitude
+    phi : scalar float or ndarray
+        longitude angle such taht phi = lam - pi where lam is the ecliptic
+        longitude
+    phi_rot : scalar float
+        initial angle of LISA constellation
+    channel : str
+        type of data channel among {'phasemeters', 'TDIAET', 'TDIXYZ'}. 
+        For phasemeters the arms are ordered as 3, 1, 2 (see 
+        k_coeffs_single), otherwise the differences 23, 31, 12 are used 
+        (see k_coeffs).
+
+    Returns
+    -------
+    k_p : ndarray
+        + coefficients, size theta.shape + (3, 5)
+    k_c : ndarray
+        x coefficients, size theta.shape + (3, 5)
+
+    """
+
+    theta = np.asarray(theta)[..., np.newaxis]
+    phi = np.asarray(phi)[..., np.newaxis]
+
+    if channel == 'phasemeters':
+        coeffs_p, coeffs_c = xi_coeffs(theta, phi, phi_rot, 
+                                       np.array([3, 1, 2]))
+    else:
+        coeffs_p, coeffs_c = xi_diff_coeffs(theta, phi, phi_rot, 
+                                            np.array([2, 3, 1]),
+                                            np.array([3, 1, 2]))
+    k_p = coeffs_p[..., 0:5] - 1j*coeffs_p[..., 5:10]
+    k_c = coeffs_c[..., 0:5] - 1j*coeffs_c[..., 5:10]
+
+    return k_p, k_c
+
+
+def polarization_rotation(k_p, k_c, psi):
+    """
+    Include the polarization angle in the response coefficients, such that
+    the response to (A_+, A_x) with angle psi equals the response to the 
+    same amplitudes with angle 0 computed from the rotated coefficients 
+    (see beta_gb).
+
+    Parameters
+    ----------
+    k_p : ndarray
+        + coefficients, size ... x n_arms x 5
+    k_c : ndarray
+        x coefficients, size ... x n_arms x 5
+    psi : scalar float or ndarray
+        polarization angle, of shape broadcastable with k_p.shape[:-2]
+
+    Returns
+    -------
+    k_p_psi : ndarray
+        rotated + coefficients
+    k_c_psi : ndarray
+        rotated x coefficients
+
+    """
+
+    cos2psi = np.cos(2 * np.asarray(psi))[..., np.newaxis, np.newaxis]
+    sin2psi = np.sin(2 * np.asarray(psi))[..., np.newaxis, np.newaxis]
+
+    return k_p * cos2psi - k_c * sin2psi, k_p * sin2psi + k_c * cos2psi
+
+
+def sky_harmonics(theta, phi):
+    """
+    Products of the harmonics of order 0, 1, 2 of the colatitude and the
+    longitude, on which all response coefficients decompose.
+
+    Parameters
+    ----------
+    theta : scalar float or ndarray
+        colatitude angle
+    phi : scalar float or ndarray
+        longitude angle
+
+    Returns
+    -------
+    harmonics : ndarray
+        array of size theta.shape + (25, )
+
+    """
+
+    theta, phi = np.broadcast_arrays(theta, phi)
+    one = np.ones(theta.shape)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    cos_p, sin_p = np.cos(phi), np.sin(phi)
+    h_t = np.stack([one, cos_t, sin_t, cos_t ** 2 - sin_t ** 2, 
+                    2 * sin_t * cos_t], axis=-1)
+    h_p = np.stack([one, cos_p, sin_p, cos_p ** 2 - sin_p ** 2, 
+                    2 * sin_p * cos_p], axis=-1)
+
+    return (h_t[..., :, np.newaxis] * h_p[..., np.newaxis, :]).reshape(
+        theta.shape + (25, ))
+
+
+class ResponseCoeffTable(object):
+    """
+    Precomputed table of the response coefficients of all arms. The 
+    coefficients are trigonometric polynomials of order 2 in the sky angles,
+    so the table stores their expansion on sky_harmonics, and evaluating 
+    them for any sky position is a product with the harmonics.
+
+    """
+
+    def __init__(self, phi_rot=0, channel='TDIAET'):
+        """
+
+        Parameters
+        ----------
+        phi_rot : scalar float
+            initial angle of LISA constellation
+        channel : str
+            type of data channel, see response_coeffs
+
+        """
+
+        self.phi_rot = phi_rot
+        self.channel = channel
+        # Solve for the expansion on a grid of sky positions
+        theta_grid, phi_grid = np.meshgrid(np.linspace(0.1, np.pi - 0.1, 9),
+                                           np.linspace(-3, 3, 9))
+        k_p, k_c = response_coeffs(theta_grid.ravel(), phi_grid.ravel(),
+                                   phi_rot, channel=channel)
+        self.shape = k_p.shape[1:]
+        values = np.hstack((k_p.reshape((k_p.shape[0], -1)), 
+                            k_c.reshape((k_c.shape[0], -1))))
+        self.table = np.linalg.lstsq(
+            sky_harmonics(theta_grid.ravel(), phi_grid.ravel()), values, 
+            rcond=None)[0]
+
+    def __call__(self, theta, phi, psi=None):
+        """
+        Evaluate the response coefficients from the table.
+
+        Parameters
+        ----------
+        theta : scalar float or ndarray
+            colatitude angle
+        phi : scalar float or ndarray
+            longitude angle
+        psi : scalar float or ndarray, optional
+            polarization angle. If provided, the coefficients are rotated 
+            with polarization_rotation.
+
+        Returns
+        -------
+        k_p : ndarray
+            + coefficients, size theta.shape + (3, 5)
+        k_c : ndarray
+            x coefficients, size theta.shape + (3, 5)
+
+        """
+
+        harmonics = sky_harmonics(theta, phi)
+        values = np.dot(harmonics, self.table)
+        n_val = values.shape[-1] // 2
+        k_p = values[..., 0:n_val].reshape(harmonics.shape[:-1] + self.shape)
+        k_c = values[..., n_val:].reshape(harmonics.shape[:-1] + self.shape)
+        if psi is not None:
+            k_p, k_c = polarization_rotation(k_p, k_c, psi)
+
+        return k_p, k_c
+
+
 def beta_gb(a0, incl, phi_0, psi):
     """
     Create symbolic mathematical expression giving the vector beta of
@@ -472,4 +654,4 @@ def cyclic_perm(i):
         while j < -3:
             j = j + 4
 
-    return np.int(j)
\ No newline at end of file
+    return int(j)
\ No newline at end of file
@@ -15,9 +15,10 @@ except ImportError:
 import numpy as np
 import time
 from scipy import special
+from scipy import interpolate
 from scipy.constants import c, au, year
 from scipy.interpolate import InterpolatedUnivariateSpline as spline
-from . import coeffs
+from . import coeffs, wavefuncs
 import pyfftw
 from ..utils import physics
 from pyfftw.interfaces.numpy_fft import fft, ifft, rfft
@@ -35,6 +36,11 @@ i_tc = 4
 i_ext = [i_dist, i_inc, i_phi0, i_psi]
 # Indices of intrinsic parameters
 i_intr = [0, 1, 2, 3, 4, 8, 9]
+# LISA orbital phase tables, shared by the UCBWaveformFull instances with 
+# the same time grid
+lisa_phase_tables = {}
+# Analysis frequency grids on which lisabeta outputs are resampled
+resampling_grids = {}
 
 
 def indices_low_freq(channel):
@@ -88,11 +94,148 @@ def optimal_order(theta, f_0):
     # Modulation index
     mf = 2 * np.pi * f_0 * np.abs(d0)
     # Empirical model
-    nc = np.int(1.2185 * mf + 5.625) + 1
+    nc = int(1.2185 * mf + 5.625) + 1
 
     return nc
 
 
+def leakage_bins(leakage_tol):
+    """
+    Number of Fourier bins beyond which the spectral leakage of a finite 
+    observation (rectangular window) carries less than a fraction 
+    leakage_tol of the energy of a monochromatic signal. The leakage 
+    sinc^2(k + r) only decays as 1 / k^2, so the energy beyond k = K bins on 
+    both sides is bounded by 2 / (pi^2 K).
+
+    Parameters
+    ----------
+    leakage_tol : float
+        maximum fraction of the signal energy outside the bins
+
+    Returns
+    -------
+    n_bins : int
+        number of bins on each side of the signal frequency
+
+    """
+
+    return int(np.ceil(2 / (np.pi ** 2 * leakage_tol)))
+
+
+def ucb_frequency_support(f_0, f_dot, tobs, theta=np.pi / 2, n_side=5, 
+                          n_bins=None, leakage_tol=1e-4):
+    """
+    Frequency interval outside which the LISA response to a quasi-
+    monochromatic source carries less than a fraction leakage_tol of its 
+    energy.
+
+    Parameters
+    ----------
+    f_0 : float
+        frequency at the start of the observation [Hz]
+    f_dot : float
+        frequency derivative [Hz^2]
+    tobs : float
+        observation time [s]
+    theta : float
+        colatitude [rad], setting the amplitude of the Doppler modulation
+    n_side : int
+        number of yearly sidebands added on each side to account for the 
+        amplitude modulation
+    n_bins : int or None
+        number of Fourier bins added on each side to account for the 
+        spectral leakage of the finite observation. If None, it is set by 
+        leakage_tol (see leakage_bins).
+    leakage_tol : float
+        maximum fraction of the signal energy lost outside the support, 
+        used if n_bins is None
+
+    Returns
+    -------
+    f_min, f_max : float
+        bounds of the frequency support
+
+    """
+
+    if n_bins is None:
+        n_bins = leakage_bins(leakage_tol)
+    f_min = min(f_0, f_0 + f_dot * tobs)
+    f_max = max(f_0, f_0 + f_dot * tobs)
+    # Doppler frequency deviation due to the LISA orbit
+    f_doppler = 2 * np.pi * f_max * au * np.abs(np.sin(theta)) / (c * year)
+    del_f = f_doppler + n_side / year + n_bins / tobs
+
+    return f_min - del_f, f_max + del_f
+
+
+def narrowband_grid(f_min, f_max, df):
+    """
+    Fourier bins of spacing df covering a frequency interval.
+
+    Parameters
+    ----------
+    f_min, f_max : float
+        bounds of the frequency interval
+    df : float
+        frequency resolution
+
+    Returns
+    -------
+    i_start : int
+        index of the first bin
+    f : ndarray
+        frequencies of the bins i_start, i_start + 1, .. within the interval
+
+    """
+
+    i_start = max(int(np.ceil(f_min / df)), 0)
+    i_end = max(int(np.floor(f_max / df)) + 1, i_start)
+
+    return i_start, np.arange(i_start, i_end) * df
+
+
+def mbhb_frequency_support(params, t_start=0, mf_max=0.3, margin=0.1):
+    """
+    Frequency interval covered by the dominant harmonic of a MBHB during 
+    the observation, from the leading-order chirp at the start time up to 
+    the ringdown cut-off.
+
+    Parameters
+    ----------
+    params : ndarray
+        vector of waveform parameters with format m1, m2, chi1, chi2, Deltat, 
+        ... (masses in solar masses, Deltat the coalescence time in s)
+    t_start : float
+        starting time of the observation, in the same time reference as 
+        Deltat
+    mf_max : float
+        dimensionless cut-off frequency M f of the waveform (0.2 for 
+        IMRPhenomD), in units of the total mass
+    margin : float
+        fractional safety margin applied to the lower bound
+
+    Returns
+    -------
+    f_min, f_max : float
+        bounds of the frequency support
+
+    """
+
+    m1, m2, tc = params[0], params[1], params[i_tc]
+    # Masses in seconds
+    m_tot = (m1 + m2) * physics.t_sun
+    m_chirp = m_tot * (m1 * m2 / (m1 + m2) ** 2) ** (3 / 5)
+    f_max = mf_max / m_tot
+    tau = tc - t_start
+    if tau <= 0:
+        # The merger occurs before the observation starts
+        return 0, f_max
+    # Newtonian chirp (lower than the post-Newtonian one)
+    f_min = (5 / (256 * tau)) ** (3 / 8) * m_chirp ** (-5 / 8) / np.pi
+
+    return min((1 - margin) * f_min, f_max), f_max
+
+
 def convert_xyz_to_aet(x, y, z):
     a = (z - x) / np.sqrt(2.0)
     e = (x - 2.0 * y + z) / np.sqrt(6.0)
@@ -128,7 +271,7 @@ def form_design_matrix(uc, k_p, k_c, complex=False):
     ac_cros = np.dot(uc, k_c_tot)  # C_func*Dxi_c
 
     if not complex:
-        a_tmp = np.empty((np.int(2 * ac_plus.shape[0]), 4), dtype=np.float64)
+        a_tmp = np.empty((int(2 * ac_plus.shape[0]), 4), dtype=np.float64)
         a_tmp[:, 0] = np.concatenate((ac_plus.real, ac_plus.imag))
         a_tmp[:, 1] = np.concatenate((ac_cros.real, ac_cros.imag))
         a_tmp[:, 2] = np.concatenate((ac_plus.imag, -ac_plus.real))
@@ -202,7 +345,8 @@ class UCBWaveform(GWwaveform):
 
     """
 
-    def __init__(self, v_func, phi_rot=0, armlength=2.5e9, nc=15):
+    def __init__(self, v_func, phi_rot=0, armlength=2.5e9, nc=15,
+                 bessel_grid=None, coeff_table=None):
         """
 
 
@@ -210,7 +354,8 @@ class UCBWaveform(GWwaveform):
         ----------
         v_func : callable
             function of frequency giving the Fourier transform of
-            exp(-j*Phi(t)), where Phi(t) is the phase of the gravitatonal wave
+            exp(-j*Phi(t)), where Phi(t) is the phase of the gravitatonal wave.
+            It must accept frequency arrays of any shape.
         fs : scalar float
             sampling frequency
         phi_rot : scalar float
@@ -219,6 +364,14 @@ class UCBWaveform(GWwaveform):
             Arm length (default is 2.5e9 m)
         nc : scalar integer
             order of the Bessel function decomposition
+        bessel_grid : ndarray, optional
+            sorted grid of modulation indices 2 pi f_0 R sin(theta) / c where 
+            the Bessel functions are tabulated. If provided, the Bessel 
+            coefficients are interpolated from this table within the range 
+            of the grid instead of being computed.
+        coeff_table : coeffs.ResponseCoeffTable, optional
+            table of response coefficients, from which they are interpolated
+            instead of being computed, for the channel type of the table.
 
 
         """
@@ -234,6 +387,19 @@ class UCBWaveform(GWwaveform):
         self.m_max = 4
         self.m_vect = np.arange(0, self.m_max + 1)
         self.jw2 = []
+        # Last Bessel coefficients computed, reused for the same modulation 
+        # index
+        self.jw_ref = (None, None)
+        # Table of Bessel functions
+        self.bessel_grid = bessel_grid
+        self.bessel_spline = None
+        # Table of response coefficients
+        self.coeff_table = coeff_table
+        if bessel_grid is not None:
+            n_vect = np.arange(-self.nc, self.nc + 1)
+            self.bessel_spline = interpolate.CubicSpline(
+                bessel_grid, special.jv(n_vect[:, np.newaxis], 
+                                        bessel_grid[np.newaxis, :]), axis=1)
 
     def o2i(self, x):
         """
@@ -245,7 +411,7 @@ class UCBWaveform(GWwaveform):
 
         """
 
-        return np.int(x + self.nc + 4)
+        return int(x + self.nc + self.m_max)
 
     def bessel_decomp_pos(self, v_minus_list, jw, e_vect, n_vect, m):
         """
@@ -277,9 +443,9 @@ class UCBWaveform(GWwaveform):
 
         # when v = FT(e^(-jPhi))
         v_minus = [np.conj(v_minus_list[self.o2i(-m-n)])
-                   * e_vect[np.int(n + self.nc)] for n in n_vect]
+                   * e_vect[int(n + self.nc)] for n in n_vect]
         # when v = FT(e^(jPhi))
-        # v_minus = [v_minus_list[self.o2i(n + m)] * e_vect[np.int(n + self.nc)]
+        # v_minus = [v_minus_list[self.o2i(n + m)] * e_vect[int(n + self.nc)]
         #            for n in n_vect]
 
         y_c = sum([jw[k]*1/2.*v_minus[k] for k in range(len(v_minus))])
@@ -329,35 +495,82 @@ class UCBWaveform(GWwaveform):
         phi = params[1]
         f_0 = params[2]
         f_dot = params[3]
+        f = np.asarray(f)
 
         d0 = self.R * np.sin(theta) / c
         varphi = phi + np.pi/2
 
-        # Precompute the Bessel coefficients f, f_0, f_dot, ts, T1, T2
-        v_minus_list = [self.v_func(-f + k * self.f_t, f_0, f_dot, t_end, ts)
-                        for k in range(-self.nc - self.m_max,
-                                       self.nc + self.m_max + 1)]
+        # Values of v(f + k f_t) for all shifts k, size n_k x nf
+        k_vect = np.arange(-self.nc - self.m_max, self.nc + self.m_max + 1)
+        v_minus = self.v_func(-f[np.newaxis, :] 
+                              + k_vect[:, np.newaxis] * self.f_t, 
+                              f_0, f_dot, t_end, ts)
+        # All harmonics as a single product with v, for 
+        # m = 0, -1, .., -m_max, 0, 1, .., m_max (see bessel_decomp_pos)
+        mat = self.harmonic_matrix(2*np.pi*f_0*d0, varphi)
+        u = np.dot(mat, np.conj(v_minus))
 
-        n_vect = np.arange(-self.nc, self.nc + 1)
-        e_vect = np.exp(1j*n_vect*varphi)
+        return np.transpose(u * (2*np.pi*1j*f)**derivative)
 
-        jw = [special.jv(n, 2*np.pi*f_0*d0) for n in n_vect]
+    def bessel_coeffs(self, x):
+        """
+        Bessel functions jv(n, x) for n = -nc, .., nc. The last result is 
+        reused if the modulation index x did not change.
+
+        Parameters
+        ----------
+        x : float
+            modulation index 2 pi f_0 R sin(theta) / c
+
+        Returns
+        -------
+        jw : ndarray
+            Bessel coefficients, size 2 nc + 1
+
+        """
+
+        if x != self.jw_ref[0]:
+            if (self.bessel_spline is not None) and (
+                    self.bessel_grid[0] <= x <= self.bessel_grid[-1]):
+                jw = self.bessel_spline(x)
+            else:
+                jw = special.jv(np.arange(-self.nc, self.nc + 1), x)
+            self.jw_ref = (x, jw)
+
+        return self.jw_ref[1]
+
+    def harmonic_matrix(self, x, varphi):
+        """
+        Matrix of the Bessel decomposition, such that the basis functions of 
+        all harmonics m = 0, -1, .., -m_max, 0, 1, .., m_max are obtained 
+        by multiplying it with the conjugate of the stacked values of 
+        v(f + k f_t), k = -nc - m_max, .., nc + m_max.
+
+        Parameters
+        ----------
+        x : float
+            modulation index 2 pi f_0 R sin(theta) / c
+        varphi : float
+            phase of the modulation
+
+        Returns
+        -------
+        mat : ndarray
+            matrix of size 2 (m_max + 1) x 2 (nc + m_max) + 1
 
-        # List of ucm for all m, valid only for positive frequencies:
-        u = [self.bessel_decomp_pos(v_minus_list, jw, e_vect, n_vect, m)
-             for m in - self.m_vect]
-        u.extend([u[0]])  # Avoid computing m=0 twice+
-        u.extend([self.bessel_decomp_pos(v_minus_list, jw, e_vect, n_vect, m)
-                  for m in self.m_vect[1:]])
+        """
 
-        # jomega = (2*np.pi*1j*f)**derivative
-        # uc = np.array([jomega * z[0] for z in u]).T
-        # us = np.array([jomega * z[1] for z in u]).T
+        n_vect = np.arange(-self.nc, self.nc + 1)
+        m_list = np.concatenate((-self.m_vect, self.m_vect))
+        # Index of v(f + k f_t) multiplying the order n for harmonic m
+        k_ind = (- m_list[:, np.newaxis] - n_vect[np.newaxis, :] 
+                 + self.nc + self.m_max)
+        mat = np.zeros((m_list.shape[0], 2 * (self.nc + self.m_max) + 1), 
+                       dtype=np.complex128)
+        mat[np.arange(m_list.shape[0])[:, np.newaxis], k_ind] = \
+            0.5 * self.bessel_coeffs(x) * np.exp(1j*n_vect*varphi)
 
-        # uc = np.array([jomega * z for z in u]).T
-        #  us = - 1j * uc
-        # return uc  # , us
-        return np.transpose(u * np.array([(2*np.pi*1j*f)**derivative]))
+        return mat
 
     def single_design_matrix_freq(self, uc, k_p, k_c, full=True):
         """
@@ -459,11 +672,23 @@ class UCBWaveform(GWwaveform):
         # Compute model matrix in frequency domain (in fractional frequency)
         uc = self.u_matrices(f, param_intr, del_t, 0, tobs,
                              derivative=derivative)
-        # Compute the matrices corresponding to each channel h1, h2, h3
-        mat_list = [pre * self.single_design_matrix_freq(uc, k_p_list[i],
-                                                         k_c_list[i],
-                                                         full=full)
-                    for i in range(len(k_p_list))]
+        # Compute the matrices corresponding to each channel h1, h2, h3 in 
+        # a single product
+        k_p = np.array(k_p_list)
+        k_c = np.array(k_c_list)
+        k_tot = np.vstack((np.hstack((k_p, np.conj(k_p))),
+                           np.hstack((k_c, np.conj(k_c)))))
+        ac = pre * np.dot(uc, k_tot.T)
+        n_ch = k_p.shape[0]
+        if full:
+            mat_arr = np.empty((n_ch, uc.shape[0], 4), dtype=np.complex128)
+            mat_arr[:, :, 2] = - 1j * ac[:, 0:n_ch].T
+            mat_arr[:, :, 3] = - 1j * ac[:, n_ch:].T
+        else:
+            mat_arr = np.empty((n_ch, uc.shape[0], 2), dtype=np.complex128)
+        mat_arr[:, :, 0] = ac[:, 0:n_ch].T
+        mat_arr[:, :, 1] = ac[:, n_ch:].T
+        mat_list = list(mat_arr)
         # If phasemeter model is required, there should be 6 matrices
         # (one for each link)
         if channel == 'phasemeters':
@@ -472,6 +697,36 @@ class UCBWaveform(GWwaveform):
 
         return mat_list
 
+    def frequency_support(self, param_intr, tobs, n_bins=None, 
+                          leakage_tol=1e-4):
+        """
+        Frequency interval outside which the response carries less than a 
+        fraction leakage_tol of its energy.
+
+        Parameters
+        ----------
+        param_intr : array_like
+            vector of intrinsic parameters theta, phi, f_0, f_dot
+        tobs : float
+            observation time
+        n_bins : int or None
+            number of Fourier bins added on each side. If None, it is set by 
+            leakage_tol.
+        leakage_tol : float
+            maximum fraction of the energy lost outside the support
+
+        Returns
+        -------
+        f_min, f_max : float
+            bounds of the frequency support
+
+        """
+
+        return ucb_frequency_support(param_intr[2], param_intr[3], tobs, 
+                                     theta=param_intr[0], 
+                                     n_side=self.m_max + 1, n_bins=n_bins,
+                                     leakage_tol=leakage_tol)
+
     def compute_response_coeffs(self, param_intr, channel='TDIAET'):
         """Compute the coefficients needed for calculating the response
 
@@ -484,10 +739,10 @@ class UCBWaveform(GWwaveform):
 
         Returns
         -------
-        k_p_list : list
-            list of + coefficients
-        k_c_list : list
-            list of x coefficients
+        k_p_list : ndarray
+            + coefficients of each channel, size 3 x 5
+        k_c_list : ndarray
+            x coefficients of each channel, size 3 x 5
         pre : float
             prefactor to apply to the response
         derivative : integer
@@ -498,31 +753,22 @@ class UCBWaveform(GWwaveform):
         if channel == 'phasemeters':
             pre = (self.armlength / (4 * c))
             derivative = 1
-            # There is a mixing to convert it in the phasemeter measurements!
-            # i_mix = [2, 0, 1]
-            # 3 1 2
-            # theta,phi,f_0,f_dot
-            # Compute the required coefficients response depending on channel
-            kp3, kc3 = coeffs.k_coeffs_single(param_intr, self.phi_rot, 3)
-            kp1, kc1 = coeffs.k_coeffs_single(param_intr, self.phi_rot, 1)
-            kp2, kc2 = coeffs.k_coeffs_single(param_intr, self.phi_rot, 2)
-
-            k_p_list = [kp3, kp1, kp2]
-            k_c_list = [kc3, kc1, kc2]
-
         elif (channel == 'TDIAET') | (channel == 'TDIXYZ'):
             pre = (self.armlength / c) ** 2
             derivative = 2
-            # Compute the required coefficients response depending on channel
-            i, j = indices_low_freq('X1')  # 23
-            kp23, kc23 = coeffs.k_coeffs(param_intr, self.phi_rot, i, j)
-            i, j = indices_low_freq('Y1')  # 31
-            kp31, kc31 = coeffs.k_coeffs(param_intr, self.phi_rot, i, j)
-            i, j = indices_low_freq('Z1')  # 12
-            kp12, kc12 = coeffs.k_coeffs(param_intr, self.phi_rot, i, j)
-
-            k_p_list = [kp23, kp31, kp12]
-            k_c_list = [kc23, kc31, kc12]
+        # Coefficients of arms 3, 1, 2 for phasemeters, and of arm 
+        # differences 23, 31, 12 for TDI, all computed at once
+        if (self.coeff_table is not None) and (
+                self.coeff_table.phi_rot == self.phi_rot) and (
+                (self.coeff_table.channel == 'phasemeters') 
+                == (channel == 'phasemeters')):
+            k_p_list, k_c_list = self.coeff_table(param_intr[0], 
+                                                  param_intr[1])
+        else:
+            k_p_list, k_c_list = coeffs.response_coeffs(param_intr[0], 
+                                                        param_intr[1], 
+                                                        self.phi_rot, 
+                                                        channel=channel)
 
         return k_p_list, k_c_list, pre, derivative
 
@@ -587,16 +833,13 @@ class UCBWaveform(GWwaveform):
         uc = self.u_matrices(f, param_intr, del_t, 0, tobs,
                              derivative=derivative)
 
-        # mat_list = [self.design_matrix_freq(uc, us, k_p_list[i], k_c_list[i])
-        #             for i in range(len(k_p_list))]
-        mat_list = [self.single_design_matrix_freq(uc,
-                                                   k_p_list[i],
-                                                   k_c_list[i],
-                                                   full=True)
-                    for i in range(len(k_p_list))]
-
-        # Transform to complex number
-        ch_list = [pre * mat.dot(beta) for mat in mat_list]
+        # Contract the response coefficients with the amplitudes first, so 
+        # that all channels are obtained from a single product with uc
+        k_p = np.array(k_p_list)
+        k_c = np.array(k_c_list)
+        k_beta = (np.hstack((k_p, np.conj(k_p))) * (beta[0] - 1j * beta[2])
+                  + np.hstack((k_c, np.conj(k_c))) * (beta[1] - 1j * beta[3]))
+        ch_list = list(pre * np.dot(k_beta, uc.T))
 
         if channel == 'TDIAET':
             a, e, t = convert_xyz_to_aet(ch_list[0], ch_list[1], ch_list[2])
@@ -604,6 +847,99 @@ class UCBWaveform(GWwaveform):
         else:
             return ch_list[0], ch_list[1], ch_list[2]
 
+    def narrowband_signal(self, params, del_t, tobs, channel='TDIAET', 
+                          df=None, n_bins=None, leakage_tol=1e-4):
+        """
+        LISA response restricted to the frequency support of the source, in 
+        compact form. Only the Fourier bins holding all but a fraction 
+        leakage_tol of the response energy are computed, so that the cost 
+        does not depend on the total bandwidth.
+
+        Parameters
+        ----------
+        params : array_like
+            vector of parameters a0, incl, phi_0, psi, theta, phi, f_0, f_dot
+            (see compute_signal_freq)
+        del_t : float
+            sampling cadence
+        tobs : float
+            observation duration
+        channel : string
+            type of channel: {'TDIAET', 'TDIXYZ', 'phasemeters'}
+        df : float or None
+            frequency resolution of the Fourier grid. Default is 1 / tobs.
+        n_bins : int or None
+            number of Fourier bins added on each side of the support. If 
+            None, it is set by leakage_tol.
+        leakage_tol : float
+            maximum fraction of the energy lost outside the support
+
+        Returns
+        -------
+        i_start : int
+            index of the first Fourier bin of the template
+        values : ndarray
+            template values in each channel at bins i_start, i_start + 1, ..
+            size 3 x n_bins_support
+
+        """
+
+        if df is None:
+            df = 1 / tobs
+        f_min, f_max = self.frequency_support(params[4:], tobs, n_bins=n_bins,
+                                              leakage_tol=leakage_tol)
+        i_start, f = narrowband_grid(f_min, f_max, df)
+
+        return i_start, np.array(self.compute_signal_freq(f, params, del_t, 
+                                                          tobs, 
+                                                          channel=channel))
+
+    def narrowband_design_matrix(self, param_intr, del_t, tobs, 
+                                 channel='TDIAET', df=None, n_bins=None, 
+                                 leakage_tol=1e-4, full=True):
+        """
+        Design matrices restricted to the frequency support of the source, 
+        in compact form.
+
+        Parameters
+        ----------
+        param_intr : array_like
+            vector of intrinsic parameters theta, phi, f_0, f_dot
+        del_t : float
+            sampling cadence
+        tobs : float
+            observation duration
+        channel : string
+            type of channel: {'TDIAET', 'TDIXYZ', 'phasemeters'}
+        df : float or None
+            frequency resolution of the Fourier grid. Default is 1 / tobs.
+        n_bins : int or None
+            number of Fourier bins added on each side of the support. If 
+            None, it is set by leakage_tol.
+        leakage_tol : float
+            maximum fraction of the energy lost outside the support
+        full : bool
+            whether to output the full design matrices (see 
+            design_matrix_freq)
+
+        Returns
+        -------
+        i_start : int
+            index of the first Fourier bin of the design matrices
+        mat_list : list of ndarrays
+            design matrices at bins i_start, i_start + 1, ..
+
+        """
+
+        if df is None:
+            df = 1 / tobs
+        f_min, f_max = self.frequency_support(param_intr, tobs, n_bins=n_bins,
+                                              leakage_tol=leakage_tol)
+        i_start, f = narrowband_grid(f_min, f_max, df)
+
+        return i_start, self.design_matrix_freq(f, param_intr, del_t, tobs, 
+                                                channel=channel, full=full)
+
     def transfer_function(self, f, params, del_t, tobs, channel='phasemeters'):
         """Compute an approximation of LISA's transfer function G(F) for a
         monochromatic wave, for phasemeter or TDI measurements.
@@ -681,7 +1017,8 @@ class UCBWaveform(GWwaveform):
         # Include derivative
         jomega = (2*np.pi*1j*f)**derivative
         # Bessel coefficients stored in a nf x 5 matrix, with derivative coeff
-        jw = np.array([special.jv(m, 2*np.pi*f*d0) * jomega for m in m_vect]).T
+        jw = special.jv(m_vect[np.newaxis, :], 
+                        2*np.pi*f[:, np.newaxis]*d0) * jomega[:, np.newaxis]
         # Multiply exp(jm * varphi) by k_p[m]
         ek_p = [e_vect * k_p for k_p in k_p_list]
         ek_c = [e_vect * k_c for k_c in k_c_list]
@@ -737,6 +1074,9 @@ class UCBWaveformFull(GWwaveform):
         self.v_func = v_func
         # For the number of time samples in the Fourier series
         self.nc = nc
+        # Highest harmonic of the orbital frequency in the response 
+        # coefficients (see coeffs.xi_coeffs)
+        self.m_max = 4
         # Sampling time
         self.del_t = del_t
         # Observation duration
@@ -781,17 +1121,27 @@ class UCBWaveformFull(GWwaveform):
 
     def precompute_lisa_phase(self):
         """
-        Compute terms in Phi_T(t) on a minimal grid in the time domain.
+        Compute terms in Phi_T(t) on a minimal grid in the time domain. The 
+        tables are computed once for each time grid and shared between 
+        instances, so they must not be modified.
         """
-        f_sample = 2 * self.nc
-        self.t_samples, self.dt = np.linspace(0, self.tobs, f_sample + 2,
-                                              endpoint=False, retstep=True)
-
-        self.cosphit_mat = np.array([np.cos(2*np.pi*m*self.f_t*self.t_samples)
-                                     for m in range(5)]).T
-        self.sinphit_mat = np.array([np.sin(2*np.pi*m*self.f_t*self.t_samples)
-                                     for m in range(5)]).T
-        self.cs_mat = np.hstack((self.cosphit_mat, self.sinphit_mat))
+        key = (self.tobs, self.nc, self.f_t)
+        if key not in lisa_phase_tables:
+            f_sample = 2 * self.nc
+            t_samples, dt = np.linspace(0, self.tobs, f_sample + 2,
+                                        endpoint=False, retstep=True)
+            cosphit_mat = np.array([np.cos(2*np.pi*m*self.f_t*t_samples)
+                                    for m in range(self.m_max + 1)]).T
+            sinphit_mat = np.array([np.sin(2*np.pi*m*self.f_t*t_samples)
+                                    for m in range(self.m_max + 1)]).T
+            cs_mat = np.hstack((cosphit_mat, sinphit_mat))
+            for arr in [t_samples, cosphit_mat, sinphit_mat, cs_mat]:
+                arr.flags.writeable = False
+            lisa_phase_tables[key] = (t_samples, dt, cosphit_mat, 
+                                      sinphit_mat, cs_mat)
+
+        (self.t_samples, self.dt, self.cosphit_mat, self.sinphit_mat, 
+         self.cs_mat) = lisa_phase_tables[key]
 
     def compute_modulation(self, theta, phi, i, channel='phasemeters'):
 
@@ -940,6 +1290,33 @@ class UCBWaveformFull(GWwaveform):
         # return np.array([prefact * phasing]).T * np.array([xpi, xci]).T
         # return np.array([prefact * phasing * xpi, prefact * phasing * xci]).T
 
+    def frequency_support(self, param_intr, n_bins=None, leakage_tol=1e-4):
+        """
+        Frequency interval outside which the response carries less than a 
+        fraction leakage_tol of its energy.
+
+        Parameters
+        ----------
+        param_intr : array_like
+            vector of intrinsic parameters theta, phi, f_0, f_dot
+        n_bins : int or None
+            number of Fourier bins added on each side. If None, it is set by 
+            leakage_tol.
+        leakage_tol : float
+            maximum fraction of the energy lost outside the support
+
+        Returns
+        -------
+        f_min, f_max : float
+            bounds of the frequency support
+
+        """
+
+        return ucb_frequency_support(param_intr[2], param_intr[3], self.tobs, 
+                                     theta=param_intr[0], 
+                                     n_side=self.m_max + 1, n_bins=n_bins,
+                                     leakage_tol=leakage_tol)
+
     def design_matrix_freq(self, f, param_intr, channel='phasemeters'):
         """
         Compute the list of frequency-domain design matrix mat[i] such that
@@ -988,6 +1365,16 @@ class UCBWaveformFull(GWwaveform):
         # print("Slow part computation: " + str(t2 - t1))
         # t1 = time.time()
         c_list = fft(np.array(a_slow_list), axis=1) / self.t_samples.size
+        if self.v_func in [wavefuncs.v_func_gb_mono, 
+                           wavefuncs.v_func_gb_mono_fast]:
+            # Accumulate the series directly, as the frequency shifts are 
+            # multiples of 1 / tobs
+            k_vect = np.fft.fftfreq(c_list.shape[1], 
+                                    d=1 / c_list.shape[1]).astype(np.int64)
+            a_mat = wavefuncs.series_gb_mono(np.asarray(f, dtype=np.float64),
+                                             k_vect, c_list, f_0, self.tobs,
+                                             self.del_t)
+            return list(a_mat / 2)
         # Compute corresponding frequency vector
         f_vect = np.fft.fftfreq(c_list[0].shape[0],
                                 d=self.tobs / c_list[0].shape[0])
@@ -1103,6 +1490,83 @@ class UCBWaveformFull(GWwaveform):
 
         return mat_list.dot(beta)
 
+    def narrowband_signal(self, params, channel='phasemeters', df=None, 
+                          n_bins=None, leakage_tol=1e-4):
+        """
+        LISA response restricted to the frequency support of the source, in 
+        compact form. Only the Fourier bins holding all but a fraction 
+        leakage_tol of the response energy are computed, so that the cost 
+        does not depend on the total bandwidth.
+
+        Parameters
+        ----------
+        params : array_like
+            vector of parameters a0, incl, phi_0, psi, theta, phi, f_0, f_dot
+            (see compute_signal_freq)
+        channel : string
+            type of channel: {'TDIAET', 'phasemeters'}
+        df : float or None
+            frequency resolution of the Fourier grid. Default is 1 / tobs.
+        n_bins : int or None
+            number of Fourier bins added on each side of the support. If 
+            None, it is set by leakage_tol.
+        leakage_tol : float
+            maximum fraction of the energy lost outside the support
+
+        Returns
+        -------
+        i_start : int
+            index of the first Fourier bin of the template
+        values : ndarray
+            template values in each channel at bins i_start, i_start + 1, ..
+
+        """
+
+        if df is None:
+            df = 1 / self.tobs
+        f_min, f_max = self.frequency_support(params[4:], n_bins=n_bins,
+                                              leakage_tol=leakage_tol)
+        i_start, f = narrowband_grid(f_min, f_max, df)
+
+        return i_start, self.compute_signal_freq(f, params, channel=channel)
+
+    def narrowband_design_matrix(self, param_intr, channel='phasemeters', 
+                                 df=None, n_bins=None, leakage_tol=1e-4):
+        """
+        Design matrices restricted to the frequency support of the source, 
+        in compact form.
+
+        Parameters
+        ----------
+        param_intr : array_like
+            vector of intrinsic parameters theta, phi, f_0, f_dot
+        channel : string
+            type of channel: {'TDIAET', 'phasemeters'}
+        df : float or None
+            frequency resolution of the Fourier grid. Default is 1 / tobs.
+        n_bins : int or None
+            number of Fourier bins added on each side of the support. If 
+            None, it is set by leakage_tol.
+        leakage_tol : float
+            maximum fraction of the energy lost outside the support
+
+        Returns
+        -------
+        i_start : int
+            index of the first Fourier bin of the design matrices
+        mat_list : list of ndarrays
+            design matrices at bins i_start, i_start + 1, ..
+
+        """
+
+        if df is None:
+            df = 1 / self.tobs
+        f_min, f_max = self.frequency_support(param_intr, n_bins=n_bins,
+                                              leakage_tol=leakage_tol)
+        i_start, f = narrowband_grid(f_min, f_max, df)
+
+        return i_start, self.design_matrix_freq(f, param_intr, channel=channel)
+
 
 # ------------------------------------------------------------------------------
 class MBHBWaveform(GWwaveform):
@@ -1235,24 +1699,46 @@ class MBHBWaveform(GWwaveform):
         #         ch_interp = t / del_t
         #
         # else:
-        # TDI response
-        wftdi = lisa.GenerateLISATDI(params, tobs=tobs, minf=1e-5, maxf=1.,
+        # TDI response, restricted to the analysis band
+        grid = resampling_grid(f)
+        minf, maxf = grid.band()
+        wftdi = lisa.GenerateLISATDI(params, tobs=tobs, minf=minf, maxf=maxf,
                                      tref=tref, torb=0., TDItag='TDIAET',
                                      acc=1e-4, order_fresnel_stencil=0,
                                      approximant='IMRPhenomD',
                                      responseapprox='full', frozenLISA=False,
                                      TDIrescaled=False)
-        signal_freq = lisa.GenerateLISASignal(wftdi, f)
+        signal_freq = grid.resample([wftdi], [1, 2, 3])[0]
         # Divide by del_t to be consistent with the unnormalized DFT
-        ch_interp = [self.shift_time(f, signal_freq['ch1'], tobs).conj()/del_t,
-                     self.shift_time(f, signal_freq['ch2'], tobs).conj()/del_t,
-                     self.shift_time(f, signal_freq['ch3'], tobs).conj()/del_t]
+        z = grid.phasor(tobs)
+        ch_interp = [(signal_freq['ch' + str(i)] * z).conj() / del_t
+                     for i in [1, 2, 3]]
 
         # Interpolate the response on required grid
         # return signal_freq['ch1'], signal_freq['ch2'], signal_freq['ch3']
         # return ch_interp[0] #, ch_interp[1], ch_interp[2]
         return ch_interp
 
+    def frequency_support(self, params, t_start=0):
+        """
+        Frequency interval covered by the waveform during the observation.
+
+        Parameters
+        ----------
+        params : array_like
+            vector of waveform parameters m1, m2, chi1, chi2, Deltat, ...
+        t_start : float
+            starting time of the observation
+
+        Returns
+        -------
+        f_min, f_max : float
+            bounds of the frequency support
+
+        """
+
+        return mbhb_frequency_support(params, t_start=t_start)
+
     def single_design_matrix(self, tdi_resp_plus, tdi_resp_cros):
 
         a_mat = np.empty((2 * tdi_resp_plus.shape[0], 2), dtype=np.float64)
@@ -1334,13 +1820,25 @@ class MBHBWaveform(GWwaveform):
         # 1. 1.e-21, 0.5*np.pi, 0.0, 0.0
         # 2. 1.e-21, 0.5*np.pi, 0.25*np.pi, 0.0
 
-        # Calculate the response on required grid
-        tdi_response_plus = self.compute_signal_freq(f, params_1, del_t, tobs,
-                                                     channel=channel,
-                                                     tref=tref)
-        tdi_response_cros = self.compute_signal_freq(f, params_2, del_t, tobs,
-                                                     channel=channel,
-                                                     tref=tref)
+        # Calculate the response on required grid, resampling the intrinsic 
+        # amplitude and phase only once
+        grid = resampling_grid(f)
+        minf, maxf = grid.band()
+        wftdi_list = [lisa.GenerateLISATDI(params, tobs=tobs, minf=minf, 
+                                           maxf=maxf, tref=tref, torb=0., 
+                                           TDItag='TDIAET', acc=1e-4, 
+                                           order_fresnel_stencil=0,
+                                           approximant='IMRPhenomD',
+                                           responseapprox='full', 
+                                           frozenLISA=False,
+                                           TDIrescaled=False)
+                      for params in [params_1, params_2]]
+        signal_list = grid.resample(wftdi_list, [1, 2, 3])
+        # Divide by del_t to be consistent with the unnormalized DFT
+        z = grid.phasor(tobs)
+        tdi_response_plus, tdi_response_cros = [
+            [(signal['ch' + str(i)] * z).conj() / del_t
+             for i in [1, 2, 3]] for signal in signal_list]
 
         if not complex:
             mat_list = [self.single_design_matrix(tdi_response_plus[i],
@@ -1373,32 +1871,240 @@ def generate_lisa_signal(wftdi, freq=None, channels=None):
     if channels is None:
         channels = [1, 2]
 
-    fs = wftdi['freq']
+    if freq is not None:
+        # Resample all arrays at once on the analysis grid
+        return resampling_grid(freq).resample([wftdi], channels)[0]
+
+    freq = wftdi['freq']
     amp = wftdi['amp']
     phase = wftdi['phase']
-    # print("Length of initial frequency grid " + str(len(fs)))
-
-    tr = [wftdi['transferL' + str(np.int(i))] for i in channels]
-
-    if freq is not None:
-        amp = pyspline.resample(freq, fs, amp)
-        phase = pyspline.resample(freq, fs, phase)
-        tr_int = [pyspline.resample(freq, fs, tri) for tri in tr]
-        # amp = np.interp(freq, fs, amp)
-        # phase = np.interp(freq, fs, phase)
-        # tr_int = [np.interp(freq, fs, tri) for tri in tr]
-    else:
-        freq = fs
-        tr_int = tr
+    tr_int = [wftdi['transferL' + str(int(i))] for i in channels]
 
     h = amp * np.exp(1j * phase)
 
-    signal = {'ch' + str(np.int(i)): h * tr_int[i - 1] for i in channels}
+    signal = {'ch' + str(int(i)): h * tr_int[k] 
+              for k, i in enumerate(channels)}
     signal['freq'] = freq
 
     return signal
 
 
+def generate_lisa_responses(wftdi_list, freq=None, channels=None):
+    """
+    Same as generate_lisa_signal for several TDI responses of a source with
+    the same intrinsic parameters, i.e. sharing the same amplitude and phase.
+    The amplitude and phase are resampled only once.
+
+    Parameters
+    ----------
+    wftdi_list : list of dict
+        list of dictionary outputs from GenerateLISATDI, computed for the 
+        same intrinsic parameters
+    freq : ndarray
+        numpy array of freqs on which to sample waveform (or None)
+    channels : list of ints
+        TDI channels to consider
+
+    Returns
+    -------
+    signal_list : list of dict
+        list of dictionaries with output TDI channel data yielding numpy 
+        complex data arrays
+
+    """
+
+    if channels is None:
+        channels = [1, 2]
+
+    if freq is not None:
+        return resampling_grid(freq).resample(wftdi_list, channels)
+
+    return [generate_lisa_signal(wftdi, None, channels) 
+            for wftdi in wftdi_list]
+
+
+def resampling_grid(freq):
+    """
+    Get the resampling grid of an analysis frequency vector, which is built 
+    once and cached.
+
+    Parameters
+    ----------
+    freq : ndarray
+        analysis frequencies
+
+    Returns
+    -------
+    grid : ResamplingGrid
+        resampling grid instance
+
+    """
+
+    freq = np.ascontiguousarray(freq, dtype=np.float64)
+    key = freq.tobytes()
+    if key not in resampling_grids:
+        if len(resampling_grids) >= 16:
+            resampling_grids.clear()
+        resampling_grids[key] = ResamplingGrid(freq)
+
+    return resampling_grids[key]
+
+
+class ResamplingGrid(object):
+    """
+    Analysis frequency grid on which the outputs of lisabeta are resampled,
+    with the quantities that do not depend on the waveform.
+
+    """
+
+    def __init__(self, freq, margin=1e-3):
+        """
+
+        Parameters
+        ----------
+        freq : ndarray
+            sorted analysis frequencies
+        margin : float
+            relative margin added to the frequency band requested from 
+            lisabeta
+
+        """
+
+        self.freq = np.array(freq, dtype=np.float64)
+        self.margin = margin
+        # Uniform grids allow phasors to be computed by recurrence
+        diff = np.diff(self.freq)
+        self.uniform = (diff.shape[0] > 0) and np.allclose(
+            diff, diff[0], rtol=1e-9, atol=0)
+        self.df = None
+        if self.uniform:
+            self.df = (self.freq[-1] - self.freq[0]) / (self.freq.shape[0] - 1)
+        # Time-shift phasors, for each delay
+        self.phasors = {}
+
+    def band(self, f_floor=1e-5):
+        """
+        Frequency band where lisabeta should compute the waveform.
+
+        Parameters
+        ----------
+        f_floor : float
+            lowest frequency requested from lisabeta, used for grids 
+            starting at zero frequency
+
+        Returns
+        -------
+        minf, maxf : float
+            frequency bounds
+
+        """
+
+        f_pos = self.freq[self.freq > 0]
+
+        return (max(f_pos[0] * (1 - self.margin), f_floor), 
+                self.freq[-1] * (1 + self.margin))
+
+    def phasor(self, delay):
+        """
+        Time-shift phasor exp(-2 j pi f delay) on the grid. On a uniform grid, 
+        it is computed as the outer product of two short tables of 
+        exponentials, which is equivalent to a blocked recurrence.
+
+        Parameters
+        ----------
+        delay : float
+            time shift [s]
+
+        Returns
+        -------
+        z : ndarray
+            phasor values at the grid frequencies
+
+        """
+
+        if delay not in self.phasors:
+            if len(self.phasors) >= 4:
+                self.phasors.clear()
+            n = self.freq.shape[0]
+            if self.uniform:
+                n_block = int(np.ceil(np.sqrt(n)))
+                k = np.arange(n_block)
+                fine = np.exp(-2j * np.pi * self.df * delay * k)
+                coarse = np.exp(-2j * np.pi * delay 
+                                * (self.freq[0] + self.df * n_block * k))
+                z = np.outer(coarse, fine).ravel()[0:n]
+            else:
+                z = np.exp(-2j * np.pi * self.freq * delay)
+            self.phasors[delay] = z
+
+        return self.phasors[delay]
+
+    def resample(self, wftdi_list, channels):
+        """
+        Resample the amplitude, the phase and all transfer functions of 
+        lisabeta TDI outputs on the grid, with a single cubic spline 
+        interpolation of all arrays sharing the same native grid. The 
+        waveform is zero outside the native frequency range.
+
+        Parameters
+        ----------
+        wftdi_list : list of dict
+            list of dictionary outputs from GenerateLISATDI, computed for 
+            the same intrinsic parameters
+        channels : list of ints
+            TDI channels to consider
+
+        Returns
+        -------
+        signal_list : list of dict
+            list of dictionaries with output TDI channel data yielding numpy 
+            complex data arrays
+
+        """
+
+        fs = wftdi_list[0]['freq']
+        # Group the responses computed on the same native grid
+        groups = [[0]]
+        for k in range(1, len(wftdi_list)):
+            if np.array_equal(wftdi_list[k]['freq'], fs):
+                groups[0].append(k)
+            else:
+                groups.append([k])
+
+        n_ch = len(channels)
+        tr_int = [None] * len(wftdi_list)
+        for group in groups:
+            fs_g = wftdi_list[group[0]]['freq']
+            rows = [wftdi_list[group[0]]['amp'], 
+                    wftdi_list[group[0]]['phase']]
+            for k in group:
+                for i in channels:
+                    tr = wftdi_list[k]['transferL' + str(int(i))]
+                    rows.extend([tr.real, tr.imag])
+            # Evaluate within the native range only
+            i0, i1 = np.searchsorted(self.freq, [fs_g[0], fs_g[-1]])
+            i1 = i1 + (i1 < self.freq.shape[0] and 
+                       self.freq[i1] == fs_g[-1])
+            values = np.zeros((len(rows), self.freq.shape[0]))
+            values[:, i0:i1] = interpolate.CubicSpline(
+                fs_g, np.array(rows), axis=1)(self.freq[i0:i1])
+            if group[0] == 0:
+                amp, phase = values[0], values[1]
+            for j, k in enumerate(group):
+                tr_vals = values[2 + 2 * n_ch * j: 2 + 2 * n_ch * (j + 1)]
+                tr_int[k] = tr_vals[0::2] + 1j * tr_vals[1::2]
+
+        h = amp * np.exp(1j * phase)
+        signal_list = []
+        for k in range(len(wftdi_list)):
+            signal = {'ch' + str(int(i)): h * tr_int[k][j] 
+                      for j, i in enumerate(channels)}
+            signal['freq'] = self.freq
+            signal_list.append(signal)
+
+        return signal_list
+
+
 def lisabeta_template(params, freq, tobs, tref=0, t_offset=52.657,
                       channels=None):
     """
@@ -1438,20 +2144,22 @@ def lisabeta_template(params, freq, tobs, tref=0, t_offset=52.657,
     if channels is None:
         channels = [1, 2, 3]
 
-    # TDI response
-    wftdi = lisa.GenerateLISATDI(params, tobs=tobs, minf=1e-5, maxf=1.,
+    grid = resampling_grid(freq)
+    minf, maxf = grid.band()
+    # TDI response, restricted to the analysis band
+    wftdi = lisa.GenerateLISATDI(params, tobs=tobs, minf=minf, maxf=maxf,
                                  tref=tref, torb=0., TDItag='TDIAET',
                                  acc=1e-4, order_fresnel_stencil=0,
                                  approximant='IMRPhenomD',
                                  responseapprox='full', frozenLISA=False,
                                  TDIrescaled=False)
 
-    signal_freq = generate_lisa_signal(wftdi, freq, channels)
+    signal_freq = grid.resample([wftdi], channels)[0]
 
     # Phasor for the time shift
-    z = np.exp(-2j * np.pi * freq * t_offset)
+    z = grid.phasor(t_offset)
     # Get coalescence time
-    ch_interp = [(signal_freq['ch' + str(np.int(i))] * z).conj()
+    ch_interp = [(signal_freq['ch' + str(int(i))] * z).conj()
                  for i in channels]
 
     return ch_interp
@@ -1506,11 +2214,11 @@ def lisabeta_template(params, freq, tobs, tref=0, t_offset=52.657,
 #         amp = pyspline.resample(freq, fs1, wftdi_1['amp'])
 #         phase = pyspline.resample(freq, fs1, wftdi_1['phase'])
 #         tr_int1 = [pyspline.resample(freq, fs1, 
-#                                      wftdi_1['transferL' + str(np.int(i))])
+#                                      wftdi_1['transferL' + str(int(i))])
 #                    for i in channels]
 #     else:
 #         freq = wftdi_1['freq']
-#         tr_int1 = [wftdi_1['transferL' + str(np.int(i))] for i in channels]
+#         tr_int1 = [wftdi_1['transferL' + str(int(i))] for i in channels]
     
 #     # Complex strain
 #     h = amp * np.exp(1j * phase)
@@ -1544,11 +2252,11 @@ def lisabeta_template(params, freq, tobs, tref=0, t_offset=52.657,
 #             amp2 = pyspline.resample(freq, fs2, wftdi_1['amp'])
 #             phase2 = pyspline.resample(freq, fs2, wftdi_1['phase'])
 #             tr_int2 = [pyspline.resample(freq, fs2,
-#                                          wftdi_2['transferL' + str(np.int(i))])
+#                                          wftdi_2['transferL' + str(int(i))])
 #                        for i in channels]
 #         else:
 #             freq = wftdi_2['freq']
-#             tr_int2 = [wftdi_2['transferL' + str(np.int(i))] for i in channels]
+#             tr_int2 = [wftdi_2['transferL' + str(int(i))] for i in channels]
 
 #         h2 = amp2 * np.exp(1j * phase2)
 #         mat_list = [np.vstack((h * tr_int1[i - 1] * z,
@@ -1585,36 +2293,51 @@ def design_matrix(params_intr, freq, tobs, tref=0, t_offset=52.657,
 
     """
 
-    # First column
     # m1, m2, chi1, chi2, tc, dist, inc, phi, lambd, beta, psi = params
-    # Building the F-statistics basis
-    
-    params_0 = np.zeros(11)
-    # Save intrinsic parameters
-    params_0[i_intr] = params_intr
-    # Luminosity distance (Mpc)
-    params_0[i_dist] = 1e3
-    # Inclination
-    params_0[i_inc] = 0.5 * np.pi
-    # 4 elements
-    params_list = [params_0 for j in range(4)]
+    # Building the F-statistics basis. At inclination pi/2, the (2, 2)-mode 
+    # response is exp(2j phi) (exp(2j psi) G1 + exp(-2j psi) G2) where G1 and 
+    # G2 do not depend on extrinsic parameters. Therefore, only two responses
+    # need to be generated, e.g. (phi, psi) = (0, 0) and (pi/2, pi/4), and 
+    # the elements (3pi/4, 0) and (pi/4, pi/4) are obtained by applying a 
+    # phase shift of -3 pi / 2 (equivalent to pi / 2), up to the sign 
+    # convention for phi, which does not change the span of the basis.
+    params_list = [np.zeros(11), np.zeros(11)]
+    for params in params_list:
+        # Save intrinsic parameters
+        params[i_intr] = params_intr
+        # Luminosity distance (Mpc)
+        params[i_dist] = 1e3
+        # Inclination
+        params[i_inc] = 0.5 * np.pi
     # First element (phi_c, phi) = (0, 0)
     params_list[0][i_phi0] = 0
     params_list[0][i_psi] = 0
     # Second element (phi_c, phi) = (pi/2, pi/4)
     params_list[1][i_phi0] = np.pi / 2
     params_list[1][i_psi] = np.pi / 4
-    # Third element (phi_c, phi) = (3pi/4, 0)
-    params_list[2][i_phi0] = 3 * np.pi / 4
-    params_list[2][i_psi] = 0
-    # Fourth element (phi_c, phi) = (pi/4, pi/4)
-    params_list[3][i_phi0] = np.pi / 4
-    params_list[3][i_psi] = np.pi / 4
-    # Compute all 4 elements for all channels
-    elements = [lisabeta_template(params, freq, tobs, 
-                                  tref=tref, 
-                                  t_offset=t_offset, 
-                                  channels=channels) for params in params_list]
+
+    if channels is None:
+        channels = [1, 2, 3]
+
+    grid = resampling_grid(freq)
+    minf, maxf = grid.band()
+    # TDI responses, sharing the same intrinsic amplitude and phase
+    wftdi_list = [lisa.GenerateLISATDI(params, tobs=tobs, minf=minf, 
+                                       maxf=maxf,
+                                       tref=tref, torb=0., TDItag='TDIAET',
+                                       acc=1e-4, order_fresnel_stencil=0,
+                                       approximant='IMRPhenomD',
+                                       responseapprox='full', 
+                                       frozenLISA=False,
+                                       TDIrescaled=False)
+                  for params in params_list]
+    signal_list = grid.resample(wftdi_list, channels)
+    # Phasor for the time shift
+    z = grid.phasor(t_offset)
+    elements = [[(signal['ch' + str(int(i))] * z).conj() for i in channels]
+                for signal in signal_list]
+    # Third and fourth elements (phi_c, phi) = (3pi/4, 0) and (pi/4, pi/4)
+    elements.extend([[1j * el for el in element] for element in elements])
     # Compute the design matrices for each channel
     mat_list = [np.vstack([el[i] for el in elements]).T 
                 for i in range(len(elements[0]))]
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Local waveform service: a pool of persistent worker processes computing
+batches of frequency-domain templates in shared memory.
+
+"""
+
+import queue
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+
+def service_worker(signal_func, freq, signal_args, signal_kwargs,
+                   par_name, par_shape, out_name, out_shape, tasks, results):
+    """
+    Loop of a waveform service worker. The worker reads parameter vectors
+    from the shared input buffer, writes the templates in the shared output
+    buffer, and only exchanges row ranges with the main process.
+
+    Parameters
+    ----------
+    signal_func : callable
+        waveform generator taking a parameter vector and a frequency vector
+        and returning the list of channel waveforms
+    freq : ndarray
+        frequencies where the templates are computed, size nf
+    signal_args : tuple
+        secondary arguments of signal_func
+    signal_kwargs : dict
+        keyword arguments of signal_func
+    par_name, out_name : str
+        names of the shared memory blocks holding the parameters and the
+        templates
+    par_shape, out_shape : tuple
+        shapes of the parameter (max_batch x ndim) and template
+        (max_batch x n_ch x nf) buffers
+    tasks : multiprocessing.Queue
+        queue of row ranges (i0, i1) to compute, None to stop
+    results : multiprocessing.Queue
+        queue where the completed ranges are reported, with an error message
+        if the computation failed
+
+    """
+
+    shm_par = shared_memory.SharedMemory(name=par_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    pars = np.ndarray(par_shape, dtype=np.float64, buffer=shm_par.buf)
+    out = np.ndarray(out_shape, dtype=np.complex128, buffer=shm_out.buf)
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            i0, i1 = task
+            error = None
+            try:
+                for k in range(i0, i1):
+                    out[k] = signal_func(pars[k], freq, *signal_args,
+                                         **signal_kwargs)
+            except Exception:
+                error = traceback.format_exc()
+            results.put((i0, i1, error))
+    finally:
+        del pars, out
+        shm_par.close()
+        shm_out.close()
+
+
+class WaveformService(object):
+
+    def __init__(self, signal_func, freq, n_ch, ndim, signal_args=(),
+                 signal_kwargs={}, n_workers=None, max_batch=64,
+                 chunk_size=None, cost_func=None, context=None):
+        """
+        Pool of persistent processes computing batches of templates.
+
+        Parameter vectors are written in a shared input buffer and the
+        templates are written by the workers in a shared output buffer, so
+        that only row ranges go through the task queues and the result
+        arrays are never pickled. Each batch is split into small chunks
+        dispatched on demand, so that all workers stay busy until the end of
+        an ensemble step even when the template costs differ.
+
+        Parameters
+        ----------
+        signal_func : callable
+            GW waveform generator function, taking the full sampling
+            parameter vector and a frequency vector as input, and outputing
+            a list of waveforms in the frequency domain (one for each
+            channel). It must be picklable (e.g. a module-level function) if
+            the processes are not forked.
+        freq : ndarray
+            frequencies where the templates are computed, size nf
+        n_ch : int
+            number of channels returned by signal_func
+        ndim : int
+            size of the parameter vectors
+        signal_args : tuple
+            secondary arguments to pass to signal_func
+        signal_kwargs : dict
+            keyword arguments to pass to signal_func
+        n_workers : int or None
+            number of worker processes. Default is the number of CPUs.
+        max_batch : int
+            number of templates held by the shared buffers. Larger batches
+            are processed in several passes.
+        chunk_size : int or None
+            number of templates per task. Default gives about four tasks per
+            worker and per batch.
+        cost_func : callable or None
+            function of a parameter vector returning an estimate of the
+            template computation cost (e.g. the number of waveform samples).
+            If provided, the most expensive templates are dispatched first.
+        context : str or None
+            multiprocessing start method. Default is the platform default.
+
+        """
+
+        self.freq = np.asarray(freq, dtype=np.float64)
+        self.nf = self.freq.size
+        self.n_ch = n_ch
+        self.ndim = ndim
+        self.max_batch = max_batch
+        self.chunk_size = chunk_size
+        self.cost_func = cost_func
+        if n_workers is None:
+            n_workers = mp.cpu_count()
+        self.n_workers = n_workers
+
+        # Shared input and output buffers
+        self.par_shape = (max_batch, ndim)
+        self.out_shape = (max_batch, n_ch, self.nf)
+        self.shm_par = shared_memory.SharedMemory(
+            create=True, size=8 * max_batch * ndim)
+        self.shm_out = shared_memory.SharedMemory(
+            create=True, size=16 * max_batch * n_ch * self.nf)
+        self.pars = np.ndarray(self.par_shape, dtype=np.float64,
+                               buffer=self.shm_par.buf)
+        self.out = np.ndarray(self.out_shape, dtype=np.complex128,
+                              buffer=self.shm_out.buf)
+
+        ctx = mp.get_context(context)
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.workers = [ctx.Process(target=service_worker,
+                                    args=(signal_func, self.freq,
+                                          tuple(signal_args), signal_kwargs,
+                                          self.shm_par.name, self.par_shape,
+                                          self.shm_out.name, self.out_shape,
+                                          self.tasks, self.results),
+                                    daemon=True)
+                        for i in range(n_workers)]
+        for worker in self.workers:
+            worker.start()
+        self.closed = False
+
+    def schedule(self, pars):
+        """
+        Order in which the parameter vectors are dispatched.
+
+        Parameters
+        ----------
+        pars : ndarray
+            parameter vectors, size n x ndim
+
+        Returns
+        -------
+        order : ndarray
+            positions of the parameter vectors, most expensive first if a
+            cost function is available.
+
+        """
+
+        if self.cost_func is None:
+            return np.arange(pars.shape[0])
+        costs = np.array([self.cost_func(par) for par in pars])
+
+        return np.argsort(-costs, kind='stable')
+
+    def chunks(self, n):
+        """
+        Row ranges of the tasks for a batch of n templates.
+        """
+
+        if self.chunk_size is None:
+            size = max(1, n // (4 * self.n_workers))
+        else:
+            size = self.chunk_size
+
+        return [(i0, min(i0 + size, n)) for i0 in range(0, n, size)]
+
+    def collect(self):
+        """
+        Wait for the next completed task, checking that the workers are
+        still running.
+        """
+
+        while True:
+            try:
+                return self.results.get(timeout=1.0)
+            except queue.Empty:
+                if not all([worker.is_alive() for worker in self.workers]):
+                    raise RuntimeError("A waveform service worker stopped.")
+
+    def compute_batch(self, pars):
+        """
+        Compute the templates of a batch of parameter vectors.
+
+        Parameters
+        ----------
+        pars : ndarray
+            parameter vectors, size n x ndim
+
+        Returns
+        -------
+        signals : ndarray
+            frequency-domain templates, size n x n_ch x nf
+
+        """
+
+        if self.closed:
+            raise ValueError("The waveform service is closed.")
+        pars = np.atleast_2d(np.asarray(pars, dtype=np.float64))
+        signals = np.empty((pars.shape[0], self.n_ch, self.nf),
+                           dtype=np.complex128)
+
+        for j0 in range(0, pars.shape[0], self.max_batch):
+            block = pars[j0:j0 + self.max_batch]
+            n = block.shape[0]
+            # Expensive templates are written first, so that the chunks are
+            # contiguous row ranges dispatched in decreasing cost order
+            order = self.schedule(block)
+            self.pars[0:n] = block[order]
+            chunks = self.chunks(n)
+            for chunk in chunks:
+                self.tasks.put(chunk)
+            errors = []
+            for chunk in chunks:
+                i0, i1, error = self.collect()
+                if error is not None:
+                    errors.append(error)
+            if errors:
+                raise RuntimeError("Waveform computation failed in a worker "
+                                   "process:\n" + errors[0])
+            signals[j0 + order] = self.out[0:n]
+
+        return signals
+
+    def close(self):
+        """
+        Stop the workers and release the shared memory.
+        """
+
+        if self.closed:
+            return
+        for worker in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        del self.pars, self.out
+        self.shm_par.close()
+        self.shm_par.unlink()
+        self.shm_out.close()
+        self.shm_out.unlink()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
@@ -11,6 +11,163 @@ from scipy import special
 import numba as nb
 
 
+# Compiled kernels are cached on disk, so that new processes (e.g. the 
+# workers of a pool) load them instead of compiling them again. They can be 
+# built in advance with compile_kernels. fastmath is not used: the phases 
+# reach 1e5 rad for year-long segments, where reassociating the products 
+# changes the results by up to 1e-11 relative.
+# The array arguments of the kernels either have the size of the output or 
+# size 1 (e.g. scalar times), in which case they are read with stride 0.
+
+@nb.njit(cache=True)
+def window_term(x, t_1, t_2):
+    """
+    Fourier transform at frequency x of the rectangular window between times
+    t_1 and t_2.
+    """
+
+    dt = t_2 - t_1
+    arg = - np.pi * x * (t_1 + t_2)
+
+    return dt * np.sinc(x * dt) * (np.cos(arg) + 1j * np.sin(arg))
+
+
+@nb.njit(cache=True)
+def taper_term(x, t, tw):
+    """
+    Integral of 0.5 * cos(pi * (t' - t) / tw) exp(-2 j pi x t') dt' from 
+    t' = t to t + tw.
+    """
+
+    arg = np.pi * (2 * t - tw) * x
+
+    return - 0.25j * tw * (np.cos(arg) + 1j * np.sin(arg)) * (
+        np.sinc(0.5 - x * tw) - np.sinc(0.5 + x * tw))
+
+
+@nb.njit(parallel=True, cache=True)
+def window_kernel(f, sign, f_0, t_1, t_2, scale):
+    """
+    Values of scale * window_term(sign * f + f_0, t_1, t_2) for flattened 
+    arrays f, t_1, t_2 of the output size or of size 1.
+    """
+
+    n = max(f.shape[0], t_1.shape[0], t_2.shape[0])
+    s_f, s_1, s_2 = f.shape[0] > 1, t_1.shape[0] > 1, t_2.shape[0] > 1
+    out = np.empty(n, dtype=np.complex128)
+    for i in nb.prange(n):
+        out[i] = scale * window_term(sign * f[i * s_f] + f_0, t_1[i * s_1],
+                                     t_2[i * s_2])
+
+    return out
+
+
+@nb.njit(parallel=True, cache=True)
+def taper_kernel(f, t, tw, scale):
+    """
+    Values of scale * taper_term(f, t, tw) for flattened arrays of the 
+    output size or of size 1.
+    """
+
+    n = max(f.shape[0], t.shape[0], tw.shape[0])
+    s_f, s_t, s_w = f.shape[0] > 1, t.shape[0] > 1, tw.shape[0] > 1
+    out = np.empty(n, dtype=np.complex128)
+    for i in nb.prange(n):
+        out[i] = scale * taper_term(f[i * s_f], t[i * s_t], tw[i * s_w])
+
+    return out
+
+
+@nb.njit(parallel=True, cache=True)
+def tukey_kernel(f, f_0, ts, t_1, t_2, tw):
+    """
+    Values of v_func_GB_wind for flattened arrays f, t_1, t_2, tw of the 
+    output size or of size 1, all terms being accumulated in a single pass.
+    """
+
+    n = max(f.shape[0], t_1.shape[0], t_2.shape[0], tw.shape[0])
+    s_f, s_1 = f.shape[0] > 1, t_1.shape[0] > 1
+    s_2, s_w = t_2.shape[0] > 1, tw.shape[0] > 1
+    out = np.empty(n, dtype=np.complex128)
+    for i in nb.prange(n):
+        f_i = f[i * s_f]
+        t_1i, t_2i, tw_i = t_1[i * s_1], t_2[i * s_2], tw[i * s_w]
+        f_shift = f_i + f_0
+        val = - 0.5 * window_term(f_i, t_1i, t_1i + tw_i)
+        val -= taper_term(f_shift, t_1i, tw_i)
+        val -= 0.5 * window_term(f_shift, t_1i + tw_i, t_2i - tw_i)
+        val -= 0.5 * window_term(f_shift, t_2i - tw_i, t_2i)
+        val -= taper_term(f_shift, t_2i, tw_i)
+        out[i] = val / ts
+
+    return out
+
+
+def flat_arrays(*arrays):
+    """
+    Flatten arrays for the kernels. Arrays of size 1 (e.g. scalars) are 
+    passed as arrays of size 1, and arrays that already have the broadcast 
+    shape are flattened, without copies if they are C-contiguous. Only the 
+    other arrays are copied to the full broadcast size.
+
+    Returns
+    -------
+    shape : tuple
+        broadcast shape
+    flat_list : list of ndarrays
+        flattened float arrays, of the broadcast size or of size 1
+
+    """
+
+    arrays = [np.asarray(a, dtype=np.float64) for a in arrays]
+    shape = np.broadcast_shapes(*[a.shape for a in arrays])
+    flat_list = []
+    for a in arrays:
+        if a.size == 1:
+            flat_list.append(a.reshape(1))
+        elif a.shape == shape:
+            flat_list.append(a.reshape(-1))
+        else:
+            flat_list.append(np.broadcast_to(a, shape).reshape(-1))
+
+    return shape, flat_list
+
+
+def window_values(f, sign, f_0, t_1, t_2, scale):
+    """
+    Values of scale * window_term(sign * f + f_0, t_1, t_2) with the shape of
+    the broadcast inputs.
+    """
+
+    shape, (f, t_1, t_2) = flat_arrays(f, t_1, t_2)
+
+    return window_kernel(f, sign, f_0, t_1, t_2, scale).reshape(shape)[()]
+
+
+def compile_kernels():
+    """
+    Compile all the kernels (or load them from the on-disk cache) for the 
+    array layouts used by the waveform functions. This can be called at 
+    process start, or once after installation to build the cache in advance
+    (python -m bayesdawn.waveforms.wavefuncs).
+    """
+
+    f = np.linspace(1e-3, 2e-3, 8)
+    t_1 = np.zeros(8)
+    t_2 = np.ones(8)
+    for t_start, t_end in [(0.0, 1.0), (t_1, t_2)]:
+        v_func_gb_seg(f, 1e-3, 0, 1.0, t_start, t_end)
+        v_func_gb_conj(f, 1e-3, 0, 1.0, t_start, t_end)
+        integral0(f, t_start, t_end, 1.0)
+        integral1(f, t_start, 0.1, 1.0)
+        v_func_GB_wind(f, 1e-3, 0, 1.0, t_start, t_end, 0.1)
+    v_func_gb_mono(f, 1e-3, 1.0, 1.0)
+    v_func_gb(f, 1e-3, 0, 1.0, 1.0)
+    v_func_gb_mono_fast(f.reshape(2, 4), 1e-3, 1.0, 1.0)
+    series_gb_mono(f, np.arange(-1, 2), np.ones((1, 3, 1), dtype=np.complex128),
+                   1e-3, 1.0, 1.0)
+
+
 def v_func_gb_mono(f, f_0, tobs, ts):
     """
     function of frequency giving the Fourier transform of exp(j*Phi(t)),
@@ -37,12 +194,12 @@ def v_func_gb_mono(f, f_0, tobs, ts):
 
     """
 
-    df = f_0 - f
-    
-    return np.exp(1j * np.pi * df * tobs) * np.sinc(df * tobs) * tobs / ts
+    # exp(j pi (f_0 - f) tobs) sinc((f_0 - f) tobs) tobs is the window 
+    # transform at f - f_0
+    return window_values(f, 1.0, - f_0, 0.0, tobs, 1 / ts)
     
     
-@nb.njit(fastmath=True)
+@nb.njit(parallel=True, cache=True)
 def v_func_gb_mono_fast(f, f_0, tobs, ts):
     """
     Fast implentation of v_func_gb_mon in the case of a nf x nf grid of 
@@ -67,7 +224,7 @@ def v_func_gb_mono_fast(f, f_0, tobs, ts):
     
     v_gb = np.empty(f.shape, dtype=np.complex128)
     
-    for i in range(f.shape[0]):
+    for i in nb.prange(f.shape[0]):
         for j in range(f.shape[1]):
             df = f_0 - f[i, j]
             v_gb[i, j] = np.exp(1j * np.pi * df * tobs) * np.sinc(df * tobs) * tobs / ts
@@ -75,6 +232,65 @@ def v_func_gb_mono_fast(f, f_0, tobs, ts):
     return v_gb
 
 
+@nb.njit(parallel=True, cache=True)
+def series_gb_mono(f, k_vect, c, f_0, tobs, ts):
+    """
+    Fourier-series sums of v_func_gb_mono, computed without forming the
+    grid of shifted frequencies:
+
+    out[i, j, l] = sum_k c[i, k, l] v(f[j] - k_vect[k] / tobs)
+
+    Since the shifts are multiples of 1 / tobs, all terms share the same
+    phase and numerator, and v(f[j] - k / tobs) = g_j / (r_j + n_j + k),
+    where a_j = (f_0 - f[j]) tobs = r_j + n_j with n_j integer.
+
+    Parameters
+    ----------
+    f : ndarray
+        frequencies, size nf
+    k_vect : ndarray of int
+        frequency shifts in units of 1 / tobs, size n_k
+    c : ndarray
+        series coefficients, size n_ch x n_k x n_col
+    f_0 : float
+        wave frequency
+    tobs : float
+        integration time
+    ts : float
+        sampling time (cadence)
+
+    Returns
+    -------
+    out : ndarray
+        series values, size n_ch x nf x n_col
+
+    """
+
+    n_ch, n_k, n_col = c.shape
+    out = np.zeros((n_ch, f.shape[0], n_col), dtype=np.complex128)
+
+    for j in nb.prange(f.shape[0]):
+        a = (f_0 - f[j]) * tobs
+        n_j = int(np.round(a))
+        r = a - n_j
+        s = np.sin(np.pi * r) / np.pi
+        for k in range(n_k):
+            m = n_j + k_vect[k]
+            if m == 0:
+                w = np.sinc(r)
+            else:
+                w = s / (r + m)
+            for i in range(n_ch):
+                for l in range(n_col):
+                    out[i, j, l] += c[i, k, l] * w
+        phase = np.exp(1j * np.pi * r) * tobs / ts
+        for i in range(n_ch):
+            for l in range(n_col):
+                out[i, j, l] *= phase
+
+    return out
+
+
 def v_func_gb(f, f_0, f_dot, T, ts):
     """
     function of frequency giving the Fourier transform of exp(-j*Phi(t)),
@@ -115,7 +331,7 @@ def v_func_gb(f, f_0, f_dot, T, ts):
         return common_factor*(erfi_T - erfi_0)/ts
 
     else:
-        return np.exp(-1j*np.pi*(f_0+f)*T)*np.sinc((f_0+f)*T)*T/ts
+        return window_values(f, 1.0, f_0, 0.0, T, 1 / ts)
 
 
 def v_func_gb_star(f, f_0, f_dot, T, ts):
@@ -188,9 +404,7 @@ def v_func_gb_seg(f, f_0, f_dot, ts, T1, T2):
         return common_factor*(erfi_T2 - erfi_T1)/ts
 
     else:
-        f_shift = f + f_0
-
-        return window_tf(f_shift, T1, T2)/ts
+        return window_values(f, 1.0, f_0, T1, T2, 1 / ts)
 
 
 def window_tf(f, T_start, T_end):
@@ -217,9 +431,7 @@ def window_tf(f, T_start, T_end):
 
     """
 
-    dT = T_end - T_start
-
-    return dT * np.exp(-np.pi*f*1j*(T_end+T_start))*np.sinc(f*dT)
+    return window_values(f, 1.0, 0.0, T_start, T_end, 1.0)
 
 
 def v_func_gb_conj(f, f_0, f_dot, ts, t1, t2):
@@ -265,12 +477,8 @@ def v_func_gb_conj(f, f_0, f_dot, ts, t1, t2):
         return common_factor * (erfi_T2 - erfi_T1)/ts
 
     else:
-        dT = t2 - t1
-        f_shift = f_0 - f
-        out = dT * np.exp(np.pi * f_shift * 1j
-                          * (t2 + t1)) * np.sinc(f_shift * dT) / ts
-
-        return out
+        # Window transform at f - f_0
+        return window_values(f, 1.0, - f_0, t1, t2, 1 / ts)
     # return np.conj(v_func_gb(-f, f_0, f_dot, ts, t1, t2))
 
 
@@ -290,8 +498,7 @@ def integral0(f, T1, T2, ts):
 
     """
 
-    dT = T2 - T1
-    return - dT/2*np.exp(-1j*np.pi*f*(T1+T2))*np.sinc(f*dT) / ts
+    return window_values(f, 1.0, 0.0, T1, T2, - 0.5 / ts)
 
 
 def integral1(f, T, tw, ts):
@@ -302,8 +509,9 @@ def integral1(f, T, tw, ts):
 
     """
 
-    return -1j*tw/4.*np.exp(1j*np.pi*(2*T-tw)*f)*(
-        np.sinc(1/2.-f*tw) - np.sinc(1/2.+f*tw)) / ts
+    shape, (f, T, tw) = flat_arrays(f, T, tw)
+
+    return taper_kernel(f, T, tw, 1 / ts).reshape(shape)[()]
 
 
 def v_func_GB_wind(f, f_0, f_dot, ts, T1, T2, tw):
@@ -342,11 +550,11 @@ def v_func_GB_wind(f, f_0, f_dot, ts, T1, T2, tw):
         vector of values of v (size n_data) calculated at given frequencies
 
     """
-    f_shift = f + f_0
+    shape, (f, T1, T2, tw) = flat_arrays(f, T1, T2, tw)
+
+    return tukey_kernel(f, f_0, ts, T1, T2, tw).reshape(shape)[()]
+
 
-    integr = integral0(f, T1, T1+tw, ts) - integral1(f_shift, T1, tw, ts)
-    integr += integral0(f_shift, T1+tw, T2-tw, ts) + integral0(f_shift, T2-tw,
-                                                               T2, ts)
-    integr -= integral1(f_shift, T2, tw, ts)
+if __name__ == '__main__':
 
-    return integr
+    compile_kernels()
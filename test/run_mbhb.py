@@ -4,6 +4,7 @@ import numpy as np
 import copy
 # Bayesdawn modules
 from bayesdawn.algebra import matrixalgebra
+from bayesdawn.waveforms import lisaresp, service
 # LISABeta and LDC tools
 import lisabeta.lisa.ldctools as ldctools
 import lisabeta.lisa.lisa as lisa
@@ -67,6 +68,32 @@ def lisabeta_waveform(params, freq,
     return [shiftTime(freq, sig['ch' + str(i)], tshift).conj()*scale for i in channels]
 
 
+def lisabeta_responses(params_list, freq, 
+                       minf=1e-5, 
+                       maxf=0.1, 
+                       tshift=0,
+                       channels=[1, 2],
+                       tmin=None, 
+                       tmax=None,
+                       scale=1.0):
+    # Same as lisabeta_waveform for several parameter vectors sharing the 
+    # same intrinsic parameters: amplitude and phase are resampled once
+    wftdi_list = [lisa.GenerateLISATDI_SMBH(ldctools.make_params_dict(params), 
+                                            minf=minf, 
+                                            maxf=maxf,
+                                            tmin=tmin,
+                                            tmax=tmax,
+                                            TDI='TDIAET', 
+                                            order_fresnel_stencil=0, 
+                                            TDIrescaled=False, 
+                                            approximant='IMRPhenomD')[(2,2)]
+                  for params in params_list]
+    sig_list = lisaresp.generate_lisa_responses(wftdi_list, freq=freq, 
+                                                channels=channels)
+    return [[shiftTime(freq, sig['ch' + str(i)], tshift).conj()*scale 
+             for i in channels] for sig in sig_list]
+
+
 def compute_signal(p_sampl, freq,
                    minf=1e-5, 
                    maxf=0.1,
@@ -156,28 +183,25 @@ def design_matrix(params_intr, freq,
     params_0[i_dist] = 1e4
     # Inclination
     params_0[i_inc] = 0.5 * np.pi
-    # 4 elements
-    params_list = [copy.deepcopy(params_0) for j in range(4)]
+    # Only 2 elements need to be generated, the 2 others are obtained by a
+    # phase shift (see lisaresp.design_matrix)
+    params_list = [copy.deepcopy(params_0) for j in range(2)]
     # First element (phi_c, phi) = (0, 0)
     params_list[0][i_phi0] = 0
     params_list[0][i_psi] = 0
     # Second element (phi_c, phi) = (pi/2, pi/4)
     params_list[1][i_phi0] = np.pi / 2
     params_list[1][i_psi] = np.pi / 4
-    # Third element (phi_c, phi) = (3pi/4, 0)
-    params_list[2][i_phi0] = 3 * np.pi / 4
-    params_list[2][i_psi] = 0
-    # Fourth element (phi_c, phi) = (pi/4, pi/4)
-    params_list[3][i_phi0] = np.pi / 4
-    params_list[3][i_psi] = np.pi / 4
-    # Compute all 4 elements for all channels
-    elements = [lisabeta_waveform(params, freq, 
+    # Compute the 2 elements for all channels
+    elements = lisabeta_responses(params_list, freq, 
                                   minf=minf, 
                                   maxf=maxf, 
                                   tshift=t_offset, 
                                   channels=channels,
-                                 scale=scale)
-                for params in params_list]
+                                  scale=scale)
+    # Third element (phi_c, phi) = (3pi/4, 0)
+    # Fourth element (phi_c, phi) = (pi/4, pi/4)
+    elements.extend([[1j * el for el in element] for element in elements])
     # Compute the design matrices for each channel
     mat_list = [np.vstack([el[i] for el in elements]).T 
                 for i in range(len(elements[0]))]
@@ -185,6 +209,21 @@ def design_matrix(params_intr, freq,
     return mat_list
 
 
+def compute_design_matrix(par_intr, freq,
+                          minf=1e-5, maxf=0.1, t_offset=0.0,
+                          channels=[1, 2], scale=1.0):
+
+    # Transform parameters into waveform-compatible ones
+    params_intr = physics.like_to_waveform_intr(par_intr)
+    # Compute design matrices for all channels
+    return design_matrix(params_intr, freq,
+                         minf=minf, 
+                         maxf=maxf, 
+                         t_offset=t_offset,
+                         channels=channels,
+                         scale=scale)
+
+
 def compute_signal_reduced(par_intr, freq, data_dft, sn,
                            minf=1e-5, maxf=0.1, t_offset=0.0,
                            channels=[1, 2], scale=1.0):
@@ -208,24 +247,38 @@ def compute_signal_reduced(par_intr, freq, data_dft, sn,
 
     """
 
-    # Transform parameters into waveform-compatible ones
-    params_intr = physics.like_to_waveform_intr(par_intr)
     # Compute design matrices for all channels
-    mat_list = design_matrix(params_intr, freq,
-                             minf=minf, 
-                             maxf=maxf, 
-                             t_offset=t_offset,
-                             channels=channels,
-                            scale=scale)
+    mat_list = compute_design_matrix(par_intr, freq,
+                                     minf=minf, 
+                                     maxf=maxf, 
+                                     t_offset=t_offset,
+                                     channels=channels,
+                                     scale=scale)
     # Compute amplitudes
-    amps = [matrixalgebra.gls(data_dft[i], mat_list[i], sn[i]) 
-            for i in range(len(channels))]
+    amps = matrixalgebra.gls_batch(data_dft[0:len(channels)], mat_list, 
+                                   sn[0:len(channels)])
     # Compute estimated signals
     ch_list = [np.dot(mat_list[i], amps[i]) for i in range(len(channels))]
     
     return ch_list
 
 
+def compute_support(p_sampl, minf=1e-5, maxf=0.1, t_offset=0.0, **kwargs):
+
+    # Frequency interval covered by the template during the observation
+    f_min, f_max = lisaresp.mbhb_frequency_support(
+        physics.like_to_waveform(p_sampl), t_start=t_offset)
+    return max(f_min, minf), min(f_max, maxf)
+
+
+def compute_support_reduced(par_intr, minf=1e-5, maxf=0.1, t_offset=0.0, 
+                            **kwargs):
+
+    f_min, f_max = lisaresp.mbhb_frequency_support(
+        physics.like_to_waveform_intr(par_intr), t_start=t_offset)
+    return max(f_min, minf), min(f_max, maxf)
+
+
 if __name__ == '__main__':
 
     # Bayesdawn modules
@@ -363,6 +416,9 @@ if __name__ == '__main__':
     psd_estimation = config["PSD"].getboolean("estimation")
     psd_model = config["PSD"].get("model")
     imputation = config["Imputation"].getboolean("imputation")
+    # Exact likelihood of observed data, without imputation
+    gap_marginalization = config['Model'].getboolean('gapMarginalization', 
+                                                     fallback=False)
     if psd_estimation | (psd_model == 'spline'):
         print("PSD estimation enabled.")
         f_knots = np.array([1e-5, 5e-4, 5e-3, 1e-2, 3e-2, 4e-2, 
@@ -387,8 +443,8 @@ if __name__ == '__main__':
                    for ch in ['A', 'E']]
         sn = [psd.calculate(freq_d[inds]) for psd in psd_cls]
 
-    if imputation:
-        print("Missing data imputation enabled.")
+    if imputation | gap_marginalization:
+        print("Missing data model enabled.")
         data_mean = [np.zeros(dat.shape[0]) for dat in data_ae_time]
         data_cls = datamodel.GaussianStationaryProcess(
             data_mean, mask, psd_cls,
@@ -420,23 +476,59 @@ if __name__ == '__main__':
                     "channels": [1, 2],
                     "scale": scale}
     # Likelihood definition
-    ll_cls = likelihoodmodel.LogLike(data_ae_time, sn, inds, tobs, del_t * q,
-                                    compute_signal,
-                                    compute_signal_reduced,
-                                    signal_args=[],
-                                    signal_kwargs=signal_kwargs,
-                                    normalized=normalized,
-                                    channels=[1, 2],
-                                    model_cls=data_cls,
-                                    psd_cls=psd_cls,
-                                    wd=wd,
-                                    wd_full=wd_full,
-                                    gap_convolution=gap_convolution)
+    ll_kwargs = {"signal_args": [],
+                 "signal_kwargs": signal_kwargs,
+                 "normalized": normalized,
+                 "channels": [1, 2],
+                 "model_cls": data_cls,
+                 "psd_cls": psd_cls,
+                 "wd": wd,
+                 "wd_full": wd_full,
+                 "gap_convolution": gap_convolution,
+                 "template_cache_size": config['Model'].getint(
+                     'templateCacheSize', fallback=0)}
+    if config['Model'].getboolean('frequencySupport', fallback=False):
+        # Restrict the likelihood to the band covered by each template
+        ll_kwargs["support_func"] = compute_support
+        ll_kwargs["support_reduced_func"] = compute_support_reduced
+    n_waveform_workers = config['Model'].getint('waveformWorkers', fallback=0)
+    if n_waveform_workers > 0:
+        # Compute the templates of batched evaluations in worker processes
+        waveform_service = service.WaveformService(
+            compute_signal, freq_d[inds], 2, len(p_sampl),
+            signal_kwargs=signal_kwargs, n_workers=n_waveform_workers,
+            max_batch=config["Sampler"].getint("WalkerNumber"))
+        ll_kwargs["signal_batch_func"] = waveform_service.compute_batch
+    if gap_marginalization:
+        ll_cls = likelihoodmodel.GapMarginalizedLogLike(
+            data_ae_time, sn, inds, tobs, del_t * q,
+            compute_signal,
+            compute_signal_reduced,
+            design_matrix_func=compute_design_matrix,
+            **ll_kwargs)
+    elif config['Model'].getboolean('relativeBinning', fallback=False):
+        # Heterodyned likelihood around the injected waveform
+        ll_cls = likelihoodmodel.RelativeBinningLogLike(
+            data_ae_time, sn, inds, tobs, del_t * q,
+            compute_signal,
+            compute_signal_reduced,
+            p_sampl,
+            design_matrix_func=compute_design_matrix,
+            eps=config['Model'].getfloat('relativeBinningEpsilon', 
+                                         fallback=0.1),
+            **ll_kwargs)
+        print("Relative binning with " + str(ll_cls.n_bins) + " bins.")
+    else:
+        ll_cls = likelihoodmodel.LogLike(data_ae_time, sn, inds, tobs, 
+                                         del_t * q,
+                                         compute_signal,
+                                         compute_signal_reduced,
+                                         **ll_kwargs)
 
     # =========================================================================
     # Testing likelihood
     # =========================================================================
-    par_aux0 = np.concatenate(ll_cls.data_dft + sn)
+    par_aux0 = ll_cls.par_aux
     t1 = time.time()
     if reduced:
         aft, eft = ll_cls.compute_signal_reduced(p_sampl[i_sampl_intr],
@@ -540,6 +632,9 @@ if __name__ == '__main__':
     if multiproc == 'ray':
         from ray.util.multiprocessing.pool import Pool
         pool = Pool(threads)
+    elif multiproc == 'vectorized':
+        # Evaluate all walkers at once with LogLike's batched likelihoods
+        pool = samplers.VectorizedPool()
     else:
         pool = None
 
@@ -600,3 +695,5 @@ if __name__ == '__main__':
                              verbose=2)
         t2 = time.time()
     print("MC completed in " + str(t2 - t1) + " seconds.")
+    if n_waveform_workers > 0:
+        waveform_service.close()
@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+def signal(par, freq):
+
+    amp, tc = par
+    h = amp * np.exp(-2j * np.pi * freq * tc)
+
+    return [h, 0.5 * h, 0.1j * h]
+
+
+class TestAuxiliaryParams(unittest.TestCase):
+
+    def test_channels(self):
+
+        n_data = 2 ** 10
+        del_t = 2.0
+        rng = np.random.default_rng(15)
+        data = [rng.normal(size=n_data) for i in range(3)]
+        freq = np.fft.fftfreq(n_data) / del_t
+        df = 1 / (n_data * del_t)
+        par = np.array([0.3, 120.0])
+        inds_cont = np.where((freq > 0.01) & (freq < 0.2))[0]
+
+        for inds in [inds_cont, inds_cont[::3]]:
+            sn = [(1 + 10 * freq[inds]) * (i + 1) for i in range(3)]
+            ll_cls = likelihoodmodel.LogLike(data, sn, inds, n_data * del_t,
+                                             del_t, signal, None,
+                                             psd_cls=[PSD()] * 3)
+            # Direct computation for the three channels
+            h = signal(par, freq[inds])
+            ll_ref = 0
+            for i in range(3):
+                d = np.fft.fft(data[i])[inds] * del_t
+                ll_ref += 4 * df * np.sum(np.real(np.conj(h[i]) * d) / sn[i]
+                                          - 0.5 * np.abs(h[i]) ** 2 / sn[i])
+            np.testing.assert_allclose(ll_cls.log_likelihood(par, None),
+                                       ll_ref, rtol=1e-12)
+
+            # The data and PSDs are views of the contiguous vector
+            data_dft, sn_aux = ll_cls.get_auxiliary_params(None)
+            self.assertTrue(np.shares_memory(data_dft, ll_cls.par_aux))
+            self.assertTrue(np.shares_memory(sn_aux, ll_cls.par_aux))
+
+            # New auxiliary parameters with the channels in reverse order
+            par_aux = np.copy(ll_cls.par_aux)
+            data_new, sn_new = ll_cls.get_auxiliary_params(par_aux)
+            data_new[:] = data_dft[::-1]
+            sn_new[:] = sn_aux[::-1]
+            ll_rev = likelihoodmodel.LogLike(data[::-1], sn[::-1], inds,
+                                             n_data * del_t, del_t, signal,
+                                             None, psd_cls=[PSD()] * 3)
+            np.testing.assert_allclose(ll_cls.log_likelihood(par, par_aux),
+                                       ll_rev.log_likelihood(par, None),
+                                       rtol=1e-12)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
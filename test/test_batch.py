@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+def signal(par, freq):
+
+    amp, tc = par
+    h = amp * (freq / 0.1) ** (-7 / 6) * np.exp(-2j * np.pi * freq * tc)
+
+    return [h, 0.5j * h]
+
+
+def signal_reduced(par_intr, freq, data_dft, sn):
+
+    h = (freq / 0.1) ** (-7 / 6) * np.exp(-2j * np.pi * freq * par_intr[0])
+    # Complex amplitude maximizing the likelihood of the first channel
+    amp = np.sum(np.conj(h) * data_dft[0] / sn[0]) / np.sum(
+        np.abs(h) ** 2 / sn[0])
+
+    return [amp * h, 0.5j * amp * h]
+
+
+class TestLogLikeBatch(unittest.TestCase):
+
+    def test_batch(self):
+
+        n_data = 2 ** 11
+        rng = np.random.default_rng(13)
+        mask = np.ones(n_data)
+        mask[500:600] = 0
+        data = [mask * rng.normal(size=n_data) for i in range(2)]
+        freq = np.fft.fftfreq(n_data)
+        inds = np.where((freq > 0.01) & (freq < 0.4))[0]
+        sn = [1 + freq[inds] ** 2] * 2
+        pars = np.column_stack([rng.uniform(0.1, 2, 7),
+                                rng.uniform(0, n_data, 7)])
+        pars_intr = pars[:, 1:]
+
+        def signal_batch(pars):
+            return np.array([signal(par, freq[inds]) for par in pars])
+
+        for kwargs in [{}, {'wd': mask, 'gap_convolution': True},
+                       {'signal_batch_func': signal_batch,
+                        'template_cache_size': 4}]:
+            ll_cls = likelihoodmodel.LogLike(data, sn, inds, n_data, 1.0,
+                                             signal, signal_reduced,
+                                             psd_cls=[PSD(), PSD()],
+                                             normalized=True, **kwargs)
+            ll_loop = [ll_cls.log_likelihood(par, None) for par in pars]
+            np.testing.assert_allclose(ll_cls.log_likelihood_batch(pars),
+                                       ll_loop, rtol=1e-12)
+            ll_loop = [ll_cls.log_likelihood_reduced(par_intr, None)
+                       for par_intr in pars_intr]
+            np.testing.assert_allclose(
+                ll_cls.log_likelihood_reduced_batch(pars_intr), ll_loop,
+                rtol=1e-12)
+            # Stacked templates
+            signals = [ll_cls.compute_signal(par) for par in pars]
+            np.testing.assert_allclose(
+                ll_cls.stacked_log_likelihood(signals),
+                [ll_cls.signal_log_likelihood(s) for s in signals],
+                rtol=1e-12)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from bayesdawn.waveforms import coeffs
+
+
+class TestResponseCoeffs(unittest.TestCase):
+
+    def test_response_coeffs(self):
+
+        rng = np.random.default_rng(6)
+        theta = rng.uniform(0, np.pi, 50)
+        phi = rng.uniform(-np.pi, np.pi, 50)
+
+        k_p, k_c = coeffs.response_coeffs(theta, phi, 0.3, channel='TDIAET')
+        for n in range(theta.size):
+            for i, (a, b) in enumerate([(2, 3), (3, 1), (1, 2)]):
+                kp_ref, kc_ref = coeffs.k_coeffs([theta[n], phi[n]], 0.3, a, b)
+                np.testing.assert_allclose(k_p[n, i], kp_ref, atol=1e-15)
+                np.testing.assert_allclose(k_c[n, i], kc_ref, atol=1e-15)
+
+        for channel in ['phasemeters', 'TDIAET']:
+            k_p, k_c = coeffs.response_coeffs(theta, phi, 0.3, channel=channel)
+            table = coeffs.ResponseCoeffTable(0.3, channel=channel)
+            # The table is exact, as the coefficients are trigonometric
+            # polynomials of the sky angles
+            kp_tab, kc_tab = table(theta, phi)
+            np.testing.assert_allclose(kp_tab, k_p, atol=1e-13)
+            np.testing.assert_allclose(kc_tab, k_c, atol=1e-13)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+from scipy import linalg
+from bayesdawn import datamodel, likelihoodmodel, psdmodel
+
+
+def signal(par, freq):
+
+    amp, tc = par
+    h = amp * np.exp(-2j * np.pi * freq * tc)
+
+    return [h, 0.5 * h]
+
+
+def design_matrix(par_intr, freq):
+
+    mat = np.array([np.exp(-2j * np.pi * freq * par_intr[0]),
+                    (freq / freq[-1]) * np.exp(-2j * np.pi * freq * par_intr[0])
+                    ]).T
+
+    return [mat, 0.5 * mat]
+
+
+class TestGapMarginalizedLogLike(unittest.TestCase):
+
+    def test_log_likelihood(self):
+
+        n_data = 512
+        rng = np.random.default_rng(7)
+        mask = np.ones(n_data)
+        mask[100:130] = 0
+        mask[300:310] = 0
+        psd_cls = psdmodel.PSDSpline(n_data, 1.0, n_knots=8,
+                                     fmin=1.05 / n_data)
+        psd_cls.estimate(np.cumsum(rng.normal(size=n_data)) * 0.1
+                         + rng.normal(size=n_data))
+        data = [mask * rng.normal(size=n_data) for i in range(2)]
+        freq = np.fft.fftfreq(n_data)
+        inds = np.where((freq > 0.01) & (freq < 0.4))[0]
+        sn = [psd_cls.calculate(freq[inds])] * 2
+
+        model_cls = datamodel.GaussianStationaryProcess(
+            np.zeros(n_data), mask, [psd_cls, psd_cls], method='PCG',
+            tol=1e-13, n_it_max=2000)
+        ll_cls = likelihoodmodel.GapMarginalizedLogLike(
+            data, sn, inds, n_data, 1.0, signal, None,
+            design_matrix_func=design_matrix, model_cls=model_cls,
+            psd_cls=[psd_cls, psd_cls])
+
+        # Dense solve of the observed data covariance
+        ind_obs = np.where(mask == 1)[0]
+        c_oo = linalg.toeplitz(model_cls.autocorr[0])[np.ix_(ind_obs,
+                                                             ind_obs)]
+        data_o = [d[ind_obs] for d in data]
+        x_data = [linalg.solve(c_oo, d_o) for d_o in data_o]
+
+        def ll_dense(h_o_list):
+            return sum([np.dot(x_d, h_o) - 0.5 * np.dot(h_o, linalg.solve(
+                c_oo, h_o)) for x_d, h_o in zip(x_data, h_o_list)])
+
+        pars = np.array([[0.3, 50.0], [0.5, 200.0], [0.2, 400.0]])
+        ll_ref = [ll_dense(ll_cls.observed_signal(signal(par, ll_cls.f_band)))
+                  for par in pars]
+        ll = [ll_cls.log_likelihood(par, None) for par in pars]
+        np.testing.assert_allclose(ll, ll_ref, rtol=1e-10)
+        # Templates solved together
+        np.testing.assert_allclose(ll_cls.log_likelihood_batch(pars), ll_ref,
+                                   rtol=1e-10)
+
+        # Likelihood maximized over the complex amplitudes
+        par_intr = np.array([120.0])
+        ll_ref = 0
+        for i, mat in enumerate(design_matrix(par_intr, ll_cls.f_band)):
+            basis = ll_cls.observed_signal(np.hstack([mat, 1j * mat]).T).T
+            v = np.dot(basis.T, x_data[i])
+            normal = np.dot(basis.T, linalg.solve(c_oo, basis))
+            ll_ref += 0.5 * np.dot(v, linalg.solve(normal, v))
+        np.testing.assert_allclose(ll_cls.log_likelihood_reduced(par_intr,
+                                                                 None),
+                                   ll_ref, rtol=1e-10)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
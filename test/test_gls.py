@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from bayesdawn.algebra import matrixalgebra
+
+
+def weighted_lstsq(dat, mat, sn):
+
+    w = 1 / np.sqrt(sn)
+
+    return np.linalg.lstsq(mat * w[:, np.newaxis], dat * w, rcond=None)[0]
+
+
+class TestGLS(unittest.TestCase):
+
+    def test_gls_batch(self):
+
+        rng = np.random.default_rng(16)
+        n_ch, n, p = 3, 200, 4
+        mat = rng.normal(size=(n_ch, n, p)) + 1j * rng.normal(size=(n_ch, n, p))
+        dat = rng.normal(size=(n_ch, n)) + 1j * rng.normal(size=(n_ch, n))
+        sn = rng.uniform(0.5, 2, size=(n_ch, n))
+
+        # Well-conditioned design matrices
+        amps = matrixalgebra.gls_batch(dat, mat, sn)
+        for i in range(n_ch):
+            np.testing.assert_allclose(amps[i],
+                                       weighted_lstsq(dat[i], mat[i], sn[i]),
+                                       rtol=1e-10)
+            np.testing.assert_allclose(matrixalgebra.gls(dat[i], mat[i],
+                                                         sn[i]),
+                                       amps[i], rtol=1e-10)
+
+        # Rank-deficient design matrices (redundant columns): the fitted 
+        # model is the same as with the minimum-norm solution
+        mat_def = np.concatenate([mat, mat[:, :, 0:1] - 2j * mat[:, :, 1:2]],
+                                 axis=2)
+        amps = matrixalgebra.gls_batch(dat, mat_def, sn)
+        for i in range(n_ch):
+            amps_ref = weighted_lstsq(dat[i], mat_def[i], sn[i])
+            np.testing.assert_allclose(np.dot(mat_def[i], amps[i]),
+                                       np.dot(mat_def[i], amps_ref),
+                                       rtol=1e-10)
+            normal = np.dot(mat_def[i].conj().T / sn[i], mat_def[i])
+            np.testing.assert_allclose(
+                np.dot(normal, matrixalgebra.inverse_normal(normal)), 
+                np.dot(normal, np.linalg.pinv(normal)), atol=1e-10)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
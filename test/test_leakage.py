@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+from scipy import signal
+from bayesdawn.gaps import leakage
+
+
+def windowed_dft(window, x_band, inds, scale=1.0):
+
+    n_data = len(window)
+    x = np.zeros(n_data, dtype=np.complex128)
+    x[inds] = x_band
+    x[(n_data - inds) % n_data] = np.conj(x_band)
+
+    return np.fft.fft(window * np.real(np.fft.ifft(x)))[inds] * scale
+
+
+class TestWindowConvolution(unittest.TestCase):
+
+    def test_apply(self):
+
+        n_data = 4096
+        rng = np.random.default_rng(9)
+        tukey = signal.windows.tukey(n_data, 0.1)
+        mask = np.ones(n_data)
+        mask[1000:1100] = 0
+        mask[3000:3020] = 0
+        # Bands touching the zero and Nyquist frequencies, where the mirror 
+        # images of the band leak into it
+        inds_list = [np.arange(1, 300), np.arange(200, 1500),
+                     np.arange(1500, n_data // 2 + 1), 
+                     np.arange(0, n_data // 2 + 1)]
+
+        for window, tol, rtol in [(tukey, 1e-4, 1e-4), (tukey, 1e-6, 1e-12),
+                                  (mask, 1e-6, 1e-12)]:
+            for inds in inds_list:
+                x = np.array([1, 1j]) @ rng.normal(size=(2, inds.size))
+                conv = leakage.WindowConvolution(window, inds, scale=1.3, 
+                                                 tol=tol)
+                y_ref = windowed_dft(window, x, inds, scale=1.3)
+                self.assertLess(np.max(np.abs(conv.apply(x) - y_ref)), 
+                                rtol * np.max(np.abs(y_ref)))
+
+
+class TestMaskLeakageKernel(unittest.TestCase):
+
+    def test_periodogram_mean(self):
+
+        n_data = 4096
+        fe = 1.0
+        mask = np.ones(n_data)
+        mask[1000:1100] = 0
+        mask[3000:3020] = 0
+        window = signal.windows.blackmanharris(n_data)
+        inds = np.arange(1, n_data // 2)
+
+        def psd_func(f):
+            return 1e-3 / (f ** 2 + 1e-4) + 1
+
+        for w, tol, rtol in [(mask, 1e-6, 1e-12), (window, 1e-6, 1e-8)]:
+            kernel = leakage.MaskLeakageKernel(w, tol=tol, n_band_max=64)
+            per_mean = kernel.periodogram_mean(psd_func, fe)
+            per_exact = np.real(kernel.periodogram_mean_exact(psd_func, fe))
+            np.testing.assert_allclose(per_mean[inds], per_exact[inds], 
+                                       rtol=rtol)
+        # The smooth window is convolved on a narrow band, the gap mask 
+        # with FFTs
+        self.assertTrue(kernel.banded)
+
+        # Whittle likelihood of a periodogram equal to its expectation
+        kernel = leakage.MaskLeakageKernel(mask)
+        psd = psd_func(kernel.frequencies(fe))
+        per_mean = kernel.periodogram_mean(psd_func, fe)
+        ll = kernel.whittle_loglike(per_mean, psd, inds=inds)
+        self.assertAlmostEqual(ll, -0.5 * np.sum(np.log(per_mean[inds]) + 1))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from bayesdawn.waveforms import lisaresp
+
+
+@unittest.skipIf(not hasattr(lisaresp, 'lisa'), "lisabeta is not installed")
+class TestMBHBDesignMatrix(unittest.TestCase):
+
+    def test_design_matrix(self):
+
+        tobs = 2592000.0
+        freq = np.arange(1, int(1e-2 * tobs)) / tobs
+        # m1, m2, chi1, chi2, Deltat, lambda, beta
+        params_intr = np.array([1e6, 5e5, 0.5, 0.3, 1.5e6, 1.2, 0.4])
+        mat_list = lisaresp.design_matrix(params_intr, freq, tobs)
+
+        # F-statistic basis elements generated one at a time
+        elements = []
+        for phi_0, psi in [(0, 0), (np.pi / 2, np.pi / 4),
+                           (3 * np.pi / 4, 0), (np.pi / 4, np.pi / 4)]:
+            params = np.zeros(11)
+            params[lisaresp.i_intr] = params_intr
+            params[lisaresp.i_dist] = 1e3
+            params[lisaresp.i_inc] = 0.5 * np.pi
+            params[lisaresp.i_phi0] = phi_0
+            params[lisaresp.i_psi] = psi
+            elements.append(lisaresp.lisabeta_template(params, freq, tobs))
+
+        for i, mat in enumerate(mat_list):
+            self.assertEqual(mat.shape, (freq.size, 4))
+            scale = np.max(np.abs(mat[:, 0]))
+            # The first two elements are generated directly
+            for k in range(2):
+                np.testing.assert_allclose(mat[:, k], elements[k][i],
+                                           rtol=0, atol=1e-12 * scale)
+            # The last two are phase-shifted copies, which span the same
+            # space as the directly generated elements
+            for k in range(4):
+                coef = np.linalg.lstsq(mat, elements[k][i], rcond=None)[0]
+                np.testing.assert_allclose(mat.dot(coef), elements[k][i],
+                                           rtol=0, atol=1e-8 * scale)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+class TestNarrowbandLogLike(unittest.TestCase):
+
+    def test_sparse_batch(self):
+
+        n_data = 2 ** 12
+        rng = np.random.default_rng(8)
+        data = [rng.normal(size=n_data) for i in range(2)]
+        inds = np.arange(100, 1500)
+        sn = [np.ones(inds.size)] * 2
+        width = 0.002
+
+        def signal(par, freq):
+            h = par[0] * np.exp(- 0.5 * ((freq - par[1]) / width) ** 2)
+            return [h, 0.5 * h]
+
+        def narrowband(par):
+            i_start = int(np.ceil((par[1] - 8 * width) * n_data))
+            freq = np.arange(i_start, int((par[1] + 8 * width) * n_data)) \
+                / n_data
+            return i_start, np.array(signal(par, freq))
+
+        pars = np.column_stack([rng.uniform(0, 3, 20),
+                                rng.uniform(0.01, 0.4, 20)])
+        ll_full = likelihoodmodel.LogLike(data, sn, inds, n_data, 1.0,
+                                          signal, None,
+                                          psd_cls=[PSD(), PSD()])
+        ll_nb = likelihoodmodel.LogLike(data, sn, inds, n_data, 1.0,
+                                        signal, None,
+                                        psd_cls=[PSD(), PSD()],
+                                        narrowband_func=narrowband)
+        ll_ref = ll_full.log_likelihood_batch(pars)
+        # Batched likelihoods on the template supports only, including 
+        # templates crossing the band edges
+        np.testing.assert_allclose(ll_nb.log_likelihood_batch(pars), ll_ref,
+                                   rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose([ll_nb.log_likelihood(par, None)
+                                    for par in pars], ll_ref,
+                                   rtol=1e-10, atol=1e-12)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
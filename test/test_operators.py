@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+from bayesdawn.gaps import operators
+
+
+class TestMissingDataDFT(unittest.TestCase):
+
+    def test_transform(self):
+
+        n_data = 2 ** 16
+        rng = np.random.default_rng(2)
+        mask = np.ones(n_data)
+        mask[1000:1300] = 0
+        mask[30000:30020] = 0
+        window = np.hanning(n_data)
+        y = rng.normal(size=(2, n_data))
+        y_rec = y.copy()
+        y_rec[:, mask == 0] = rng.normal(size=(2, int(np.sum(mask == 0))))
+
+        for inds in [np.arange(200, 1500), np.arange(0, n_data // 2)]:
+            dft_update = operators.MissingDataDFT(mask, inds, window=window,
+                                                  scale=0.5)
+            dft_update.set_observed(y)
+            # Updating the missing data must be equivalent to a full DFT
+            x_ref = 0.5 * np.fft.fft(y_rec * window, axis=-1)[:, inds]
+            np.testing.assert_allclose(dft_update.transform(y_rec), x_ref,
+                                       rtol=0, atol=1e-10)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,155 @@
+import copy
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel, psdmodel
+
+
+def signal(par, freq):
+
+    amp, tc = par
+    h = amp * np.exp(-2j * np.pi * freq * tc)
+
+    return [h, 0.5 * h]
+
+
+class TestPSDIntervalUpdate(unittest.TestCase):
+
+    def setUp(self):
+
+        self.n_data = 2 ** 12
+        rng = np.random.default_rng(6)
+        self.data = [rng.normal(size=self.n_data) for i in range(2)]
+        freq = np.fft.fftfreq(self.n_data)
+        self.inds = np.where((freq > 0.005) & (freq < 0.45))[0]
+        self.psd_list = []
+        for x in self.data:
+            psd_cls = psdmodel.PSDSpline(self.n_data, 1.0, n_knots=10,
+                                         fmin=1.05 / self.n_data)
+            psd_cls.estimate(x)
+            self.psd_list.append(psd_cls)
+        self.par = np.array([0.05, 100.0])
+
+    def log_like(self, psd_list):
+
+        sn = [psd.calculate(np.fft.fftfreq(self.n_data)[self.inds])
+              for psd in psd_list]
+
+        return likelihoodmodel.LogLike(self.data, sn, self.inds, self.n_data,
+                                       1.0, signal, None, normalized=True,
+                                       psd_cls=psd_list)
+
+    def test_update_psd_coeffs(self):
+
+        ll_cls = self.log_like(self.psd_list)
+        par_aux = ll_cls.par_aux
+        coeffs = self.psd_list[0].get_spline_control_points().copy()
+        coeffs[3] += 0.3
+        coeffs_list = [coeffs,
+                       self.psd_list[1].get_spline_control_points().copy()]
+        par_aux_new = ll_cls.update_psd_coeffs(par_aux, coeffs_list)
+        # Only the PSD of the first channel changed, on a sub-band
+        sn = ll_cls.get_auxiliary_params(par_aux)[1]
+        sn_new = ll_cls.get_auxiliary_params(par_aux_new)[1]
+        np.testing.assert_array_equal(sn_new[1], sn[1])
+        changed = sn_new[0] != sn[0]
+        self.assertTrue(0 < np.sum(changed) < changed.size)
+
+        # Same likelihood as a full recomputation with the new PSD
+        ll_ref = self.log_like(self.psd_list)
+        np.testing.assert_allclose(ll_cls.log_likelihood(self.par, par_aux_new),
+                                   ll_ref.log_likelihood(self.par, None),
+                                   rtol=1e-12)
+
+    def test_update_auxiliary_params(self):
+
+        # Refit of the PSD from the residuals, without imputation
+        ll_cls = self.log_like(self.psd_list)
+        par_aux_new = ll_cls.update_auxiliary_params(
+            self.par, ll_cls.par_aux, reduced=False, update_mis=False,
+            update_psd=True)
+        # Reference: full estimation of the PSD models
+        psd_ref = [copy.deepcopy(psd) for psd in self.psd_list]
+        y_gw_list = ll_cls.time_template(self.par)
+        [psd.estimate(x - y_gw) for psd, x, y_gw
+         in zip(psd_ref, self.data, y_gw_list)]
+        ll_ref = self.log_like(psd_ref)
+        np.testing.assert_allclose(
+            ll_cls.get_auxiliary_params(par_aux_new)[1],
+            ll_ref.get_auxiliary_params(None)[1], rtol=1e-10)
+        np.testing.assert_allclose(ll_cls.log_likelihood(self.par, par_aux_new),
+                                   ll_ref.log_likelihood(self.par, None),
+                                   rtol=1e-10)
+
+    def test_local_log_likelihood(self):
+
+        for support in [None, lambda par: (0.05, 0.2)]:
+            psd_list = [copy.deepcopy(psd) for psd in self.psd_list]
+            ll_cls = self.log_like(psd_list)
+            ll_cls.support_func = support
+            par_aux = np.copy(ll_cls.par_aux)
+            ll_old = ll_cls.log_likelihood(self.par, par_aux)
+            entry = ll_cls.template_entry(self.par, par_aux)
+            coeffs = psd_list[1].get_spline_control_points().copy()
+            coeffs[4] -= 0.2
+            intervals = psd_list[1].update_coeffs(coeffs)
+            # The stored log-PSD is updated on the modified intervals
+            np.testing.assert_allclose(
+                psd_list[1].logs,
+                psd_list[1].log_psd_fn(psd_list[1].logf[self.n_data]),
+                rtol=1e-14)
+            slices = ll_cls.frequency_slices(intervals)
+            local_old = ll_cls.interval_log_likelihood(entry, 1, slices)
+            par_aux_new = ll_cls.update_psd_intervals(
+                par_aux, [[], intervals], inplace=True)
+            self.assertIs(par_aux_new, par_aux)
+            local_new = ll_cls.interval_log_likelihood(entry, 1, slices)
+            # The local terms give the change of the full log-likelihood
+            ll_new = ll_cls.log_likelihood(self.par, par_aux)
+            np.testing.assert_allclose(local_new - local_old, ll_new - ll_old,
+                                       rtol=1e-8)
+            ll_ref = self.log_like(psd_list)
+            ll_ref.support_func = support
+            np.testing.assert_allclose(
+                ll_new, ll_ref.log_likelihood(self.par, None), rtol=1e-12)
+
+    def test_psd_coeff_step(self):
+
+        psd_list = [copy.deepcopy(psd) for psd in self.psd_list]
+        ll_cls = self.log_like(psd_list)
+        rng = np.random.default_rng(20)
+        # Frequencies where the PSD is recomputed
+        n_eval = []
+        calculate = psd_list[0].calculate
+
+        def calculate_count(f):
+            n_eval.append(np.size(f))
+            return calculate(f)
+
+        psd_list[0].calculate = calculate_count
+        n_coeffs = psd_list[0].get_spline_control_points().size
+        accepted = []
+        for step in range(40):
+            j = step % n_coeffs
+            n_eval.clear()
+            accepted.append(ll_cls.psd_coeff_step(self.par, 0, j, 0.05,
+                                                  rng=rng))
+            # Work restricted to the support of the basis function j
+            t = psd_list[0].log_psd_fn.t
+            f_sup = np.exp(t[[j, j + psd_list[0].D + 1]])
+            n_sup = np.sum((ll_cls.f_band >= f_sup[0])
+                           & (ll_cls.f_band <= f_sup[1]))
+            self.assertLessEqual(sum(n_eval), 2 * n_sup)
+        self.assertTrue(0 < np.sum(accepted) < len(accepted))
+        # Same state as a likelihood built from the final PSD models
+        ll_ref = self.log_like(psd_list)
+        np.testing.assert_allclose(
+            ll_cls.get_auxiliary_params(None)[1],
+            ll_ref.get_auxiliary_params(None)[1], rtol=1e-14)
+        np.testing.assert_allclose(ll_cls.log_likelihood(self.par, None),
+                                   ll_ref.log_likelihood(self.par, None),
+                                   rtol=1e-10)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
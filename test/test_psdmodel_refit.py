@@ -0,0 +1,197 @@
+import copy
+import unittest
+import numpy as np
+from bayesdawn import psdmodel
+
+
+def generate_fd_data(freq, psd, seed=None):
+
+    rng = np.random.default_rng(seed)
+    df = freq[1] - freq[0]
+    amp = np.sqrt(psd / (4 * df))
+
+    return amp * (rng.normal(size=freq.size) + 1j * rng.normal(size=freq.size))
+
+
+class TestModelFDDataPSDRefit(unittest.TestCase):
+
+    def test_refit(self):
+
+        freq = np.linspace(0, 0.5, 50001)
+        psd = 1e-40 * (1 + (1e-3 / np.maximum(freq, 1e-6)) ** 2)
+
+        for fit_type in ['logratio_spline', 'log_spline', 'spline']:
+            data1 = {'f': freq, 'A': generate_fd_data(freq, psd, seed=1)}
+            data2 = {'f': freq, 'A': generate_fd_data(freq, psd, seed=2)}
+            psd_cls = psdmodel.ModelFDDataPSD(data1, 'A', fit_type=fit_type,
+                                              noise_model=None, fit_dof=12)
+            psd_ref = psdmodel.ModelFDDataPSD(data2, 'A', fit_type=fit_type,
+                                              noise_model=None, fit_dof=12)
+            psd_cls.refit(data2)
+            # Refitting on new data must be equivalent to building a new model
+            np.testing.assert_allclose(psd_cls.psd_fn(psd_cls.fin),
+                                       psd_ref.psd_fn(psd_ref.fin), rtol=1e-5)
+            # Fixed-grid evaluator follows the refit
+            evaluate = psd_cls.grid_evaluator(psd_cls.fin)
+            psd_cls.refit(data1)
+            np.testing.assert_allclose(evaluate(), psd_cls.psd_fn(psd_cls.fin),
+                                       rtol=1e-12)
+            # A different grid of the same length cannot reuse the fit
+            data3 = {'f': freq * 1.01, 'A': data2['A']}
+            self.assertTrue(psd_cls.same_grid(data2['f']))
+            self.assertFalse(psd_cls.same_grid(data3['f']))
+            self.assertRaises(ValueError, psd_cls.refit, data3)
+
+
+class TestPSDSplineChannels(unittest.TestCase):
+
+    def test_estimate_channels(self):
+
+        n_data = 2 ** 16
+        rng = np.random.default_rng(3)
+        y = rng.normal(size=(3, n_data))
+        y[1] = np.cumsum(y[1]) * 1e-2 + y[0]
+
+        psd_cls = psdmodel.PSDSpline(n_data, 1.0, n_knots=15, fmin=1.05 / n_data)
+        psd_list = psd_cls.estimate_channels(y)
+
+        for i in range(y.shape[0]):
+            psd_ref = psdmodel.PSDSpline(n_data, 1.0, n_knots=15, fmin=1.05 / n_data)
+            psd_ref.estimate(y[i])
+            # The joint solve must give the same result as separate fits
+            np.testing.assert_allclose(psd_list[i].calculate(n_data),
+                                       psd_ref.calculate(n_data), rtol=1e-8)
+            np.testing.assert_allclose(psd_list[i].logsc, psd_ref.logsc,
+                                       atol=1e-8)
+
+        # Copies do not share the cache nor the values updated in place
+        psd_copy = copy.copy(psd_list[0])
+        self.assertIsNot(psd_copy.lsqr_cache, psd_list[0].lsqr_cache)
+        logs = psd_list[0].logs.copy()
+        coeffs = psd_copy.get_spline_control_points().copy()
+        coeffs[5] += 1.0
+        psd_copy.update_coeffs(coeffs)
+        np.testing.assert_array_equal(psd_list[0].logs, logs)
+        self.assertTrue(np.any(psd_copy.logs != logs))
+
+    def test_grid_cache(self):
+
+        n_data = 2 ** 12
+        rng = np.random.default_rng(7)
+        per = rng.exponential(size=(2, 500))
+        # Grids with the same size and endpoints
+        freq_lin = np.linspace(1e-3, 0.49, 500)
+        freq_log = np.logspace(-3, np.log10(0.49), 500)
+        freq_log[-1] = freq_lin[-1]
+
+        psd_cls = psdmodel.PSDSpline(n_data, 1.0, n_knots=10,
+                                     fmin=1.05 / n_data)
+        psd_cls.spline_lsqr_channels(per, freq=freq_lin)
+        spl_list = psd_cls.spline_lsqr_channels(per, freq=freq_log)
+        psd_ref = psdmodel.PSDSpline(n_data, 1.0, n_knots=10,
+                                     fmin=1.05 / n_data)
+        spl_ref = psd_ref.spline_lsqr_channels(per, freq=freq_log)
+        self.assertEqual(len(psd_cls.lsqr_cache), 2)
+        for spl, ref in zip(spl_list, spl_ref):
+            np.testing.assert_allclose(spl.get_coeffs(), ref.get_coeffs(),
+                                       rtol=1e-12)
+
+
+class TestPSDSplineUpdateCoeffs(unittest.TestCase):
+
+    def test_intervals(self):
+
+        n_data = 2 ** 14
+        rng = np.random.default_rng(5)
+        psd_cls = psdmodel.PSDSpline(n_data, 1.0, n_knots=15, fmin=1.05 / n_data)
+        psd_cls.estimate(rng.normal(size=n_data))
+        freq = np.fft.rfftfreq(n_data)[1:]
+        psd_0 = psd_cls.calculate(freq)
+
+        coeffs = psd_cls.get_spline_control_points().copy()
+        coeffs[[4, 10]] += 0.5
+        intervals = psd_cls.update_coeffs(coeffs)
+        psd_1 = psd_cls.calculate(freq)
+        # The PSD only changes within the reported intervals
+        inside = np.zeros(freq.size, dtype=bool)
+        for f_low, f_high in intervals:
+            inside |= (freq >= f_low) & (freq <= f_high)
+        self.assertEqual(len(intervals), 2)
+        np.testing.assert_array_equal(psd_1[~inside], psd_0[~inside])
+        self.assertTrue(np.all(psd_1[inside] != psd_0[inside]))
+
+
+class TestLogBinPeriodogram(unittest.TestCase):
+
+    def test_bias_variance(self):
+
+        n_data = 2 ** 14
+        n_rep = 200
+        rng = np.random.default_rng(3)
+        w = np.hanning(n_data)
+        freq = np.fft.fftfreq(n_data)[1:n_data // 2]
+        x = rng.normal(size=(n_rep, n_data))
+        per = np.abs(np.fft.fft(x * w, axis=1)) ** 2 / np.sum(w ** 2)
+        f_bin, per_bin, n_avg = psdmodel.log_bin_periodogram(
+            freq, per[:, 1:n_data // 2], n_bins=40)
+        rho = psdmodel.periodogram_bin_correlation(w)
+        n_eff = psdmodel.effective_n_avg(n_avg, rho=rho)
+        np.testing.assert_allclose(rho[0:3], [1, 4 / 9, 1 / 36], atol=1e-3)
+
+        # Mean and variance of the log-binned periodogram of white noise
+        log_per = np.log(per_bin)
+        var = psdmodel.log_periodogram_variance(n_eff)
+        sel = n_avg >= 10
+        err = np.mean(log_per, axis=0) - psdmodel.log_periodogram_bias(n_eff)
+        self.assertLess(np.max(np.abs(err[sel]) / np.sqrt(var[sel] / n_rep)), 
+                        4)
+        ratio = np.var(log_per, axis=0)[sel] / var[sel]
+        self.assertLess(np.abs(np.mean(ratio) - 1), 0.1)
+        # Independent bins are overconfident by the sum of correlations
+        ratio_indep = np.var(log_per, axis=0)[sel] / \
+            psdmodel.log_periodogram_variance(n_avg[sel])
+        self.assertGreater(np.mean(ratio_indep), 1.5)
+
+
+class TestNewtonRaphsonBanded(unittest.TestCase):
+
+    def test_banded(self):
+
+        rng = np.random.default_rng(17)
+        n_data = 2 ** 12
+        freq = np.fft.rfftfreq(n_data)[1:]
+        psd = 1 + 0.5 * np.cos(6 * freq) + (1e-2 / freq)
+        per = psd * rng.exponential(size=freq.size)
+        knots = np.linspace(freq[0], freq[-1], 12)[1:-1]
+        a_mat = psdmodel.bspline_matrix(freq, knots, 3)
+        # Least-squares starting point
+        beta_0 = np.linalg.lstsq(a_mat.toarray(), per, rcond=None)[0]
+
+        hess_dense = psdmodel.spline_loglike_hessian(beta_0, per, a_mat)
+        hess_banded = psdmodel.spline_loglike_hessian_banded(beta_0, per,
+                                                             a_mat, 3)
+        np.testing.assert_allclose(
+            hess_banded, psdmodel.sparse_to_banded(
+                psdmodel.sparse.coo_matrix(hess_dense), 3, 3), rtol=1e-12)
+
+        def grad_func(beta):
+            return psdmodel.spline_loglike_grad(beta, per, a_mat)
+
+        beta_dense = psdmodel.newton_raphson(
+            beta_0, grad_func,
+            lambda beta: psdmodel.spline_loglike_hessian(beta, per, a_mat),
+            tol=1e-10)
+        beta_banded = psdmodel.newton_raphson(
+            beta_0, grad_func,
+            lambda beta: psdmodel.spline_loglike_hessian_banded(beta, per,
+                                                                a_mat, 3),
+            tol=1e-10, bands=(3, 3))
+        np.testing.assert_allclose(beta_banded, beta_dense, rtol=1e-8)
+        # The maximum likelihood improves on the least-squares start
+        self.assertGreater(psdmodel.spline_loglike(beta_banded, per, a_mat),
+                           psdmodel.spline_loglike(beta_0, per, a_mat))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from bayesdawn import psdsampler
+
+
+class TestPSDSamplerSegments(unittest.TestCase):
+
+    def test_segment_likelihood(self):
+
+        n_data = 2 ** 14
+        rng = np.random.default_rng(20)
+        wind = np.hanning(n_data)
+        z_fft = np.fft.fft(rng.normal(size=n_data) * wind)
+        k2 = np.sum(wind ** 2)
+
+        for n_bins in [None, 50]:
+            psd_cls = psdsampler.PSDSampler(n_data, 1.0, n_knots=12,
+                                            n_bins=n_bins)
+            x = rng.normal(size=psd_cls.logfc.size) * 0.1
+            psd_cls.set_periodogram(z_fft, K2=k2, wind=wind)
+            ll_ref = psd_cls.psd_likelihood(x)
+            # A list with a single segment gives the same likelihood
+            psd_cls.set_periodogram([z_fft], K2=k2, wind=wind)
+            np.testing.assert_allclose(psd_cls.psd_likelihood(x), ll_ref,
+                                       rtol=1e-12)
+            # Segments of different sizes are each binned and weighted
+            z_half = np.fft.fft(rng.normal(size=n_data // 2)
+                                * np.hanning(n_data // 2))
+            psd_cls.set_periodogram([z_fft, z_half], K2=k2, wind=wind)
+            ll_seg = psd_cls.psd_likelihood(x)
+            psd_cls.set_periodogram([z_half], K2=k2, wind=wind)
+            np.testing.assert_allclose(ll_seg - psd_cls.psd_likelihood(x),
+                                       ll_ref, rtol=1e-12)
+            if n_bins is not None:
+                self.assertTrue(all(f.size <= n_bins
+                                    for f in psd_cls.logf_bin))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+def chirp(par, freq, f_low=2e-4):
+
+    amp, tc, phi0 = par
+    f = np.maximum(freq, f_low)
+    h = amp * (f / 1e-3) ** (-7 / 6) * np.exp(
+        -1j * (2 * np.pi * f * tc + phi0 + 0.1 * (f / 1e-3) ** (-5 / 3)))
+    # The template starts inside the band
+    h[freq < f_low] = 0
+
+    return [h, 0.7j * h]
+
+
+class TestRelativeBinningLogLike(unittest.TestCase):
+
+    def test_log_likelihood(self):
+
+        n_data = 2 ** 14
+        del_t = 5.0
+        rng = np.random.default_rng(10)
+        data = [rng.normal(size=n_data) for i in range(2)]
+        freq = np.fft.fftfreq(n_data) / del_t
+        inds = np.where((freq >= 1e-4) & (freq <= 5e-2))[0]
+        sn = [np.ones(inds.size)] * 2
+        par_fid = np.array([100.0, 3e4, 0.3])
+
+        kwargs = {'psd_cls': [PSD(), PSD()]}
+        ll_full = likelihoodmodel.LogLike(data, sn, inds, n_data * del_t,
+                                          del_t, chirp, None, **kwargs)
+        ll_rb = likelihoodmodel.RelativeBinningLogLike(
+            data, sn, inds, n_data * del_t, del_t, chirp, None, par_fid,
+            eps=0.05, **kwargs)
+        # The bins are restricted to the support of the fiducial waveform
+        self.assertGreaterEqual(ll_rb.f_edges[0], 2e-4)
+
+        for par in [par_fid, par_fid * np.array([1.1, 1.001, 1.5])]:
+            ll_ref = ll_full.log_likelihood(par, None)
+            ll = ll_rb.log_likelihood(par, None)
+            self.assertTrue(np.isfinite(ll))
+            np.testing.assert_allclose(ll, ll_ref, rtol=1e-4)
+
+        # No bins are left if the fiducial waveform vanishes on the band
+        with self.assertRaises(ValueError):
+            likelihoodmodel.RelativeBinningLogLike(
+                data, sn, inds, n_data * del_t, del_t, chirp, None,
+                np.zeros(3), **kwargs)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
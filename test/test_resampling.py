@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from scipy import interpolate
+from bayesdawn.waveforms import lisaresp
+
+
+def lisabeta_output(fs, seed):
+
+    rng = np.random.default_rng(seed)
+    wftdi = {'freq': fs,
+             'amp': 1e-20 * (fs / 1e-3) ** (-7 / 6),
+             'phase': 2 * np.pi * 1e4 * fs + rng.normal()}
+    for i in [1, 2, 3]:
+        wftdi['transferL' + str(i)] = (1 + rng.normal()) * np.exp(
+            2j * np.pi * fs * 10 * i)
+
+    return wftdi
+
+
+class TestResamplingGrid(unittest.TestCase):
+
+    def test_resample(self):
+
+        freq = np.arange(0, 2 ** 12) * 1e-5
+        grid = lisaresp.ResamplingGrid(freq)
+        # Grids starting at zero frequency keep the lisabeta frequency floor
+        self.assertEqual(grid.band()[0], 1e-5)
+        self.assertIs(lisaresp.resampling_grid(freq),
+                      lisaresp.resampling_grid(freq.copy()))
+
+        # Two responses on the same native grid and one on another grid
+        fs1 = np.logspace(np.log10(2e-4), np.log10(3e-2), 300)
+        fs2 = np.logspace(np.log10(1e-4), np.log10(2e-2), 250)
+        wftdi_list = [lisabeta_output(fs1, 0), lisabeta_output(fs1, 1),
+                      lisabeta_output(fs2, 2)]
+        channels = [1, 2, 3]
+        signal_list = grid.resample(wftdi_list, channels)
+
+        # The amplitude and phase are those of the first response, and all
+        # arrays vanish outside their native range
+        fs = wftdi_list[0]['freq']
+        amp = interpolate.CubicSpline(fs, wftdi_list[0]['amp'])(freq)
+        phase = interpolate.CubicSpline(fs, wftdi_list[0]['phase'])(freq)
+        h = np.where((freq >= fs[0]) & (freq <= fs[-1]),
+                     amp * np.exp(1j * phase), 0)
+        for wftdi, signal in zip(wftdi_list, signal_list):
+            fs = wftdi['freq']
+            inside = (freq >= fs[0]) & (freq <= fs[-1])
+            for i in channels:
+                tr = wftdi['transferL' + str(i)]
+                tr_int = interpolate.CubicSpline(fs, tr.real)(freq) + \
+                    1j * interpolate.CubicSpline(fs, tr.imag)(freq)
+                ch_ref = h * np.where(inside, tr_int, 0)
+                np.testing.assert_allclose(signal['ch' + str(i)], ch_ref,
+                                           rtol=1e-12, atol=1e-32)
+
+    def test_phasor(self):
+
+        delay = 1234.5
+        freq_uniform = 1e-4 + np.arange(10001) * 1e-6
+        freq_log = np.logspace(-4, -2, 1000)
+        for freq in [freq_uniform, freq_log]:
+            grid = lisaresp.ResamplingGrid(freq)
+            np.testing.assert_allclose(grid.phasor(delay),
+                                       np.exp(-2j * np.pi * freq * delay),
+                                       rtol=0, atol=1e-10)
+        self.assertTrue(lisaresp.ResamplingGrid(freq_uniform).uniform)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
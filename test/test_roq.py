@@ -0,0 +1,119 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+from bayesdawn.algebra import matrixalgebra
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+def design_matrix(par_intr, freq):
+
+    tc, beta = par_intr
+    f = freq / 1e-3
+    h = f ** (-7 / 6) * np.exp(-1j * (2 * np.pi * freq * tc
+                                      + beta * f ** (-5 / 3)))
+    mat = np.array([h, h * np.exp(-1j * 0.2 * f ** (1 / 3))]).T
+
+    return [mat, 0.7j * mat * (1 + 0.1 * f)[:, np.newaxis]]
+
+
+def signal(par, freq):
+
+    amps = par[2:4] + 1j * par[4:6]
+
+    return [mat.dot(amps) for mat in design_matrix(par[0:2], freq)]
+
+
+def signal_reduced(par_intr, freq, data_dft, sn):
+
+    mat_list = design_matrix(par_intr, freq)
+
+    return [mat.dot(matrixalgebra.gls(d, mat, s))
+            for d, mat, s in zip(data_dft, mat_list, sn)]
+
+
+class TestEmpiricalInterpolation(unittest.TestCase):
+
+    def test_interpolation(self):
+
+        freq = np.linspace(1e-4, 1e-2, 5000)
+        rng = np.random.default_rng(4)
+        tc = rng.uniform(900, 1100, size=200)
+        training = np.exp(2j * np.pi * freq[np.newaxis, :] * tc[:, np.newaxis])
+
+        basis = matrixalgebra.greedy_basis(training, tol=1e-14)
+        nodes, interp = matrixalgebra.empirical_interpolation(basis)
+        # Waveforms outside the training set are recovered from the nodes
+        h = np.exp(2j * np.pi * freq * 1003.7)
+        np.testing.assert_allclose(h[nodes].dot(interp), h, atol=1e-5)
+
+        # Basis built from successive chunks of the training set
+        basis_chunks = None
+        for train in np.split(training, 10):
+            basis_chunks = matrixalgebra.greedy_basis(train, tol=1e-14,
+                                                      basis=basis_chunks)
+        np.testing.assert_allclose(
+            basis_chunks.dot(basis_chunks.conj().T),
+            np.eye(basis_chunks.shape[0]), rtol=0, atol=1e-12)
+        nodes, interp = matrixalgebra.empirical_interpolation(basis_chunks)
+        np.testing.assert_allclose(h[nodes].dot(interp), h, atol=1e-5)
+
+
+class TestROQLogLike(unittest.TestCase):
+
+    def test_log_likelihood(self):
+
+        n_data = 2 ** 14
+        del_t = 5.0
+        rng = np.random.default_rng(12)
+        freq = np.fft.fftfreq(n_data) / del_t
+        inds = np.where((freq >= 1e-4) & (freq <= 2e-2))[0]
+        sn = [np.ones(inds.size)] * 2
+        lo = np.array([1000.0, 0.05])
+        hi = np.array([1100.0, 0.15])
+        par_true = np.array([1050.0, 0.1, 20.0, -10.0, 5.0, 15.0])
+        # Noisy data containing the signal
+        data = []
+        for h in signal(par_true, freq[inds]):
+            h_rfft = np.zeros(n_data // 2 + 1, dtype=np.complex128)
+            h_rfft[inds] = h / del_t
+            data.append(np.fft.irfft(h_rfft, n_data)
+                        + rng.normal(size=n_data))
+
+        roq = likelihoodmodel.build_roq_bases(design_matrix, freq[inds], lo,
+                                              hi, n_train=100, tol=1e-12,
+                                              rng=rng)
+        # The quadratic interpolant is real, so that it represents the
+        # products conj(M_k) M_l in both orders
+        self.assertTrue(np.isrealobj(roq['interp_quad']))
+        self.assertLess(len(roq['nodes_lin']), inds.size // 10)
+        # The products of the toy design do not depend on the parameters
+        self.assertLessEqual(len(roq['nodes_quad']), 6)
+
+        kwargs = {'psd_cls': [PSD(), PSD()]}
+        ll_full = likelihoodmodel.LogLike(data, sn, inds, n_data * del_t,
+                                          del_t, signal, signal_reduced,
+                                          **kwargs)
+        ll_roq = likelihoodmodel.ROQLogLike(data, sn, inds, n_data * del_t,
+                                            del_t, signal, signal_reduced,
+                                            design_matrix, roq, **kwargs)
+        for par in [par_true, np.array([1020.0, 0.07, 3.0, 1.0, -2.0, 0.5])]:
+            np.testing.assert_allclose(ll_roq.log_likelihood(par, None),
+                                       ll_full.log_likelihood(par, None),
+                                       rtol=0, atol=1e-5)
+            np.testing.assert_allclose(
+                ll_roq.log_likelihood_reduced(par[0:2], None),
+                ll_full.log_likelihood_reduced(par[0:2], None), rtol=0,
+                atol=1e-5)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
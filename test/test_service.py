@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from bayesdawn.waveforms import service
+
+
+def gaussian_signal(par, freq, width=0.01):
+
+    h = par[0] * np.exp(-0.5 * ((freq - par[1]) / width) ** 2 + 1j * par[2])
+
+    return [h, 0.5 * h]
+
+
+class TestWaveformService(unittest.TestCase):
+
+    def test_compute_batch(self):
+
+        rng = np.random.default_rng(7)
+        freq = np.linspace(0, 0.5, 1001)
+        pars = np.column_stack([rng.uniform(0, 3, 50),
+                                rng.uniform(0.05, 0.3, 50),
+                                rng.uniform(0, 6, 50)])
+        signals_ref = np.array([gaussian_signal(par, freq) for par in pars])
+
+        with service.WaveformService(gaussian_signal, freq, 2, 3,
+                                     n_workers=2, max_batch=16,
+                                     cost_func=lambda par: par[1]) as srv:
+            # Templates are returned in the input order, whatever the
+            # dispatching order and the number of passes
+            signals = srv.compute_batch(pars)
+            np.testing.assert_array_equal(signals, signals_ref)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
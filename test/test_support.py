@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+width = 0.002
+
+
+def signal(par, freq):
+
+    if freq.size == 0:
+        raise ValueError("Empty frequency vector.")
+    h = par[0] * np.exp(- 0.5 * ((freq - par[1]) / width) ** 2)
+    # Compact support
+    h[np.abs(freq - par[1]) > 8 * width] = 0
+
+    return [h, 0.5 * h]
+
+
+def support(par):
+
+    return par[1] - 8 * width, par[1] + 8 * width
+
+
+class TestTemplateSupport(unittest.TestCase):
+
+    def test_log_likelihood(self):
+
+        n_data = 2 ** 12
+        rng = np.random.default_rng(11)
+        data = [rng.normal(size=n_data) for i in range(2)]
+        freq = np.fft.fftfreq(n_data)
+        inds = np.where((freq > 0.02) & (freq < 0.3))[0]
+        sn = [1 + freq[inds]] * 2
+        kwargs = {'psd_cls': [PSD(), PSD()], 'normalized': True}
+        ll_full = likelihoodmodel.LogLike(data, sn, inds, n_data, 1.0,
+                                          signal, None, **kwargs)
+        ll_sup = likelihoodmodel.LogLike(data, sn, inds, n_data, 1.0,
+                                         signal, None, support_func=support,
+                                         **kwargs)
+
+        # Templates inside the band and crossing its edges
+        pars = np.array([[1.0, 0.1], [2.0, 0.021], [0.5, 0.299]])
+        for par in pars:
+            np.testing.assert_allclose(ll_sup.log_likelihood(par, None),
+                                       ll_full.log_likelihood(par, None),
+                                       rtol=1e-12)
+        # Template outside the band: no waveform is computed
+        self.assertEqual(ll_sup.log_likelihood(np.array([1.0, 0.4]), None),
+                         np.real(ll_sup.ll_norm))
+        pars = np.vstack([pars, [1.0, 0.4]])
+        np.testing.assert_allclose(ll_sup.log_likelihood_batch(pars),
+                                   ll_full.log_likelihood_batch(pars),
+                                   rtol=1e-12)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+from bayesdawn import likelihoodmodel
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+class CountingWaveform(object):
+
+    def __init__(self):
+        self.n_calls = 0
+        self.n_calls_reduced = 0
+
+    def signal(self, par, freq):
+
+        self.n_calls += 1
+        amp, tc = par
+        h = amp * np.exp(-2j * np.pi * freq * tc)
+
+        return [h, 0.5 * h]
+
+    def signal_reduced(self, par_intr, freq, data_dft, sn):
+
+        self.n_calls_reduced += 1
+        h = np.exp(-2j * np.pi * freq * par_intr[0])
+        # Amplitude maximizing the likelihood, which depends on the data and
+        # the PSD
+        amp = np.sum(np.real(np.conj(h) * data_dft[0]) / sn[0]) / np.sum(
+            np.abs(h) ** 2 / sn[0])
+
+        return [amp * h, 0.5 * amp * h]
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+
+        n_data = 2 ** 10
+        rng = np.random.default_rng(4)
+        self.data = [rng.normal(size=n_data) for i in range(2)]
+        freq = np.fft.fftfreq(n_data)
+        self.inds = np.where((freq > 0.01) & (freq < 0.3))[0]
+        self.sn = [np.ones(self.inds.size)] * 2
+        self.n_data = n_data
+        self.wf = CountingWaveform()
+
+    def log_like(self, sn, template_cache_size):
+
+        return likelihoodmodel.LogLike(
+            self.data, sn, self.inds, self.n_data, 1.0, self.wf.signal,
+            self.wf.signal_reduced, psd_cls=[PSD(), PSD()],
+            template_cache_size=template_cache_size)
+
+    def test_hit_and_eviction(self):
+
+        ll_cls = self.log_like(self.sn, 2)
+        pars = [np.array([1.0, 10.0]), np.array([2.0, 20.0]),
+                np.array([3.0, 30.0])]
+        ll_ref = [ll_cls.log_likelihood(par, None) for par in pars]
+        self.assertEqual(self.wf.n_calls, 3)
+        # The two most recent templates are reused
+        ll = [ll_cls.log_likelihood(par, None) for par in pars[:0:-1]]
+        self.assertEqual(self.wf.n_calls, 3)
+        self.assertEqual(ll, ll_ref[:0:-1])
+        # The least recently used template was discarded
+        self.assertEqual(ll_cls.log_likelihood(pars[0], None), ll_ref[0])
+        self.assertEqual(self.wf.n_calls, 4)
+
+    def test_invalidation(self):
+
+        ll_cls = self.log_like(self.sn, 4)
+        par_intr = np.array([12.0])
+        ll0 = ll_cls.log_likelihood_reduced(par_intr, None)
+        self.assertEqual(ll_cls.log_likelihood_reduced(par_intr, None), ll0)
+        self.assertEqual(self.wf.n_calls_reduced, 1)
+
+        # A PSD change invalidates the reduced templates
+        sn_new = [1 + np.linspace(0, 1, self.inds.size)] * 2
+        par_aux = np.copy(ll_cls.par_aux)
+        data_dft, sn = ll_cls.get_auxiliary_params(par_aux)
+        sn[:] = sn_new
+        ll = ll_cls.log_likelihood_reduced(par_intr, par_aux)
+        self.assertEqual(self.wf.n_calls_reduced, 2)
+        ll_ref = self.log_like(sn_new, 0).log_likelihood_reduced(par_intr,
+                                                                 None)
+        self.assertAlmostEqual(ll, ll_ref, places=10)
+        # Going back to the initial PSD requires a new template as well
+        self.assertEqual(ll_cls.log_likelihood_reduced(par_intr, None), ll0)
+        self.assertEqual(self.wf.n_calls_reduced, 4)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
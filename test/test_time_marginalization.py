@@ -0,0 +1,127 @@
+import unittest
+import numpy as np
+from scipy import special
+from bayesdawn import likelihoodmodel
+from bayesdawn.algebra import matrixalgebra
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+def chirp(par, freq, tc_sign=1):
+
+    amp, phi0, tc = par
+    h = amp * (freq / 0.1) ** (-7 / 6) * np.exp(
+        -1j * tc_sign * (2 * np.pi * freq * tc + phi0 
+                         + 0.3 * (freq / 0.1) ** (-5 / 3)))
+
+    return [h, 0.7j * h]
+
+
+def design_matrix(par_intr, freq):
+
+    return [h[:, np.newaxis] for h in chirp([1.0, 0.0, par_intr[0]], freq)]
+
+
+def signal_reduced(par_intr, freq, data_dft, sn):
+
+    mat_list = design_matrix(par_intr, freq)
+
+    return [mat.dot(matrixalgebra.gls(d, mat, s))
+            for d, mat, s in zip(data_dft, mat_list, sn)]
+
+
+class TestTimeMarginalizedLogLike(unittest.TestCase):
+
+    def test_log_likelihood_grid(self):
+
+        n_data = 2 ** 12
+        rng = np.random.default_rng(12)
+        freq = np.fft.fftfreq(n_data)
+        inds = np.where((freq >= 0.02) & (freq <= 0.3))[0]
+        sn = [1 + freq[inds]] * 2
+        kwargs = {'psd_cls': [PSD(), PSD()], 'normalized': True}
+        par = np.array([20.0, 0.4])
+
+        for tc_sign in [1, -1]:
+            noise = [rng.normal(size=n_data) for i in range(2)]
+            ll_full = likelihoodmodel.LogLike(
+                noise, sn, inds, n_data, 1.0, chirp, None,
+                signal_kwargs={'tc_sign': tc_sign}, **kwargs)
+            # Data containing a signal within the prior
+            signal = ll_full.compute_signal(np.append(par, 1234.0))
+            data = [n + ll_full.frequency_to_time(h) 
+                    for n, h in zip(noise, signal)]
+            ll_full = likelihoodmodel.LogLike(
+                data, sn, inds, n_data, 1.0, chirp, None,
+                signal_kwargs={'tc_sign': tc_sign}, **kwargs)
+            ll_cls = likelihoodmodel.TimeMarginalizedLogLike(
+                data, sn, inds, n_data, 1.0, chirp, None, [1000.0, 1500.0],
+                tc_sign=tc_sign, signal_kwargs={'tc_sign': tc_sign}, **kwargs)
+            ll_grid = ll_cls.log_likelihood_grid(par, None)
+            self.assertEqual(ll_grid.shape, ll_cls.tc_grid.shape)
+            ll_ref = [ll_full.log_likelihood(np.append(par, tc), None)
+                      for tc in ll_cls.tc_grid]
+            np.testing.assert_allclose(ll_grid, ll_ref, rtol=1e-10)
+            # The maximum is at the injected coalescence time
+            self.assertLess(np.abs(ll_cls.tc_grid[np.argmax(ll_grid)] 
+                                   - 1234.0), 1.0)
+
+    def test_marginalization(self):
+
+        n_data = 2 ** 12
+        rng = np.random.default_rng(13)
+        freq = np.fft.fftfreq(n_data)
+        inds = np.where((freq >= 0.02) & (freq <= 0.3))[0]
+        sn = [1 + freq[inds]] * 2
+        kwargs = {'psd_cls': [PSD(), PSD()], 'normalized': True}
+        par = np.array([20.0, 0.4])
+        tc_0 = 1234.3
+
+        noise = [rng.normal(size=n_data) for i in range(2)]
+        ll_full = likelihoodmodel.LogLike(noise, sn, inds, n_data, 1.0, chirp,
+                                          signal_reduced, **kwargs)
+        signal = ll_full.compute_signal(np.append(par, tc_0))
+        data = [n + ll_full.frequency_to_time(h)
+                for n, h in zip(noise, signal)]
+        ll_full = likelihoodmodel.LogLike(data, sn, inds, n_data, 1.0, chirp,
+                                          signal_reduced, **kwargs)
+        ll_cls = likelihoodmodel.TimeMarginalizedLogLike(
+            data, sn, inds, n_data, 1.0, chirp, None, [1000.0, 1500.0],
+            **kwargs)
+        ll_red = likelihoodmodel.TimeMarginalizedLogLike(
+            data, sn, inds, n_data, 1.0, chirp, None, [1000.0, 1500.0],
+            i_tc=0, design_matrix_func=design_matrix, **kwargs)
+        # Numerical integral over a fine time grid around the peak, the
+        # likelihood being negligible elsewhere
+        dt = 1 / (ll_cls.n_fft * ll_cls.df)
+        log_prior = - np.log(ll_cls.tc_grid.size * dt)
+        tcs = np.arange(tc_0 - 5, tc_0 + 5, dt / 100)
+        ll_refs = []
+        for ll_tc, marginal in [
+                (lambda tc: ll_full.log_likelihood(np.append(par, tc), None),
+                 ll_cls.log_likelihood(par, None)),
+                (lambda tc: ll_full.log_likelihood_reduced([tc], None),
+                 ll_red.log_likelihood_reduced([], None))]:
+            ll = np.array([ll_tc(tc) for tc in tcs])
+            self.assertGreater(np.max(ll) - max(ll[0], ll[-1]), 100)
+            ll_refs.append(special.logsumexp(ll) + np.log(dt / 100) 
+                           + log_prior)
+            np.testing.assert_allclose(marginal, ll_refs[-1], rtol=0, 
+                                       atol=1e-6)
+        # The oscillations of the likelihood peak are narrower than the grid
+        # spacing, so that the sum over the grid alone is inaccurate
+        ll_grid = ll_cls.log_likelihood_grid(par, None)
+        self.assertGreater(np.abs(special.logsumexp(ll_grid) 
+                                  - np.log(ll_grid.size) - ll_refs[0]), 1.0)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
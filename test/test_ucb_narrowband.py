@@ -0,0 +1,121 @@
+import unittest
+import numpy as np
+from scipy.constants import year
+from bayesdawn import likelihoodmodel
+from bayesdawn.waveforms import lisaresp, wavefuncs
+
+
+class PSD(object):
+
+    def estimate(self, x, wind=None):
+        pass
+
+    def calculate(self, f):
+        return np.ones(len(f))
+
+
+class TestUCBNarrowband(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tobs = year
+        self.del_t = 60.0
+        self.n_data = int(self.tobs / self.del_t)
+        # Frequency off the Fourier bins, so that the leakage is maximal
+        self.f_0 = 3e-3 + 0.37 / self.tobs
+        self.params = np.array([1e-21, 0.5, 0.3, 0.2, 1.2, 0.7, self.f_0, 0])
+        i_0 = int(self.f_0 * self.n_data * self.del_t)
+        self.inds = np.arange(i_0 - 6000, i_0 + 6000)
+
+    def check_log_likelihood(self, signal, narrowband, signal_args):
+
+        freq = self.inds / (self.n_data * self.del_t)
+        df = 1 / (self.n_data * self.del_t)
+        # PSD of a white noise of unit variance
+        sn = 2 * self.del_t * np.ones(self.inds.size)
+        h = np.array(signal(self.params, freq, *signal_args))
+        # Noiseless injection at SNR 20, so that the likelihood difference
+        # is the bias due to the energy lost outside the support
+        snr = np.sqrt(4 * df * np.sum(np.abs(h) ** 2 / sn))
+        params = np.copy(self.params)
+        params[0] *= 20 / snr
+        data = []
+        for h_ch in h * 20 / snr:
+            h_rfft = np.zeros(self.n_data // 2 + 1, dtype=np.complex128)
+            h_rfft[self.inds] = h_ch / self.del_t
+            data.append(np.fft.irfft(h_rfft, self.n_data))
+
+        kwargs = {'signal_args': signal_args,
+                  'psd_cls': [PSD()] * len(data)}
+        ll_full = likelihoodmodel.LogLike(data, [sn] * len(data), self.inds,
+                                          self.tobs, self.del_t, signal,
+                                          None, **kwargs)
+        ll_nb = likelihoodmodel.LogLike(data, [sn] * len(data), self.inds,
+                                        self.tobs, self.del_t, signal,
+                                        None, narrowband_func=narrowband,
+                                        **kwargs)
+        pars = np.array([params, params + np.array(
+            [0, 0, 0.5, 0, 0, 0, 0.2 / self.tobs, 0])])
+        for par in pars:
+            self.assertLess(np.abs(ll_nb.log_likelihood(par, None)
+                                   - ll_full.log_likelihood(par, None)),
+                            0.03)
+
+        # A few bins of support would miss a significant part of the energy
+        def narrowband_short(par, *args):
+            return narrowband(par, *args, n_bins=4)
+
+        ll_short = likelihoodmodel.LogLike(data, [sn] * len(data), self.inds,
+                                           self.tobs, self.del_t, signal,
+                                           None,
+                                           narrowband_func=narrowband_short,
+                                           **kwargs)
+        self.assertGreater(np.abs(ll_short.log_likelihood(params, None)
+                                  - ll_full.log_likelihood(params, None)),
+                           1.0)
+
+    def test_ucb_waveform(self):
+
+        wave = lisaresp.UCBWaveform(wavefuncs.v_func_gb)
+
+        def signal(par, freq, del_t, tobs):
+            return wave.compute_signal_freq(freq, par, del_t, tobs)
+
+        self.check_log_likelihood(signal, wave.narrowband_signal,
+                                  [self.del_t, self.tobs])
+
+        # Design matrices on the same bins
+        i_start, mat_list = wave.narrowband_design_matrix(
+            self.params[4:], self.del_t, self.tobs)
+        f_min, f_max = wave.frequency_support(self.params[4:], self.tobs)
+        freq = np.arange(i_start, i_start + mat_list[0].shape[0]) * (
+            1 / self.tobs)
+        self.assertTrue((freq[0] >= f_min) & (freq[-1] <= f_max))
+        self.assertLess(f_max - f_min,
+                        2 * (lisaresp.leakage_bins(1e-4) + 60) / self.tobs)
+        mat_ref = wave.design_matrix_freq(freq, self.params[4:], self.del_t,
+                                          self.tobs)
+        for mat, ref in zip(mat_list, mat_ref):
+            np.testing.assert_allclose(mat, ref, rtol=1e-14)
+
+    def test_ucb_waveform_full(self):
+
+        wave = lisaresp.UCBWaveformFull(wavefuncs.v_func_gb_mono, self.del_t,
+                                        self.tobs, nc=2 ** 6)
+
+        def signal(par, freq):
+            return wave.compute_signal_freq(freq, par)
+
+        self.check_log_likelihood(signal, wave.narrowband_signal, [])
+
+        i_start, mat_list = wave.narrowband_design_matrix(self.params[4:])
+        freq = np.arange(i_start, i_start + mat_list[0].shape[0]) * (
+            1 / self.tobs)
+        mat_ref = wave.design_matrix_freq(freq, self.params[4:])
+        for mat, ref in zip(mat_list, mat_ref):
+            np.testing.assert_allclose(mat, ref, rtol=1e-14)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
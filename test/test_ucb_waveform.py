@@ -0,0 +1,119 @@
+import unittest
+import numpy as np
+from scipy import special
+from scipy.constants import c, year
+from bayesdawn.waveforms import lisaresp, wavefuncs
+
+
+def u_matrices_loop(wave, f, params, ts, t_end, derivative=2):
+    """Bessel decomposition computed one harmonic at a time."""
+
+    theta, phi, f_0, f_dot = params
+    d0 = wave.R * np.sin(theta) / c
+    varphi = phi + np.pi / 2
+    v_minus_list = [wave.v_func(-f + k * wave.f_t, f_0, f_dot, t_end, ts)
+                    for k in range(-wave.nc - wave.m_max,
+                                   wave.nc + wave.m_max + 1)]
+    n_vect = np.arange(-wave.nc, wave.nc + 1)
+    e_vect = np.exp(1j * n_vect * varphi)
+    jw = [special.jv(n, 2 * np.pi * f_0 * d0) for n in n_vect]
+    u = [wave.bessel_decomp_pos(v_minus_list, jw, e_vect, n_vect, m)
+         for m in - wave.m_vect]
+    u.extend([u[0]])
+    u.extend([wave.bessel_decomp_pos(v_minus_list, jw, e_vect, n_vect, m)
+              for m in wave.m_vect[1:]])
+
+    return np.transpose(u * np.array([(2 * np.pi * 1j * f) ** derivative]))
+
+
+class TestUCBWaveform(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tobs = year / 4
+        self.del_t = 15.0
+        self.params = np.array([1.2, 0.7, 3e-3, 0.0])
+        self.f = self.params[2] + np.arange(-60, 61) / self.tobs + 1e-9
+
+    def test_u_matrices(self):
+
+        wave = lisaresp.UCBWaveform(wavefuncs.v_func_gb)
+        u_ref = u_matrices_loop(wave, self.f, self.params, self.del_t,
+                                self.tobs)
+        np.testing.assert_allclose(
+            wave.u_matrices(self.f, self.params, self.del_t, 0, self.tobs),
+            u_ref, rtol=1e-12, atol=1e-12 * np.max(np.abs(u_ref)))
+
+        # Design matrices of all channels in one product
+        for channel in ['TDIAET', 'phasemeters']:
+            k_p, k_c, pre, der = wave.compute_response_coeffs(self.params,
+                                                              channel)
+            uc = u_matrices_loop(wave, self.f, self.params, self.del_t,
+                                 self.tobs, derivative=der)
+            mat_ref = [pre * wave.single_design_matrix_freq(uc, k_p[i],
+                                                            k_c[i])
+                       for i in range(len(k_p))]
+            mat_list = wave.design_matrix_freq(self.f, self.params,
+                                               self.del_t, self.tobs,
+                                               channel=channel)
+            for mat, ref in zip(mat_list, mat_ref):
+                np.testing.assert_allclose(
+                    mat, ref, rtol=1e-12, atol=1e-12 * np.max(np.abs(ref)))
+
+    def test_bessel_grid(self):
+
+        grid = np.linspace(0, 20, 2001)
+        wave = lisaresp.UCBWaveform(wavefuncs.v_func_gb, bessel_grid=grid)
+        wave_ref = lisaresp.UCBWaveform(wavefuncs.v_func_gb)
+        n_vect = np.arange(-wave.nc, wave.nc + 1)
+
+        # Interpolated Bessel functions inside the grid
+        rng = np.random.default_rng(16)
+        for x in rng.uniform(0, 20, 20):
+            np.testing.assert_allclose(wave.bessel_coeffs(x),
+                                       special.jv(n_vect, x), rtol=0,
+                                       atol=1e-10)
+        # Exact values outside the grid
+        np.testing.assert_allclose(wave.bessel_coeffs(25.0),
+                                   special.jv(n_vect, 25.0), rtol=1e-15)
+
+        # The last coefficients are reused for the same modulation index
+        jw = wave.bessel_coeffs(3.0)
+        self.assertIs(wave.bessel_coeffs(3.0), jw)
+        self.assertIsNot(wave.bessel_coeffs(3.5), jw)
+        self.assertEqual(wave.jw_ref[0], 3.5)
+
+        u_ref = wave_ref.u_matrices(self.f, self.params, self.del_t, 0,
+                                    self.tobs)
+        np.testing.assert_allclose(
+            wave.u_matrices(self.f, self.params, self.del_t, 0, self.tobs),
+            u_ref, rtol=0, atol=1e-10 * np.max(np.abs(u_ref)))
+
+
+class TestUCBWaveformFull(unittest.TestCase):
+
+    def test_series_gb_mono(self):
+
+        tobs = year / 4
+        del_t = 15.0
+        param_intr = np.array([1.2, 0.7, 3e-3, 0.0])
+        f = param_intr[2] + np.arange(-30, 31) / tobs + 0.3 / tobs
+        wave = lisaresp.UCBWaveformFull(wavefuncs.v_func_gb_mono, del_t,
+                                        tobs, nc=2 ** 6)
+
+        # Same function, computed on the grid of shifted frequencies
+        def v_func(f, f_0, tobs, ts):
+            return wavefuncs.v_func_gb_mono(f, f_0, tobs, ts)
+
+        wave_grid = lisaresp.UCBWaveformFull(v_func, del_t, tobs, nc=2 ** 6)
+        mat_list = wave.design_matrix_freq(f, param_intr)
+        mat_ref = wave_grid.design_matrix_freq(f, param_intr)
+        self.assertEqual(len(mat_list), len(mat_ref))
+        for mat, ref in zip(mat_list, mat_ref):
+            np.testing.assert_allclose(mat, ref, rtol=0,
+                                       atol=1e-10 * np.max(np.abs(ref)))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
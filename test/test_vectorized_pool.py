@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+from bayesdawn import samplers
+
+
+class Gaussian(object):
+
+    def __init__(self):
+        self.n_batch_calls = 0
+
+    def log_likelihood(self, par, scale):
+        return - 0.5 * np.sum(par ** 2) / scale
+
+    def log_likelihood_batch(self, pars, scale):
+        self.n_batch_calls += 1
+        return - 0.5 * np.sum(pars ** 2, axis=1) / scale
+
+
+def log_prior(par):
+
+    return 0.0 if np.all(np.abs(par) < 1) else -np.inf
+
+
+class LikePriorEvaluator(object):
+    """Same attributes as ptemcee's likelihood and prior evaluator."""
+
+    def __init__(self, logl, logp, loglargs=[], logpargs=[], loglkwargs={},
+                 logpkwargs={}):
+        self.logl = logl
+        self.logp = logp
+        self.loglargs = loglargs
+        self.logpargs = logpargs
+        self.loglkwargs = loglkwargs
+        self.logpkwargs = logpkwargs
+
+    def __call__(self, x):
+        lp = self.logp(x, *self.logpargs, **self.logpkwargs)
+        if lp == -np.inf:
+            return 0.0, lp
+        return self.logl(x, *self.loglargs, **self.loglkwargs), lp
+
+
+class FunctionWrapper(object):
+    """Same attributes as dynesty's function wrapper."""
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self, x):
+        return self.func(x, *self.args, **self.kwargs)
+
+
+class TestVectorizedPool(unittest.TestCase):
+
+    def test_map(self):
+
+        rng = np.random.default_rng(14)
+        x = rng.uniform(-1.2, 1.2, size=(20, 3))
+        model = Gaussian()
+        pool = samplers.VectorizedPool()
+
+        # Likelihood and prior evaluations, skipped outside the prior
+        evaluator = LikePriorEvaluator(model.log_likelihood, log_prior,
+                                       loglargs=[2.0])
+        results = pool.map(evaluator, x)
+        self.assertEqual(model.n_batch_calls, 1)
+        np.testing.assert_allclose(np.array(results),
+                                   np.array([evaluator(xi) for xi in x]))
+
+        # Function wrappers
+        wrapper = FunctionWrapper(model.log_likelihood, [2.0], {})
+        np.testing.assert_allclose(pool.map(wrapper, x),
+                                   [wrapper(xi) for xi in x])
+        self.assertEqual(model.n_batch_calls, 2)
+
+        # Functions without batched version
+        np.testing.assert_allclose(pool.map(log_prior, x),
+                                   [log_prior(xi) for xi in x])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
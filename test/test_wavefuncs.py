@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+from bayesdawn.waveforms import wavefuncs
+
+
+def window_ref(f, t_1, t_2):
+
+    dt = t_2 - t_1
+
+    return dt * np.exp(-np.pi * f * 1j * (t_2 + t_1)) * np.sinc(f * dt)
+
+
+def integral1_ref(f, t, tw, ts):
+
+    return -1j * tw / 4. * np.exp(1j * np.pi * (2 * t - tw) * f) * (
+        np.sinc(1 / 2. - f * tw) - np.sinc(1 / 2. + f * tw)) / ts
+
+
+def tukey_ref(f, f_0, ts, t_1, t_2, tw):
+
+    f_shift = f + f_0
+    integr = - 0.5 * window_ref(f, t_1, t_1 + tw) / ts
+    integr -= integral1_ref(f_shift, t_1, tw, ts)
+    integr -= 0.5 * window_ref(f_shift, t_1 + tw, t_2 - tw) / ts
+    integr -= 0.5 * window_ref(f_shift, t_2 - tw, t_2) / ts
+    integr -= integral1_ref(f_shift, t_2, tw, ts)
+
+    return integr
+
+
+class TestWaveformKernels(unittest.TestCase):
+
+    def test_kernels(self):
+
+        rng = np.random.default_rng(18)
+        n = 2000
+        f = rng.uniform(1e-4, 1e-2, n)
+        f_0 = 3e-3
+        ts = 15.0
+        # Year-long segments, where the phases reach 1e5 rad
+        t_1 = rng.uniform(0, 1e6, n)
+        t_2 = t_1 + rng.uniform(1e5, 3e7, n)
+        tw = rng.uniform(1e3, 1e4, n)
+
+        def check(values, ref):
+            np.testing.assert_allclose(values, ref, rtol=0,
+                                       atol=1e-14 * np.max(np.abs(ref)))
+
+        check(wavefuncs.window_tf(f, t_1, t_2), window_ref(f, t_1, t_2))
+        check(wavefuncs.integral0(f, t_1, t_2, ts),
+              - 0.5 * window_ref(f, t_1, t_2) / ts)
+        check(wavefuncs.integral1(f, t_1, tw, ts),
+              integral1_ref(f, t_1, tw, ts))
+        check(wavefuncs.v_func_GB_wind(f, f_0, 0, ts, t_1, t_2, tw),
+              tukey_ref(f, f_0, ts, t_1, t_2, tw))
+        check(wavefuncs.v_func_gb_conj(f, f_0, 0, ts, t_1, t_2),
+              window_ref(f - f_0, t_1, t_2) / ts)
+        check(wavefuncs.v_func_gb(f, f_0, 0, 3e7, ts),
+              window_ref(f + f_0, 0, 3e7) / ts)
+        check(wavefuncs.v_func_gb_mono(f, f_0, 3e7, ts),
+              window_ref(f - f_0, 0, 3e7) / ts)
+
+        # Broadcasting of a frequency grid against scalar times
+        f_grid = f[:40].reshape(4, 10)
+        values = wavefuncs.v_func_GB_wind(f_grid, f_0, 0, ts, 0.0, 3e7, 5e3)
+        self.assertEqual(values.shape, f_grid.shape)
+        check(values, tukey_ref(f_grid, f_0, ts, 0.0, 3e7, 5e3))
+        # Scalar times are not broadcast to the size of the frequencies
+        shape, flat_list = wavefuncs.flat_arrays(f_grid, 0.0, 3e7)
+        self.assertEqual(shape, f_grid.shape)
+        self.assertEqual([a.size for a in flat_list], [f_grid.size, 1, 1])
+        check(wavefuncs.window_tf(1e-3, t_1, t_2), window_ref(1e-3, t_1, t_2))
+        check(wavefuncs.integral1(f, 1e6, tw, ts),
+              integral1_ref(f, 1e6, tw, ts))
+        # Scalar inputs give scalar outputs
+        self.assertEqual(np.ndim(wavefuncs.window_tf(1e-3, 0.0, 1e4)), 0)
+
+
+if __name__ == '__main__':
+
+    unittest.main()